@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from app.db import get_db
+from app.service.ai_client import response_cache
+from app.service.llm_client import get_client
+
+router = APIRouter(prefix="/api/ai", tags=["ai"])
+
+@router.get("/stats")
+def ai_stats(db: Session = Depends(get_db)):
+    return {"cache": response_cache.stats(db), "client": get_client().metrics.snapshot()}
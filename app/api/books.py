@@ -1,15 +1,25 @@
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+import tempfile
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.db import get_db, Base, engine
 from app.schema.book import BookCreate, BookUpdate, BookRead
 from app.service.book_service import BookService
-from app.repository.book_meta_queries import get_latest_by_book_id
+from app.repository.book_meta_queries import latest_by_book_ids
 from app.repository.task_log_repository import TaskLogRepository
 from app.service.task_service import TaskService
+from app.service.cursor import encode_cursor, decode_cursor
 from app.repository.doc_text_repository import DocTextRepository
 from app.repository.question_repository import QuestionRepository
 from app.repository.explanation_repository import ExplanationRepository
+from app.repository.text_search_repository import TextSearchRepository
+from app.service.cover_service import cover_url, formats as cover_formats
+from app.model.doc_text import DocText
+from app.api.responses import FastJSONResponse, shape
+from app.service.export_service import export_service
+from app.service.upload_service import CHUNK_SIZE
 
 router = APIRouter(prefix="/api/books", tags=["books"])
 
@@ -21,6 +31,31 @@ task_service = TaskService()
 doc_text_repo = DocTextRepository()
 question_repo = QuestionRepository()
 expl_repo = ExplanationRepository()
+search_repo = TextSearchRepository()
+
+BOOK_FIELDS = ("id", "title", "author", "description", "summary", "published_year", "isbn")
+TEXT_FIELDS = ("id", "book_id", "page_number", "source", "file_path", "text", "bbox_x", "bbox_y", "bbox_w", "bbox_h")
+TEXT_COLUMNS = tuple(getattr(DocText, k) for k in TEXT_FIELDS)
+QUESTION_FIELDS = ("id", "book_id", "doc_text_id", "page_number", "text", "explanation")
+
+def book_dicts(db: Session, books):
+    ids = [b.id for b in books]
+    metas = latest_by_book_ids(db, ids)
+    tasks = task_repo.latest_by_books(db, ids)
+    out = []
+    for b in books:
+        d = {k: getattr(b, k) for k in BOOK_FIELDS}
+        d.update(cover_url=None, cover_thumb_url=None, task_status=None, task_pages_count=None)
+        meta = metas.get(b.id)
+        if meta and meta.cover_file:
+            d["cover_url"] = cover_url(meta.sha256, "lg", "jpg")
+            d["cover_thumb_url"] = cover_url(meta.sha256, "sm", cover_formats()[0])
+        t = tasks.get(b.id)
+        if t:
+            d["task_status"] = t.status
+            d["task_pages_count"] = t.pages_count
+        out.append(d)
+    return out
 
 @router.post("/", response_model=BookRead, status_code=status.HTTP_201_CREATED)
 def create_book(payload: BookCreate, db: Session = Depends(get_db)):
@@ -35,92 +70,98 @@ def get_book(book_id: int, db: Session = Depends(get_db)):
     book = service.get_book(db, book_id)
     if not book:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
-    data = BookRead.model_validate(book).model_dump()
-    meta = get_latest_by_book_id(db, book.id)
-    if meta and meta.cover_file:
-        data["cover_url"] = f"/covers/{meta.cover_file}"
-    t = task_repo.latest_by_book(db, book.id)
-    if t:
-        data["task_status"] = t.status
-        data["task_pages_count"] = t.pages_count
-    return data
+    return book_dicts(db, [book])[0]
 
 @router.get("/")
-def list_books(q: Optional[str] = None, page: int = 1, page_size: int = 20, db: Session = Depends(get_db)):
+def list_books(q: Optional[str] = None, page: int = 1, page_size: int = 20, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    if cursor is not None:
+        try:
+            items, next_cursor = service.list_books_after(db, q, cursor, page_size)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return FastJSONResponse({"items": book_dicts(db, items), "next_cursor": next_cursor, "page_size": page_size})
     items, total = service.list_books(db, q, page, page_size)
-    def as_dict(b):
-        d = BookRead.model_validate(b).model_dump()
-        meta = get_latest_by_book_id(db, b.id)
-        if meta and meta.cover_file:
-            d["cover_url"] = f"/covers/{meta.cover_file}"
-        t = task_repo.latest_by_book(db, b.id)
-        if t:
-            d["task_status"] = t.status
-            d["task_pages_count"] = t.pages_count
-        return d
-    return {"items": [as_dict(i) for i in items], "total": total, "page": page, "page_size": page_size}
+    return FastJSONResponse({"items": book_dicts(db, items), "total": total, "page": page, "page_size": page_size})
 
 @router.post("/{book_id}/analyze", status_code=status.HTTP_202_ACCEPTED)
-def analyze_book(book_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def analyze_book(book_id: int, mode: Literal["full", "incremental"] = "incremental", db: Session = Depends(get_db)):
     book = service.get_book(db, book_id)
     if not book:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
-    t = task_service.queue_analyze_ai(db, book_id)
-    from app.db import SessionLocal
-    def _runner(tid: int):
-        s = SessionLocal()
-        try:
-            task_service.run_analyze_ai(s, tid)
-        finally:
-            s.close()
-    background_tasks.add_task(_runner, t.id)
-    return {"task_id": t.id, "status": t.status}
+    t = task_service.queue_analyze_ai(db, book_id, mode)
+    return {"task_id": t.id, "status": t.status, "mode": mode}
 
 @router.get("/{book_id}/texts")
-def list_texts(book_id: int, page_number: Optional[int] = None, start: int = 0, limit: int = 50, db: Session = Depends(get_db)):
+def list_texts(book_id: int, page_number: Optional[int] = None, start: int = 0, limit: int = 50, cursor: Optional[str] = None, db: Session = Depends(get_db)):
     book = service.get_book(db, book_id)
     if not book:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
-    items = doc_text_repo.list_by_book(db, book_id)
-    if page_number is not None:
-        items = [t for t in items if t.page_number == page_number]
-    total = len(items)
-    items = items[start: start + limit]
-    def as_dict(t):
-        return {
-            "id": t.id,
-            "book_id": t.book_id,
-            "page_number": t.page_number,
-            "source": t.source,
-            "file_path": t.file_path,
-            "text": t.text,
-            "bbox_x": t.bbox_x,
-            "bbox_y": t.bbox_y,
-            "bbox_w": t.bbox_w,
-            "bbox_h": t.bbox_h,
-        }
-    return {"items": [as_dict(t) for t in items], "total": total, "start": start, "limit": limit}
+    next_cursor = None
+    if cursor is not None:
+        try:
+            after = decode_cursor(cursor, int, int) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        rows = doc_text_repo.list_after_by_book(db, book_id, after, limit, page_number, columns=TEXT_COLUMNS)
+        if len(rows) == limit:
+            next_cursor = encode_cursor(rows[-1].page_number, rows[-1].id)
+    else:
+        rows = doc_text_repo.list_range_by_book(db, book_id, start, limit, page_number, columns=TEXT_COLUMNS)
+    total = doc_text_repo.count_by_book(db, book_id, page_number)
+    return FastJSONResponse({"items": shape(TEXT_FIELDS, rows), "total": total, "start": start, "limit": limit, "next_cursor": next_cursor})
 
 @router.get("/{book_id}/questions")
-def list_questions(book_id: int, start: int = 0, limit: int = 50, db: Session = Depends(get_db)):
+def list_questions(book_id: int, start: int = 0, limit: int = 50, include_all_explanations: bool = False, db: Session = Depends(get_db)):
+    book = service.get_book(db, book_id)
+    if not book:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
+    rows = question_repo.list_with_first_explanation(db, book_id, start, limit)
+    total = question_repo.count_by_book(db, book_id)
+    items = shape(QUESTION_FIELDS, rows)
+    if include_all_explanations:
+        all_exps = expl_repo.list_by_questions(db, [d["id"] for d in items])
+        for d in items:
+            d["explanations"] = [e.text for e in all_exps.get(d["id"], [])]
+    return FastJSONResponse({"items": items, "total": total, "start": start, "limit": limit})
+
+@router.get("/{book_id}/export")
+def export_book(book_id: int, compress: Literal["none", "gzip", "zstd"] = "none", db: Session = Depends(get_db)):
+    if not service.get_book(db, book_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
+    try:
+        body = export_service.stream(book_id, compress)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    media_type, ext = {"gzip": ("application/gzip", ".gz"), "zstd": ("application/zstd", ".zst")}.get(compress, ("application/x-ndjson", ""))
+    headers = {"Content-Disposition": f'attachment; filename="book-{book_id}.ndjson{ext}"'}
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+@router.post("/import", status_code=status.HTTP_201_CREATED)
+async def import_book(request: Request, db: Session = Depends(get_db)):
+    with tempfile.TemporaryFile() as f:
+        buf = bytearray()
+        async for part in request.stream():
+            buf += part
+            if len(buf) >= CHUNK_SIZE:
+                await run_in_threadpool(f.write, bytes(buf))
+                buf.clear()
+        if buf:
+            await run_in_threadpool(f.write, bytes(buf))
+        f.seek(0)
+        try:
+            result = await run_in_threadpool(export_service.import_stream, db, f)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    book = service.get_book(db, result["book_id"])
+    return FastJSONResponse({"book": book_dicts(db, [book])[0], "counts": result["counts"]}, status_code=status.HTTP_201_CREATED)
+
+@router.get("/{book_id}/search")
+def search_texts(book_id: int, q: str, limit: int = 20, offset: int = 0, db: Session = Depends(get_db)):
     book = service.get_book(db, book_id)
     if not book:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
-    items = question_repo.list_by_book(db, book_id)
-    total = len(items)
-    items = items[start: start + limit]
-    def as_dict(q):
-        exps = expl_repo.list_by_question(db, q.id)
-        first = exps[0].text if exps else None
-        return {
-            "id": q.id,
-            "book_id": q.book_id,
-            "doc_text_id": q.doc_text_id,
-            "page_number": q.page_number,
-            "text": q.text,
-            "explanation": first,
-        }
-    return {"items": [as_dict(q) for q in items], "total": total, "start": start, "limit": limit}
+    items, total = search_repo.search(db, q, book_id, limit, offset)
+    return {"items": items, "total": total, "q": q, "limit": limit, "offset": offset}
 
 @router.put("/{book_id}", response_model=BookRead)
 def update_book(book_id: int, payload: BookUpdate, db: Session = Depends(get_db)):
@@ -0,0 +1,115 @@
+import zlib
+from typing import Optional
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # br needs the optional brotli dependency; gzip is always available
+    brotli = None
+
+# already compressed or must not be buffered (SSE progress streams)
+EXCLUDED_TYPES = ("text/event-stream", "image/", "video/", "audio/", "font/", "application/zip", "application/gzip", "application/x-gzip", "application/zstd")
+THREAD_MIN_SIZE = 128 * 1024
+
+def choose_encoding(accept: str) -> Optional[str]:
+    prefs = {}
+    for part in (accept or "").split(","):
+        name, _, params = part.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        prefs[name.strip().lower()] = q
+    best = None
+    for enc in (("br", "gzip") if brotli is not None else ("gzip",)):
+        q = prefs.get(enc, prefs.get("*", 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (enc, q)
+    return best[0] if best else None
+
+class Encoder:
+    def __init__(self, encoding: str, gzip_level: int = 6, brotli_quality: int = 4):
+        self.encoding = encoding
+        if encoding == "br":
+            self.obj = brotli.Compressor(quality=brotli_quality)
+        else:
+            self.obj = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def feed(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self.obj.process(data)
+            return out + (self.obj.finish() if final else self.obj.flush())
+        return self.obj.compress(data) + self.obj.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        start: Optional[Message] = None
+        encoder: Optional[Encoder] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, encoder, passthrough
+            kind = message["type"]
+            if kind == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                media = headers.get("content-type", "").partition(";")[0].strip().lower()
+                passthrough = "content-encoding" in headers or message["status"] in (204, 206, 304) or media.startswith(EXCLUDED_TYPES)
+                if passthrough:
+                    await send(message)
+                else:
+                    start = message
+                return
+            if passthrough or kind != "http.response.body":
+                if start is not None and not passthrough:
+                    passthrough = True
+                    await send(start)
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if encoder is None:
+                if not more and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = Encoder(encoding, self.gzip_level, self.brotli_quality)
+                data = await self._feed(encoder, body, not more)
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(data))
+                await send(start)
+                await send({"type": "http.response.body", "body": data, "more_body": more})
+                return
+            data = await self._feed(encoder, body, not more)
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
+
+    async def _feed(self, encoder: Encoder, data: bytes, final: bool) -> bytes:
+        if len(data) >= THREAD_MIN_SIZE:
+            # large bodies are compressed off the event loop
+            return await anyio.to_thread.run_sync(encoder.feed, data, final)
+        return encoder.feed(data, final)
@@ -0,0 +1,24 @@
+import re
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.orm import Session
+from app.db import get_db
+from app.service.cover_service import cover_service, MIME
+
+router = APIRouter(prefix="/covers", tags=["covers"])
+
+SHA_RE = re.compile(r"^[0-9a-f]{64}$")
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@router.get("/{sha}/{size}.{fmt}")
+def get_cover(sha: str, size: str, fmt: str, request: Request, db: Session = Depends(get_db)):
+    if not SHA_RE.match(sha):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cover not found")
+    etag = cover_service.etag(sha, size, fmt)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    inm = request.headers.get("if-none-match")
+    if inm and (inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    data = cover_service.get(db, sha, size, fmt)
+    if data is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cover not found")
+    return Response(content=data, media_type=MIME[fmt], headers=headers)
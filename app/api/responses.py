@@ -0,0 +1,29 @@
+import json
+from datetime import date, datetime
+from typing import Any, Iterable, List, Sequence
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # fast path needs the optional orjson dependency
+    orjson = None
+
+def _default(o: Any) -> Any:
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+def shape(keys: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[dict]:
+    return [dict(zip(keys, r)) for r in rows]
+
+class FastJSONResponse(Response):
+    # bypasses FastAPI's jsonable_encoder: payloads are already plain dicts, lists and scalars
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from app.db import get_db
+from app.repository.text_search_repository import TextSearchRepository
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+search_repo = TextSearchRepository()
+
+@router.get("")
+def search_library(q: str, limit: int = 20, offset: int = 0, db: Session = Depends(get_db)):
+    items, total = search_repo.search(db, q, None, limit, offset)
+    return {"items": items, "total": total, "q": q, "limit": limit, "offset": offset}
@@ -0,0 +1,32 @@
+import json
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.db import get_db
+from app.repository.task_log_repository import TaskLogRepository
+from app.service.progress import progress_hub, task_snapshot
+
+router = APIRouter(prefix="/api/tasks", tags=["tasks"])
+
+task_repo = TaskLogRepository()
+
+@router.get("/{task_id}")
+def get_task(task_id: int, db: Session = Depends(get_db)):
+    task = task_repo.get(db, task_id)
+    if not task:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+    return task_snapshot(task)
+
+@router.get("/{task_id}/events")
+def task_events(task_id: int, db: Session = Depends(get_db)):
+    task = task_repo.get(db, task_id)
+    if not task:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+    async def stream():
+        async for snap in progress_hub.subscribe(task_id):
+            if snap is None:
+                yield ": keepalive\n\n"
+            else:
+                event = "gone" if snap["status"] == "gone" else "progress"
+                yield f"event: {event}\ndata: {json.dumps(snap, ensure_ascii=False)}\n\n"
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,11 +1,13 @@
+import uuid
 from pathlib import Path
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.db import get_db, Base, engine
-from app.service.upload_service import UploadService
+from app.service.upload_service import UploadService, CHUNK_SIZE
 from app.schema.book import BookRead
-from app.schema.book_meta import BookMetaRead, UploadBookResponse
+from app.schema.book_meta import BookMetaRead, UploadBookResponse, UploadSessionCreate, UploadSessionRead
 from app.model.book_meta import BookMeta
 from app.config import get_settings
 from app.service.task_service import TaskService
@@ -17,8 +19,23 @@ Base.metadata.create_all(bind=engine)
 service = UploadService()
 task_service = TaskService()
 
+def _dispatch(db: Session, book, meta: BookMeta, source: Optional[BookMeta], files_dir: Path) -> dict:
+    blob = Path(meta.file_path).name
+    if not meta.cover_file:
+        task_service.queue_render_cover(db, book.id, blob)
+    if source is not None:
+        task_service.queue_reuse_book(db, book.id, blob, source.book_id)
+    else:
+        out_dir = files_dir / Path(meta.file_path).stem
+        task_service.queue_split_pdf(db, book.id, blob, str(out_dir), out_dir)
+        task_service.queue_summarize_book(db, book.id, blob)
+    return {"book": BookRead.model_validate(book).model_dump(), "meta": BookMetaRead.model_validate(meta), "deduplicated": source is not None}
+
+def _session_dict(upload) -> dict:
+    return {"upload_id": upload.id, "file_name": upload.file_name, "size": upload.total_size, "received": upload.received}
+
 @router.post("/book", response_model=UploadBookResponse, status_code=status.HTTP_201_CREATED)
-async def upload_book(
+def upload_book(
     file: UploadFile = File(...),
     title: Optional[str] = Form(None),
     author: Optional[str] = Form(None),
@@ -26,32 +43,94 @@ async def upload_book(
     published_year: Optional[int] = Form(None),
     isbn: Optional[str] = Form(None),
     db: Session = Depends(get_db),
-    background_tasks: BackgroundTasks = None,
 ):
     try:
         files_dir = get_settings().files_dir
         book_data = {"title": title, "author": author, "description": description, "published_year": published_year, "isbn": isbn}
-        book, meta = service.upload_book(db, file, book_data, files_dir)
-        out_dir = files_dir / Path(meta.file_name).stem
-        task = task_service.queue_split_pdf(db, book.id, Path(meta.file_path).name, str(out_dir), out_dir)
-        tsum = task_service.queue_summarize_book(db, book.id, Path(meta.file_path).name)
-        if background_tasks is not None:
-            from app.db import SessionLocal
-            from app.config import get_settings as _get_settings
-            def _runner(tid: int):
-                s = SessionLocal()
-                try:
-                    task_service.run_split_pdf(s, tid, _get_settings().files_dir)
-                finally:
-                    s.close()
-            background_tasks.add_task(_runner, task.id)
-            def _runner_sum(tid: int):
-                s = SessionLocal()
-                try:
-                    task_service.run_summarize_book(s, tid, _get_settings().files_dir)
-                finally:
-                    s.close()
-            background_tasks.add_task(_runner_sum, tsum.id)
-        return {"book": BookRead.model_validate(book).model_dump(), "meta": BookMetaRead.model_validate(meta)}
+        book, meta, source = service.upload_book(db, file, book_data, files_dir)
+        return _dispatch(db, book, meta, source, files_dir)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.post("/batch", status_code=status.HTTP_201_CREATED)
+def upload_batch(files: List[UploadFile] = File(...), db: Session = Depends(get_db)):
+    settings = get_settings()
+    try:
+        entries, skipped = service.upload_batch(db, files, settings.files_dir, settings.batch_max_files, settings.batch_max_entry_mb)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not entries:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"message": "No PDF found in upload", "skipped": skipped})
+    batch_id = uuid.uuid4().hex
+    reused = task_service.queue_batch(db, batch_id, entries, settings.files_dir)
+    items = [{"book_id": book.id, "title": book.title, "file_name": meta.file_name, "sha256": meta.sha256, "deduplicated": r} for (book, meta, _), r in zip(entries, reused)]
+    return {"batch_id": batch_id, "items": items, "skipped": skipped}
+
+@router.get("/batches/{batch_id}")
+def get_batch(batch_id: str, db: Session = Depends(get_db)):
+    progress = task_service.batch_progress(db, batch_id)
+    if progress is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Batch not found")
+    return progress
+
+@router.post("/sessions", response_model=UploadSessionRead, status_code=status.HTTP_201_CREATED)
+def create_upload_session(payload: UploadSessionCreate, db: Session = Depends(get_db)):
+    try:
+        upload = service.create_session(db, payload.file_name, payload.content_type, payload.size, get_settings().files_dir)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return _session_dict(upload)
+
+@router.get("/sessions/{upload_id}", response_model=UploadSessionRead)
+def get_upload_session(upload_id: str, db: Session = Depends(get_db)):
+    upload = service.get_session(db, upload_id)
+    if not upload:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+    return _session_dict(upload)
+
+@router.put("/sessions/{upload_id}", response_model=UploadSessionRead)
+async def upload_chunk(upload_id: str, request: Request, offset: int = Query(..., ge=0), db: Session = Depends(get_db)):
+    files_dir = get_settings().files_dir
+    try:
+        writer = await run_in_threadpool(service.open_chunk, db, upload_id, offset, files_dir)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    try:
+        buf = bytearray()
+        async for part in request.stream():
+            buf += part
+            if len(buf) >= CHUNK_SIZE:
+                await run_in_threadpool(writer.write, bytes(buf))
+                buf.clear()
+        if buf:
+            await run_in_threadpool(writer.write, bytes(buf))
+    finally:
+        upload = await run_in_threadpool(service.close_chunk, db, writer)
+    return _session_dict(upload)
+
+@router.post("/sessions/{upload_id}/complete", response_model=UploadBookResponse, status_code=status.HTTP_201_CREATED)
+def complete_upload_session(
+    upload_id: str,
+    title: Optional[str] = Form(None),
+    author: Optional[str] = Form(None),
+    description: Optional[str] = Form(None),
+    published_year: Optional[int] = Form(None),
+    isbn: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
+):
+    try:
+        files_dir = get_settings().files_dir
+        book_data = {"title": title, "author": author, "description": description, "published_year": published_year, "isbn": isbn}
+        book, meta, source = service.complete_session(db, upload_id, book_data, files_dir)
+        return _dispatch(db, book, meta, source, files_dir)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.delete("/sessions/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+def abort_upload_session(upload_id: str, db: Session = Depends(get_db)):
+    if not service.abort_session(db, upload_id, get_settings().files_dir):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
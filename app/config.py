@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from typing import List
 
@@ -5,14 +6,55 @@ class Settings:
     def __init__(self):
         base = Path(__file__).resolve().parent
         self.app_name = "BiteBook API"
-        self.database_url = "sqlite:///./bitebook.db"
+        self.database_url = os.getenv("BITEBOOK_DATABASE_URL", "sqlite:///./bitebook.db")
+        data_dir = Path(os.getenv("BITEBOOK_DATA_DIR", base))
         self.static_dir = base / "static"
-        self.files_dir = base / "files"
-        self.covers_dir = base / "covers"
+        self.files_dir = data_dir / "files"
+        self.covers_dir = data_dir / "covers"
         self.cors_origins: List[str] = ["http://localhost:5173", "http://127.0.0.1:5173"]
         self.swagger_css = "/static/swagger-ui/swagger-ui.min.css"
         self.swagger_js = "/static/swagger-ui/swagger-ui-bundle.js"
         self.redoc_js = "/static/redoc/redoc.standalone.js"
+        self.split_workers = int(os.getenv("BITEBOOK_SPLIT_WORKERS", os.cpu_count() or 1))
+        self.split_shard_pages = int(os.getenv("BITEBOOK_SPLIT_SHARD_PAGES", 32))
+        self.chunk_target = int(os.getenv("BITEBOOK_CHUNK_TARGET", 400))
+        self.chunk_max = int(os.getenv("BITEBOOK_CHUNK_MAX", 800))
+        self.chunk_overlap = int(os.getenv("BITEBOOK_CHUNK_OVERLAP", 0))
+        self.chunk_unit = os.getenv("BITEBOOK_CHUNK_UNIT", "chars")
+        self.task_workers = int(os.getenv("BITEBOOK_TASK_WORKERS", 2))
+        self.task_lease_seconds = int(os.getenv("BITEBOOK_TASK_LEASE_SECONDS", 60))
+        self.task_heartbeat_seconds = int(os.getenv("BITEBOOK_TASK_HEARTBEAT_SECONDS", 15))
+        self.task_poll_seconds = float(os.getenv("BITEBOOK_TASK_POLL_SECONDS", 1.0))
+        self.task_max_attempts = int(os.getenv("BITEBOOK_TASK_MAX_ATTEMPTS", 3))
+        self.batch_max_files = int(os.getenv("BITEBOOK_BATCH_MAX_FILES", 500))
+        self.batch_max_running = int(os.getenv("BITEBOOK_BATCH_MAX_RUNNING", 2))
+        self.batch_max_entry_mb = int(os.getenv("BITEBOOK_BATCH_MAX_ENTRY_MB", 512))
+        self.ai_analyze_mode = os.getenv("BITEBOOK_AI_ANALYZE_MODE", "fanout")
+        self.ai_window_chunks = int(os.getenv("BITEBOOK_AI_WINDOW_CHUNKS", 12))
+        self.ai_concurrency = int(os.getenv("BITEBOOK_AI_CONCURRENCY", 4))
+        self.ai_rate_per_second = float(os.getenv("BITEBOOK_AI_RATE_PER_SECOND", 2.0))
+        self.dashscope_base_url = os.getenv("DASHSCOPE_HTTP_BASE_URL", "https://dashscope.aliyuncs.com/api/v1")
+        self.ai_rate_burst = int(os.getenv("BITEBOOK_AI_RATE_BURST", 4))
+        self.llm_timeout_seconds = float(os.getenv("BITEBOOK_LLM_TIMEOUT_SECONDS", 60))
+        self.llm_task_deadline_seconds = float(os.getenv("BITEBOOK_LLM_TASK_DEADLINE_SECONDS", 1800))
+        self.llm_max_attempts = int(os.getenv("BITEBOOK_LLM_MAX_ATTEMPTS", 5))
+        self.llm_backoff_seconds = float(os.getenv("BITEBOOK_LLM_BACKOFF_SECONDS", 1.0))
+        self.llm_backoff_max_seconds = float(os.getenv("BITEBOOK_LLM_BACKOFF_MAX_SECONDS", 30.0))
+        self.llm_cache_enabled = os.getenv("BITEBOOK_LLM_CACHE", "1") not in ("0", "false", "no")
+        self.llm_cache_ttl_hours = float(os.getenv("BITEBOOK_LLM_CACHE_TTL_HOURS", 720))
+        self.llm_cache_max_mb = int(os.getenv("BITEBOOK_LLM_CACHE_MAX_MB", 64))
+        self.summary_mode = os.getenv("BITEBOOK_SUMMARY_MODE", "hierarchical")
+        self.summary_group_chars = int(os.getenv("BITEBOOK_SUMMARY_GROUP_CHARS", 6000))
+        self.summary_part_chars = int(os.getenv("BITEBOOK_SUMMARY_PART_CHARS", 300))
+        self.summary_fanin = int(os.getenv("BITEBOOK_SUMMARY_FANIN", 8))
+        self.retrieval_cache_books = int(os.getenv("BITEBOOK_RETRIEVAL_CACHE_BOOKS", 8))
+        self.upload_hasher_cache = int(os.getenv("BITEBOOK_UPLOAD_HASHER_CACHE", 256))
+        self.compress_min_bytes = int(os.getenv("BITEBOOK_COMPRESS_MIN_BYTES", 1024))
+        self.gzip_level = int(os.getenv("BITEBOOK_GZIP_LEVEL", 6))
+        self.brotli_quality = int(os.getenv("BITEBOOK_BROTLI_QUALITY", 4))
+        self.cover_cache_mb = int(os.getenv("BITEBOOK_COVER_CACHE_MB", 256))
+        self.book_rank_max_hits = int(os.getenv("BITEBOOK_BOOK_RANK_MAX_HITS", 5000))
+        self.progress_poll_seconds = float(os.getenv("BITEBOOK_PROGRESS_POLL_SECONDS", 1.0))
 
 _settings = Settings()
 
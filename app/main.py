@@ -4,10 +4,15 @@ from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
 from pathlib import Path
 from app.api.books import router as books_router
 from fastapi.middleware.cors import CORSMiddleware
+from app.api.compression import CompressionMiddleware
 from sqlalchemy import select
 from app.db import SessionLocal, engine, Base
 from app.model.book import Book
 from app.api.upload import router as upload_router
+from app.api.search import router as search_router
+from app.api.tasks import router as tasks_router
+from app.api.covers import router as covers_router
+from app.api.ai import router as ai_router
 from app.config import get_settings
 from sqlalchemy import text
 from app.model.task_log import TaskLog
@@ -16,12 +21,19 @@ from app.model.doc_text import DocText
 from app.model.analysis_item import AnalysisItem
 from app.model.question import Question
 from app.model.explanation import Explanation
+from app.model.upload_session import UploadSession
+from app.model.llm_cache import LlmCache, LlmCacheCounter
+from app.model.summary_part import SummaryPart
+from app.model.analysis_coverage import AnalysisCoverage
+from app.model.retrieval_index import RetrievalIndex
+from app.model.rate_limit import RateLimitBucket
+from app.repository.text_search_repository import TextSearchRepository
+from app.repository.book_search_repository import BookSearchRepository
 
 settings = get_settings()
 app = FastAPI(title=settings.app_name, docs_url=None, redoc_url=None)
 
 app.mount("/static", StaticFiles(directory=str(settings.static_dir)), name="static")
-app.mount("/covers", StaticFiles(directory=str(settings.covers_dir)), name="covers")
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,6 +42,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compress_min_bytes, gzip_level=settings.gzip_level, brotli_quality=settings.brotli_quality)
 
 @app.get("/docs", include_in_schema=False)
 def custom_swagger_ui_html():
@@ -51,6 +64,13 @@ def redoc_html():
 
 app.include_router(books_router)
 app.include_router(upload_router)
+app.include_router(search_router)
+app.include_router(tasks_router)
+app.include_router(covers_router)
+app.include_router(ai_router)
+# legacy full-size covers; registered after covers_router so /covers/{sha}/{size}.{fmt} wins
+settings.covers_dir.mkdir(parents=True, exist_ok=True)
+app.mount("/covers", StaticFiles(directory=str(settings.covers_dir)), name="covers")
 
 @app.on_event("startup")
 def seed_data():
@@ -59,11 +79,26 @@ def seed_data():
         cols_b = [row[1] for row in conn.execute(text("PRAGMA table_info('books')"))]
         if 'summary' not in cols_b:
             conn.execute(text("ALTER TABLE books ADD COLUMN summary TEXT"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_books_created_at_id ON books (created_at, id)"))
         cols = [row[1] for row in conn.execute(text("PRAGMA table_info('book_meta')"))]
         for name, ddl in [("cover_file", "TEXT"), ("cover_mime", "TEXT"), ("cover_width", "INTEGER"), ("cover_height", "INTEGER")]:
             if name not in cols:
                 conn.execute(text(f"ALTER TABLE book_meta ADD COLUMN {name} {ddl}"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_book_meta_sha256 ON book_meta (sha256)"))
         cols_dt = [row[1] for row in conn.execute(text("PRAGMA table_info('doc_text')"))]
         for name, ddl in [("bbox_x", "REAL"), ("bbox_y", "REAL"), ("bbox_w", "REAL"), ("bbox_h", "REAL")]:
             if name not in cols_dt:
                 conn.execute(text(f"ALTER TABLE doc_text ADD COLUMN {name} {ddl}"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_doc_text_book_page_id ON doc_text (book_id, page_number, id)"))
+        TextSearchRepository().ensure_schema(conn)
+        BookSearchRepository().ensure_schema(conn)
+        cols_t = [row[1] for row in conn.execute(text("PRAGMA table_info('task_log')"))]
+        for name, ddl in [("checkpoint", "INTEGER"), ("lease_owner", "TEXT"), ("lease_expires_at", "DATETIME"), ("heartbeat_at", "DATETIME"), ("attempts", "INTEGER NOT NULL DEFAULT 0"), ("progress", "TEXT"), ("options", "TEXT"), ("batch_id", "VARCHAR(32)")]:
+            if name not in cols_t:
+                conn.execute(text(f"ALTER TABLE task_log ADD COLUMN {name} {ddl}"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_task_log_status_id ON task_log (status, id)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_task_log_batch_id ON task_log (batch_id)"))
+        cols_u = [row[1] for row in conn.execute(text("PRAGMA table_info('upload_session')"))]
+        for name, ddl in [("writer", "VARCHAR(32)"), ("writer_expires_at", "DATETIME")]:
+            if name not in cols_u:
+                conn.execute(text(f"ALTER TABLE upload_session ADD COLUMN {name} {ddl}"))
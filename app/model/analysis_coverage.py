@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, Boolean, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.db import Base
+
+class AnalysisCoverage(Base):
+    __tablename__ = "analysis_coverage"
+
+    doc_text_id = Column(Integer, ForeignKey("doc_text.id", ondelete="CASCADE"), primary_key=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False, index=True)
+    task_id = Column(Integer, nullable=True)
+    fallback = Column(Boolean, nullable=False, default=False, server_default="0")  # questions came from the local fallback, retry on next run
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Text, DateTime, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from app.db import Base
 
@@ -6,6 +6,7 @@ class Book(Base):
     __tablename__ = "books"
     __table_args__ = (
         UniqueConstraint("isbn", name="uq_books_isbn"),
+        Index("ix_books_created_at_id", "created_at", "id"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -12,7 +12,7 @@ class BookMeta(Base):
     file_path = Column(String(1024), nullable=False)
     mime_type = Column(String(64), nullable=False)
     file_size = Column(Integer, nullable=False)
-    sha256 = Column(String(64), nullable=False)
+    sha256 = Column(String(64), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     cover_file = Column(String(255), nullable=True)
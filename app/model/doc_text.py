@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db import Base
 
 class DocText(Base):
     __tablename__ = "doc_text"
+    __table_args__ = (
+        Index("ix_doc_text_book_page_id", "book_id", "page_number", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False, index=True)
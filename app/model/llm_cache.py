@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from sqlalchemy.sql import func
+from app.db import Base
+
+class LlmCache(Base):
+    __tablename__ = "llm_cache"
+    __table_args__ = (
+        Index("ix_llm_cache_last_used_at", "last_used_at"),
+    )
+
+    key = Column(String(64), primary_key=True)  # sha256 of model, prompt version and request
+    model = Column(String(64), nullable=False)
+    kind = Column(String(32), nullable=False)
+    response = Column(Text, nullable=False)  # JSON assistant message
+    size = Column(Integer, nullable=False)
+    hits = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_used_at = Column(DateTime(timezone=True), nullable=False)
+
+class LlmCacheCounter(Base):
+    __tablename__ = "llm_cache_counter"
+
+    name = Column(String(32), primary_key=True)  # hits|misses|evictions
+    value = Column(Integer, nullable=False, default=0, server_default="0")
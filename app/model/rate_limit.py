@@ -0,0 +1,9 @@
+from sqlalchemy import Column, String, Float
+from app.db import Base
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit"
+
+    name = Column(String(32), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated = Column(Float, nullable=False)  # unix time of the last refill, shared by every process
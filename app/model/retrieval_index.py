@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, LargeBinary, DateTime, ForeignKey
+from app.db import Base
+
+class RetrievalIndex(Base):
+    __tablename__ = "retrieval_index"
+
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False)  # tokenizer/format version, stale rows are rebuilt
+    doc_count = Column(Integer, nullable=False)
+    term_count = Column(Integer, nullable=False)
+    size = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)  # zlib-compressed JSON postings
+    created_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db import Base
+
+class SummaryPart(Base):
+    __tablename__ = "summary_part"
+    __table_args__ = (
+        UniqueConstraint("book_id", "level", "seq", name="uq_summary_part_book_level_seq"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False, index=True)
+    level = Column(Integer, nullable=False)  # 0 = chunk group, n = reduction of level n-1 parts
+    seq = Column(Integer, nullable=False)
+    start_page = Column(Integer, nullable=False)
+    end_page = Column(Integer, nullable=False)
+    input_hash = Column(String(64), nullable=False)  # sha256 of the summarised input and prompt version
+    summary = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
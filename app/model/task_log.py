@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db import Base
 
 class TaskLog(Base):
     __tablename__ = "task_log"
+    __table_args__ = (
+        Index("ix_task_log_status_id", "status", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -14,9 +17,17 @@ class TaskLog(Base):
     file_name = Column(String(255), nullable=False)
     output_dir = Column(String(1024), nullable=True)
     pages_count = Column(Integer, nullable=True)
+    checkpoint = Column(Integer, nullable=True)  # last committed page for resumable tasks
+    progress = Column(Text, nullable=True)  # JSON: unit, done, total, eta_seconds and task specific counters
+    options = Column(Text, nullable=True)  # JSON task parameters, e.g. {"mode": "incremental"} for analyze_ai
+    batch_id = Column(String(32), nullable=True, index=True)  # set for tasks queued by a batch upload
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     started_at = Column(DateTime(timezone=True), nullable=True)
     finished_at = Column(DateTime(timezone=True), nullable=True)
+    lease_owner = Column(String(64), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
 
     book = relationship("Book")
 
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.db import Base
+
+class UploadSession(Base):
+    __tablename__ = "upload_session"
+
+    id = Column(String(32), primary_key=True)
+    file_name = Column(String(255), nullable=False)
+    content_type = Column(String(64), nullable=False)
+    total_size = Column(Integer, nullable=True)
+    received = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    # the request currently writing a chunk, claimed with a conditional UPDATE so it holds across processes
+    writer = Column(String(32), nullable=True)
+    writer_expires_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import List, Optional, Sequence
+from sqlalchemy import select, delete, literal
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from app.model.analysis_coverage import AnalysisCoverage
+from app.model.doc_text import DocText
+from app.repository.bulk import iter_batches
+
+class AnalysisCoverageRepository:
+    def fallback_ids(self, db: Session, doc_text_ids: List[int]) -> List[int]:
+        if not doc_text_ids:
+            return []
+        stmt = select(AnalysisCoverage.doc_text_id).where(AnalysisCoverage.doc_text_id.in_(doc_text_ids), AnalysisCoverage.fallback.is_(True))
+        return list(db.execute(stmt).scalars().all())
+
+    def mark(self, db: Session, book_id: int, doc_text_ids: List[int], fallback: bool, task_id: Optional[int] = None, commit: bool = True) -> None:
+        if not doc_text_ids:
+            return
+        now = datetime.utcnow()
+        stmt = insert(AnalysisCoverage)
+        stmt = stmt.on_conflict_do_update(index_elements=[AnalysisCoverage.doc_text_id], set_={k: stmt.excluded[k] for k in ("book_id", "task_id", "fallback", "created_at")})
+        db.execute(stmt, [{"doc_text_id": i, "book_id": book_id, "task_id": task_id, "fallback": fallback, "created_at": now} for i in doc_text_ids])
+        if commit:
+            db.commit()
+
+    def mark_book(self, db: Session, book_id: int, fallback: bool, task_id: Optional[int] = None, commit: bool = True) -> None:
+        rows = select(DocText.id, DocText.book_id, literal(task_id), literal(fallback), literal(datetime.utcnow())).where(DocText.book_id == book_id)
+        stmt = insert(AnalysisCoverage).from_select(["doc_text_id", "book_id", "task_id", "fallback", "created_at"], rows)
+        stmt = stmt.on_conflict_do_update(index_elements=[AnalysisCoverage.doc_text_id], set_={k: stmt.excluded[k] for k in ("book_id", "task_id", "fallback", "created_at")})
+        db.execute(stmt)
+        if commit:
+            db.commit()
+
+    def iter_by_book(self, db: Session, book_id: int, columns: Sequence, batch_size: int = 1000):
+        stmt = select(*columns).where(AnalysisCoverage.book_id == book_id).order_by(AnalysisCoverage.doc_text_id.asc())
+        return iter_batches(db, stmt, batch_size)
+
+    def delete_by_book(self, db: Session, book_id: int) -> int:
+        n = db.execute(delete(AnalysisCoverage).where(AnalysisCoverage.book_id == book_id)).rowcount
+        db.commit()
+        return n
@@ -1,13 +1,13 @@
 from typing import List
 from sqlalchemy.orm import Session
+from app.repository.bulk import bulk_insert, as_rows
 from app.model.analysis_item import AnalysisItem
 
 class AnalysisItemRepository:
-    def bulk_create(self, db: Session, items: List[AnalysisItem]):
-        db.add_all(items)
-        db.commit()
-        for it in items:
-            db.refresh(it)
+    def bulk_create(self, db: Session, items: List[AnalysisItem], returning: bool = True):
+        ids = bulk_insert(db, AnalysisItem, as_rows(items), returning=returning)
+        for it, new_id in zip(items, ids):
+            it.id = new_id
         return items
 
     def list_by_book(self, db: Session, book_id: int) -> List[AnalysisItem]:
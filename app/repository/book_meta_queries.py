@@ -1,9 +1,17 @@
-from typing import Optional
+from typing import Optional, List, Dict
 from sqlalchemy.orm import Session
-from sqlalchemy import select, desc
+from sqlalchemy import select, desc, func
 from app.model.book_meta import BookMeta
 
 def get_latest_by_book_id(db: Session, book_id: int) -> Optional[BookMeta]:
-    stmt = select(BookMeta).where(BookMeta.book_id == book_id).order_by(desc(BookMeta.created_at)).limit(1)
+    stmt = select(BookMeta).where(BookMeta.book_id == book_id).order_by(desc(BookMeta.created_at), desc(BookMeta.id)).limit(1)
     return db.execute(stmt).scalars().first()
 
+
+def latest_by_book_ids(db: Session, book_ids: List[int]) -> Dict[int, BookMeta]:
+    if not book_ids:
+        return {}
+    rn = func.row_number().over(partition_by=BookMeta.book_id, order_by=(desc(BookMeta.created_at), desc(BookMeta.id))).label("rn")
+    sub = select(BookMeta.id, rn).where(BookMeta.book_id.in_(book_ids)).subquery()
+    stmt = select(BookMeta).join(sub, BookMeta.id == sub.c.id).where(sub.c.rn == 1)
+    return {m.book_id: m for m in db.execute(stmt).scalars().all()}
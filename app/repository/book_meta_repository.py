@@ -1,4 +1,6 @@
+from typing import List
 from sqlalchemy.orm import Session
+from sqlalchemy import func
 from app.model.book_meta import BookMeta
 
 class BookMetaRepository:
@@ -8,6 +10,14 @@ class BookMetaRepository:
         db.refresh(meta)
         return meta
 
+    def create_many(self, db: Session, metas: List[BookMeta], commit: bool = True) -> List[BookMeta]:
+        db.add_all(metas)
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+        return metas
+
     def list_by_book(self, db: Session, book_id: int):
         return db.query(BookMeta).filter(BookMeta.book_id == book_id).all()
 
@@ -15,3 +25,16 @@ class BookMetaRepository:
         for m in metas:
             db.delete(m)
         db.commit()
+
+    def list_by_sha256(self, db: Session, sha256: str) -> List[BookMeta]:
+        return db.query(BookMeta).filter(BookMeta.sha256 == sha256).order_by(BookMeta.id.asc()).all()
+
+    def count_other_refs(self, db: Session, file_path: str, book_id: int) -> int:
+        return db.query(func.count(BookMeta.id)).filter(BookMeta.file_path == file_path, BookMeta.book_id != book_id).scalar()
+
+    def set_cover_by_sha256(self, db: Session, sha256: str, cover_file: str, cover_mime: str, width: int, height: int) -> None:
+        db.query(BookMeta).filter(BookMeta.sha256 == sha256, BookMeta.cover_file.is_(None)).update(
+            {"cover_file": cover_file, "cover_mime": cover_mime, "cover_width": width, "cover_height": height},
+            synchronize_session=False,
+        )
+        db.commit()
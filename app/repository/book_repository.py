@@ -1,28 +1,87 @@
 from typing import Optional, List, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import select, or_
+from sqlalchemy import select, or_, func, tuple_, type_coerce, String
+from app.config import get_settings
 from app.model.book import Book
+from app.repository.book_search_repository import BookSearchRepository
+from app.repository.text_search_repository import split_terms
 
 class BookRepository:
+    def __init__(self, search_repo: Optional[BookSearchRepository] = None):
+        self.search_repo = search_repo or BookSearchRepository()
+
     def create(self, db: Session, book: Book) -> Book:
         db.add(book)
         db.commit()
         db.refresh(book)
         return book
 
+    def create_many(self, db: Session, books: List[Book]) -> List[Book]:
+        # flushed for ids but not committed, so callers can add dependent rows in the same transaction
+        db.add_all(books)
+        db.flush()
+        return books
+
     def get(self, db: Session, book_id: int) -> Optional[Book]:
         return db.get(Book, book_id)
 
     def list(self, db: Session, q: Optional[str], offset: int, limit: int) -> Tuple[List[Book], int]:
-        stmt = select(Book).order_by(Book.created_at.desc())
-        count_stmt = select(Book)
+        stmt = select(Book)
+        count_stmt = select(func.count()).select_from(Book)
+        order = (Book.created_at.desc(), Book.id.desc())
+        total = None
+        if q:
+            long_terms, short_terms = split_terms(q)
+            if long_terms and self.search_repo.estimate_hits(db, long_terms) > get_settings().book_rank_max_hits:
+                # ranking every hit of a very common term costs more than it is worth; such pages are walked in
+                # (created_at, id) order with substring filters, which stops after one page of the dense matches
+                for t in long_terms:
+                    stmt = stmt.where(self._text_cond(t))
+                if short_terms:
+                    count_stmt = count_stmt.where(Book.id.in_(select(self.search_repo.matches(long_terms).c.book_id)))
+                else:
+                    total = self.search_repo.count(db, long_terms)
+            elif long_terms:
+                ranked = self.search_repo.ranked(long_terms)
+                stmt = stmt.join(ranked, ranked.c.book_id == Book.id)
+                count_stmt = count_stmt.join(ranked, ranked.c.book_id == Book.id)
+                order = (ranked.c.rank.asc(), Book.id.desc())
+            for t in short_terms:
+                stmt = stmt.where(self._like_cond(t))
+                count_stmt = count_stmt.where(self._like_cond(t))
+        if total is None:
+            total = db.execute(count_stmt).scalar_one()
+        items = db.execute(stmt.order_by(*order).offset(offset).limit(limit)).scalars().all()
+        return items, total
+
+    def list_after(self, db: Session, q: Optional[str], after: Optional[Tuple[str, int]], limit: int) -> Tuple[List[Book], Optional[Tuple[str, int]]]:
+        created_key = type_coerce(Book.created_at, String)
+        stmt = select(Book, created_key.label("created_key")).order_by(Book.created_at.desc(), Book.id.desc())
         if q:
-            pattern = f"%{q}%"
-            stmt = stmt.where(or_(Book.title.like(pattern), Book.author.like(pattern), Book.isbn.like(pattern))).order_by(Book.created_at.desc())
-            count_stmt = count_stmt.where(or_(Book.title.like(pattern), Book.author.like(pattern), Book.isbn.like(pattern)))
-        total = db.execute(count_stmt).unique().scalars().all()
-        items = db.execute(stmt.offset(offset).limit(limit)).unique().scalars().all()
-        return items, len(total)
+            long_terms, short_terms = split_terms(q)
+            if long_terms and self.search_repo.estimate_hits(db, long_terms) > get_settings().book_rank_max_hits:
+                for t in long_terms:
+                    stmt = stmt.where(self._text_cond(t))
+            elif long_terms:
+                stmt = stmt.where(Book.id.in_(select(self.search_repo.matches(long_terms).c.book_id)))
+            for t in short_terms:
+                stmt = stmt.where(self._like_cond(t))
+        if after:
+            ck, last_id = after
+            stmt = stmt.where(tuple_(created_key, Book.id) < tuple_(ck, last_id))
+        rows = db.execute(stmt.limit(limit)).all()
+        items = [r[0] for r in rows]
+        next_key = (rows[-1][1], rows[-1][0].id) if len(rows) == limit else None
+        return items, next_key
+
+    def _like_cond(self, term: str):
+        pattern = f"%{term}%"
+        return or_(Book.title.like(pattern), Book.author.like(pattern), Book.isbn.like(pattern))
+
+    def _text_cond(self, term: str):
+        # the same columns as books_fts, so the hits match the index
+        pattern = f"%{term}%"
+        return or_(Book.title.like(pattern), Book.author.like(pattern), Book.isbn.like(pattern), Book.description.like(pattern), Book.summary.like(pattern))
 
     def update(self, db: Session, book: Book, data: dict) -> Book:
         for k, v in data.items():
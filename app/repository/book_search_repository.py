@@ -0,0 +1,47 @@
+from typing import List
+from sqlalchemy import text, column, bindparam, Integer, Float
+from sqlalchemy.orm import Session
+from app.model.book import Book
+from app.repository.text_search_repository import match_expr
+
+class BookSearchRepository:
+    def ensure_schema(self, conn) -> None:
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'")).first()
+        if not exists:
+            conn.execute(text("CREATE VIRTUAL TABLE books_fts USING fts5(title, author, isbn, description, summary, tokenize = 'trigram')"))
+            conn.execute(text("INSERT INTO books_fts (rowid, title, author, isbn, description, summary) SELECT id, title, author, coalesce(isbn, ''), coalesce(description, ''), coalesce(summary, '') FROM books"))
+        # per-trigram document counts, used to estimate how many books a term matches before ranking them
+        conn.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS books_fts_vocab USING fts5vocab(books_fts, 'row')"))
+
+    def upsert(self, db: Session, book: Book, commit: bool = True) -> None:
+        db.execute(text("DELETE FROM books_fts WHERE rowid = :id"), {"id": book.id})
+        db.execute(
+            text("INSERT INTO books_fts (rowid, title, author, isbn, description, summary) VALUES (:id, :title, :author, :isbn, :description, :summary)"),
+            {"id": book.id, "title": book.title or "", "author": book.author or "", "isbn": book.isbn or "", "description": book.description or "", "summary": book.summary or ""},
+        )
+        if commit:
+            db.commit()
+
+    def delete(self, db: Session, book_id: int) -> None:
+        db.execute(text("DELETE FROM books_fts WHERE rowid = :id"), {"id": book_id})
+        db.commit()
+
+    def estimate_hits(self, db: Session, terms: List[str]) -> int:
+        # a trigram phrase cannot match more books than its rarest trigram, and an AND query not more than its rarest term
+        grams = {t: {t.lower()[i:i + 3] for i in range(len(t) - 2)} for t in terms}
+        wanted = sorted(set().union(*grams.values()))
+        stmt = text("SELECT term, doc FROM books_fts_vocab WHERE term IN :grams").bindparams(bindparam("grams", expanding=True))
+        docs = dict(db.execute(stmt, {"grams": wanted}).all())
+        return min(min(docs.get(g, 0) for g in gs) for gs in grams.values())
+
+    def count(self, db: Session, terms: List[str]) -> int:
+        stmt = text("SELECT count(*) FROM books_fts WHERE books_fts MATCH :book_match")
+        return db.execute(stmt, {"book_match": match_expr(terms)}).scalar_one()
+
+    def matches(self, terms):
+        stmt = text("SELECT rowid AS book_id FROM books_fts WHERE books_fts MATCH :book_match")
+        return stmt.bindparams(book_match=match_expr(terms)).columns(column("book_id", Integer)).subquery("books_match")
+
+    def ranked(self, terms):
+        stmt = text("SELECT rowid AS book_id, bm25(books_fts, 10.0, 5.0, 5.0, 1.0, 1.0) AS rank FROM books_fts WHERE books_fts MATCH :book_match")
+        return stmt.bindparams(book_match=match_expr(terms)).columns(column("book_id", Integer), column("rank", Float)).subquery("books_rank")
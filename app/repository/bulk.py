@@ -0,0 +1,50 @@
+from typing import Iterator, List, Sequence
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+def as_rows(items: Sequence) -> List[dict]:
+    if not items:
+        return []
+    cols = [c for c in items[0].__table__.columns if not c.primary_key]
+    # an unset column with a default is left out so the default applies instead of an explicit NULL
+    defaulted = {c.key for c in cols if c.default is not None or c.server_default is not None}
+    keys = [c.key for c in cols if c.key not in defaulted and any(getattr(it, c.key) is not None for it in items)]
+    rows = []
+    for it in items:
+        row = {k: getattr(it, k) for k in keys}
+        for k in defaulted:
+            v = getattr(it, k)
+            if v is not None:
+                row[k] = v
+        rows.append(row)
+    return rows
+
+def _runs(rows: List[dict]) -> Iterator[List[dict]]:
+    # executemany compiles one statement per key set, so consecutive rows with the same keys are sent together
+    start = 0
+    for i in range(1, len(rows) + 1):
+        if i == len(rows) or rows[i].keys() != rows[start].keys():
+            yield rows[start:i]
+            start = i
+
+def bulk_insert(db: Session, model, rows: List[dict], returning: bool = True, batch_size: int = 1000, commit: bool = True) -> List[int]:
+    table = model.__table__
+    ids: List[int] = []
+    for i in range(0, len(rows), batch_size):
+        for run in _runs(rows[i:i + batch_size]):
+            if returning:
+                stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+                ids.extend(db.execute(stmt, run).scalars().all())
+            else:
+                db.execute(insert(table), run)
+    if commit:
+        db.commit()
+    return ids
+
+def iter_batches(db: Session, stmt, batch_size: int = 1000) -> Iterator[Sequence]:
+    # yield_per keeps one batch of rows in memory instead of buffering the whole result
+    result = db.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
@@ -1,18 +1,73 @@
-from typing import List
+from typing import List, Optional, Sequence, Tuple
 from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, delete, func, literal, tuple_, exists
+from app.repository.bulk import bulk_insert, as_rows, iter_batches
 from app.model.doc_text import DocText
+from app.model.analysis_coverage import AnalysisCoverage
 
 class DocTextRepository:
-    def bulk_create(self, db: Session, entries: List[DocText]):
-        db.add_all(entries)
-        db.commit()
-        for e in entries:
-            db.refresh(e)
+    def bulk_create(self, db: Session, entries: List[DocText], returning: bool = True):
+        ids = bulk_insert(db, DocText, as_rows(entries), returning=returning)
+        for e, new_id in zip(entries, ids):
+            e.id = new_id
         return entries
 
     def list_by_book(self, db: Session, book_id: int) -> List[DocText]:
         return db.query(DocText).filter(DocText.book_id == book_id).order_by(DocText.page_number.asc()).all()
 
-    def list_range_by_book(self, db: Session, book_id: int, start: int, limit: int) -> List[DocText]:
-        q = db.query(DocText).filter(DocText.book_id == book_id).order_by(DocText.page_number.asc(), DocText.id.asc())
+    def list_by_ids(self, db: Session, ids: List[int]) -> List[DocText]:
+        if not ids:
+            return []
+        return list(db.execute(select(DocText).where(DocText.id.in_(ids))).scalars().all())
+
+    def list_range_by_book(self, db: Session, book_id: int, start: int, limit: int, page_number: Optional[int] = None, columns: Optional[Sequence] = None) -> List[DocText]:
+        # with columns, plain row tuples are returned instead of hydrated DocText objects
+        q = db.query(*(columns or (DocText,))).filter(DocText.book_id == book_id)
+        if page_number is not None:
+            q = q.filter(DocText.page_number == page_number)
+        q = q.order_by(DocText.page_number.asc(), DocText.id.asc())
         return q.offset(start).limit(limit).all()
+
+    def count_by_book(self, db: Session, book_id: int, page_number: Optional[int] = None, uncovered: bool = False) -> int:
+        stmt = select(func.count()).select_from(DocText).where(DocText.book_id == book_id)
+        if page_number is not None:
+            stmt = stmt.where(DocText.page_number == page_number)
+        if uncovered:
+            stmt = stmt.where(~self._covered())
+        return db.execute(stmt).scalar_one()
+
+    def list_after_by_book(self, db: Session, book_id: int, after: Optional[Tuple[int, int]], limit: int, page_number: Optional[int] = None, uncovered: bool = False, columns: Optional[Sequence] = None) -> List[DocText]:
+        stmt = select(*(columns or (DocText,))).where(DocText.book_id == book_id)
+        if page_number is not None:
+            stmt = stmt.where(DocText.page_number == page_number)
+        if uncovered:
+            stmt = stmt.where(~self._covered())
+        if after:
+            stmt = stmt.where(tuple_(DocText.page_number, DocText.id) > tuple_(*after))
+        stmt = stmt.order_by(DocText.page_number.asc(), DocText.id.asc()).limit(limit)
+        if columns:
+            return list(db.execute(stmt).all())
+        return list(db.execute(stmt).scalars().all())
+
+    def iter_by_book(self, db: Session, book_id: int, columns: Sequence, batch_size: int = 1000):
+        stmt = select(*columns).where(DocText.book_id == book_id).order_by(DocText.page_number.asc(), DocText.id.asc())
+        return iter_batches(db, stmt, batch_size)
+
+    def delete_after_page(self, db: Session, book_id: int, page_number: int) -> int:
+        # foreign keys are not enforced on SQLite, so coverage of the dropped chunks goes in the same transaction
+        dropped = select(DocText.id).where(DocText.book_id == book_id, DocText.page_number > page_number)
+        db.execute(delete(AnalysisCoverage).where(AnalysisCoverage.doc_text_id.in_(dropped)))
+        n = db.query(DocText).filter(DocText.book_id == book_id, DocText.page_number > page_number).delete(synchronize_session=False)
+        db.commit()
+        return n
+
+    def copy_to_book(self, db: Session, src_book_id: int, dst_book_id: int) -> int:
+        cols = [c for c in DocText.__table__.columns if c.key not in ("id", "book_id", "created_at")]
+        src = select(literal(dst_book_id), *cols).where(DocText.book_id == src_book_id).order_by(DocText.page_number.asc(), DocText.id.asc())
+        res = db.execute(insert(DocText.__table__).from_select(["book_id"] + [c.key for c in cols], src))
+        db.commit()
+        return res.rowcount
+
+    def _covered(self):
+        # chunks whose questions came from the local fallback stay eligible for the model
+        return exists().where(AnalysisCoverage.doc_text_id == DocText.id, AnalysisCoverage.fallback.is_(False))
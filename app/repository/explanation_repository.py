@@ -1,15 +1,30 @@
-from typing import List
+from typing import List, Dict, Sequence
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from app.repository.bulk import bulk_insert, as_rows, iter_batches
 from app.model.explanation import Explanation
+from app.model.question import Question
 
 class ExplanationRepository:
-    def bulk_create(self, db: Session, items: List[Explanation]):
-        db.add_all(items)
-        db.commit()
-        for it in items:
-            db.refresh(it)
+    def bulk_create(self, db: Session, items: List[Explanation], returning: bool = True, commit: bool = True):
+        ids = bulk_insert(db, Explanation, as_rows(items), returning=returning, commit=commit)
+        for it, new_id in zip(items, ids):
+            it.id = new_id
         return items
 
+    def iter_by_book(self, db: Session, book_id: int, columns: Sequence, batch_size: int = 1000):
+        stmt = select(*columns).join(Question, Question.id == Explanation.question_id).where(Question.book_id == book_id).order_by(Explanation.id.asc())
+        return iter_batches(db, stmt, batch_size)
+
     def list_by_question(self, db: Session, question_id: int) -> List[Explanation]:
         return db.query(Explanation).filter(Explanation.question_id == question_id).all()
 
+
+    def list_by_questions(self, db: Session, question_ids: List[int]) -> Dict[int, List[Explanation]]:
+        out: Dict[int, List[Explanation]] = {}
+        if not question_ids:
+            return out
+        rows = db.query(Explanation).filter(Explanation.question_id.in_(question_ids)).order_by(Explanation.id.asc()).all()
+        for e in rows:
+            out.setdefault(e.question_id, []).append(e)
+        return out
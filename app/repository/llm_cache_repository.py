@@ -0,0 +1,54 @@
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from app.model.llm_cache import LlmCache, LlmCacheCounter
+
+class LlmCacheRepository:
+    def get(self, db: Session, key: str, not_before: datetime) -> Optional[str]:
+        stmt = (
+            update(LlmCache)
+            .where(LlmCache.key == key, LlmCache.created_at >= not_before)
+            .values(hits=LlmCache.hits + 1, last_used_at=datetime.utcnow())
+            .returning(LlmCache.response)
+        )
+        response = db.execute(stmt).scalar_one_or_none()
+        db.commit()
+        return response
+
+    def put(self, db: Session, key: str, model: str, kind: str, response: str) -> None:
+        now = datetime.utcnow()
+        values = {"key": key, "model": model, "kind": kind, "response": response, "size": len(response), "hits": 0, "created_at": now, "last_used_at": now}
+        stmt = insert(LlmCache).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=[LlmCache.key], set_={k: stmt.excluded[k] for k in ("response", "size", "created_at", "last_used_at")})
+        db.execute(stmt)
+        db.commit()
+
+    def incr(self, db: Session, name: str, n: int = 1) -> None:
+        stmt = insert(LlmCacheCounter).values(name=name, value=n)
+        db.execute(stmt.on_conflict_do_update(index_elements=[LlmCacheCounter.name], set_={"value": LlmCacheCounter.value + n}))
+        db.commit()
+
+    def evict(self, db: Session, not_before: datetime, max_bytes: int) -> int:
+        n = db.execute(delete(LlmCache).where(LlmCache.created_at < not_before)).rowcount
+        total = db.execute(select(func.coalesce(func.sum(LlmCache.size), 0))).scalar_one()
+        if total > max_bytes:
+            # walk least recently used entries until the remainder fits
+            running = func.sum(LlmCache.size).over(order_by=(LlmCache.last_used_at.asc(), LlmCache.key.asc())).label("running")
+            sub = select(LlmCache.key, LlmCache.size, running).subquery()
+            victims = select(sub.c.key).where(sub.c.running - sub.c.size < total - max_bytes)
+            n += db.execute(delete(LlmCache).where(LlmCache.key.in_(victims))).rowcount
+        db.commit()
+        return n
+
+    def stats(self, db: Session) -> Dict[str, int]:
+        counters = {name: value for name, value in db.execute(select(LlmCacheCounter.name, LlmCacheCounter.value))}
+        entries, size = db.execute(select(func.count(), func.coalesce(func.sum(LlmCache.size), 0)).select_from(LlmCache)).one()
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "entries": entries,
+            "bytes": size,
+        }
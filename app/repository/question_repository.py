@@ -1,15 +1,47 @@
-from typing import List
+from typing import List, Optional, Sequence, Tuple
 from sqlalchemy.orm import Session
+from sqlalchemy import select, func, delete
+from app.repository.bulk import bulk_insert, as_rows, iter_batches
 from app.model.question import Question
+from app.model.explanation import Explanation
 
 class QuestionRepository:
-    def bulk_create(self, db: Session, items: List[Question]):
-        db.add_all(items)
-        db.commit()
-        for it in items:
-            db.refresh(it)
+    def bulk_create(self, db: Session, items: List[Question], returning: bool = True, commit: bool = True):
+        ids = bulk_insert(db, Question, as_rows(items), returning=returning, commit=commit)
+        for it, new_id in zip(items, ids):
+            it.id = new_id
         return items
 
     def list_by_book(self, db: Session, book_id: int) -> List[Question]:
         return db.query(Question).filter(Question.book_id == book_id).all()
 
+
+    def iter_by_book(self, db: Session, book_id: int, columns: Sequence, batch_size: int = 1000):
+        stmt = select(*columns).where(Question.book_id == book_id).order_by(Question.id.asc())
+        return iter_batches(db, stmt, batch_size)
+
+    def delete_by_book(self, db: Session, book_id: int, doc_text_ids: Optional[List[int]] = None, commit: bool = True) -> int:
+        ids = select(Question.id).where(Question.book_id == book_id)
+        if doc_text_ids is not None:
+            ids = ids.where(Question.doc_text_id.in_(doc_text_ids))
+        db.execute(delete(Explanation).where(Explanation.question_id.in_(ids)))
+        n = db.execute(delete(Question).where(Question.id.in_(ids))).rowcount
+        if commit:
+            db.commit()
+        return n
+
+    def count_by_book(self, db: Session, book_id: int) -> int:
+        stmt = select(func.count()).select_from(Question).where(Question.book_id == book_id)
+        return db.execute(stmt).scalar_one()
+
+    def list_with_first_explanation(self, db: Session, book_id: int, start: int, limit: int) -> List[Tuple]:
+        # row tuples: id, book_id, doc_text_id, page_number, text, explanation
+        first = select(Explanation.text).where(Explanation.question_id == Question.id).order_by(Explanation.id.asc()).limit(1).scalar_subquery()
+        stmt = (
+            select(Question.id, Question.book_id, Question.doc_text_id, Question.page_number, Question.text, first.label("explanation"))
+            .where(Question.book_id == book_id)
+            .order_by(Question.id.asc())
+            .offset(start)
+            .limit(limit)
+        )
+        return list(db.execute(stmt).all())
@@ -0,0 +1,22 @@
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from app.model.rate_limit import RateLimitBucket
+
+class RateLimitRepository:
+    def take(self, db: Session, name: str, rate: float, capacity: int, now: float) -> float:
+        db.execute(insert(RateLimitBucket).values(name=name, tokens=float(capacity), updated=now).on_conflict_do_nothing(index_elements=[RateLimitBucket.name]))
+        # refill and take in one conditional UPDATE, so concurrent processes cannot spend the same token
+        level = func.min(float(capacity), RateLimitBucket.tokens + func.max(0.0, now - RateLimitBucket.updated) * rate)
+        stmt = (
+            update(RateLimitBucket)
+            .where(RateLimitBucket.name == name, level >= 1)
+            .values(tokens=level - 1, updated=func.max(RateLimitBucket.updated, now))
+            .execution_options(synchronize_session=False)
+        )
+        if db.execute(stmt).rowcount == 1:
+            db.commit()
+            return 0.0
+        tokens = db.execute(select(level).where(RateLimitBucket.name == name)).scalar_one()
+        db.commit()
+        return (1 - tokens) / rate
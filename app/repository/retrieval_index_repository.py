@@ -0,0 +1,28 @@
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from app.model.retrieval_index import RetrievalIndex
+
+class RetrievalIndexRepository:
+    def get(self, db: Session, book_id: int) -> Optional[RetrievalIndex]:
+        return db.get(RetrievalIndex, book_id)
+
+    def stamp(self, db: Session, book_id: int) -> Optional[Tuple[int, datetime]]:
+        row = db.execute(select(RetrievalIndex.version, RetrievalIndex.created_at).where(RetrievalIndex.book_id == book_id)).first()
+        return (row[0], row[1]) if row else None
+
+    def put(self, db: Session, book_id: int, version: int, doc_count: int, term_count: int, data: bytes) -> datetime:
+        now = datetime.utcnow()
+        values = {"book_id": book_id, "version": version, "doc_count": doc_count, "term_count": term_count, "size": len(data), "data": data, "created_at": now}
+        stmt = insert(RetrievalIndex).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=[RetrievalIndex.book_id], set_={k: stmt.excluded[k] for k in values if k != "book_id"})
+        db.execute(stmt)
+        db.commit()
+        return now
+
+    def delete_by_book(self, db: Session, book_id: int) -> int:
+        n = db.execute(delete(RetrievalIndex).where(RetrievalIndex.book_id == book_id)).rowcount
+        db.commit()
+        return n
@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import Dict, Tuple
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from app.model.summary_part import SummaryPart
+
+class SummaryPartRepository:
+    def map_by_book(self, db: Session, book_id: int) -> Dict[Tuple[int, int], SummaryPart]:
+        rows = db.execute(select(SummaryPart).where(SummaryPart.book_id == book_id)).scalars().all()
+        return {(p.level, p.seq): p for p in rows}
+
+    def put(self, db: Session, book_id: int, level: int, seq: int, start_page: int, end_page: int, input_hash: str, summary: str) -> None:
+        values = {"book_id": book_id, "level": level, "seq": seq, "start_page": start_page, "end_page": end_page, "input_hash": input_hash, "summary": summary, "created_at": datetime.utcnow()}
+        stmt = insert(SummaryPart).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=[SummaryPart.book_id, SummaryPart.level, SummaryPart.seq], set_={k: stmt.excluded[k] for k in ("start_page", "end_page", "input_hash", "summary", "created_at")})
+        db.execute(stmt)
+        db.commit()
+
+    def delete_beyond(self, db: Session, book_id: int, keep: Dict[int, int]) -> int:
+        # drop parts left over from a previous, larger tree: deeper levels or trailing seqs
+        stmt = delete(SummaryPart).where(SummaryPart.book_id == book_id, SummaryPart.level >= len(keep))
+        n = db.execute(stmt).rowcount
+        for level, count in keep.items():
+            n += db.execute(delete(SummaryPart).where(SummaryPart.book_id == book_id, SummaryPart.level == level, SummaryPart.seq >= count)).rowcount
+        db.commit()
+        return n
+
+    def delete_by_book(self, db: Session, book_id: int) -> int:
+        n = db.execute(delete(SummaryPart).where(SummaryPart.book_id == book_id)).rowcount
+        db.commit()
+        return n
@@ -1,7 +1,9 @@
-from typing import Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import select, desc
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import select, update, desc, func, and_, or_, exists
 from app.model.task_log import TaskLog
+from app.model.book import Book
 
 class TaskLogRepository:
     def create(self, db: Session, task: TaskLog) -> TaskLog:
@@ -10,6 +12,14 @@ class TaskLogRepository:
         db.refresh(task)
         return task
 
+    def create_many(self, db: Session, tasks: List[TaskLog], commit: bool = True) -> List[TaskLog]:
+        db.add_all(tasks)
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+        return tasks
+
     def update(self, db: Session, task: TaskLog, data: dict) -> TaskLog:
         for k, v in data.items():
             setattr(task, k, v)
@@ -22,6 +32,87 @@ class TaskLogRepository:
         return db.get(TaskLog, task_id)
 
     def latest_by_book(self, db: Session, book_id: int) -> Optional[TaskLog]:
-        stmt = select(TaskLog).where(TaskLog.book_id == book_id).order_by(desc(TaskLog.created_at)).limit(1)
+        stmt = select(TaskLog).where(TaskLog.book_id == book_id).order_by(desc(TaskLog.created_at), desc(TaskLog.id)).limit(1)
+        return db.execute(stmt).scalars().first()
+
+
+    def latest_by_books(self, db: Session, book_ids: List[int]) -> Dict[int, TaskLog]:
+        if not book_ids:
+            return {}
+        rn = func.row_number().over(partition_by=TaskLog.book_id, order_by=(desc(TaskLog.created_at), desc(TaskLog.id))).label("rn")
+        sub = select(TaskLog.id, rn).where(TaskLog.book_id.in_(book_ids)).subquery()
+        stmt = select(TaskLog).join(sub, TaskLog.id == sub.c.id).where(sub.c.rn == 1)
+        return {t.book_id: t for t in db.execute(stmt).scalars().all()}
+
+    def latest_done(self, db: Session, book_id: int, task_type: str) -> Optional[TaskLog]:
+        stmt = select(TaskLog).where(TaskLog.book_id == book_id, TaskLog.task_type == task_type, TaskLog.status == "done").order_by(desc(TaskLog.id)).limit(1)
         return db.execute(stmt).scalars().first()
 
+    def output_dirs_by_book(self, db: Session, book_id: int) -> List[str]:
+        stmt = select(TaskLog.output_dir).where(TaskLog.book_id == book_id, TaskLog.output_dir.is_not(None), TaskLog.output_dir != "").distinct()
+        return list(db.execute(stmt).scalars().all())
+
+    def count_other_output_refs(self, db: Session, output_dir: str, book_id: int) -> int:
+        stmt = select(func.count()).select_from(TaskLog).join(Book, Book.id == TaskLog.book_id).where(TaskLog.output_dir == output_dir, TaskLog.book_id != book_id)
+        return db.execute(stmt).scalar_one()
+
+    def claim_next(self, db: Session, owner: str, lease_seconds: int, batch_max_running: int = 0) -> Optional[int]:
+        now = datetime.utcnow()
+        split = aliased(TaskLog)
+        # summaries read the extracted text, so hold them back while the book is still being split
+        splitting = exists().where(split.book_id == TaskLog.book_id, split.task_type == "split_pdf", split.status.in_(("queued", "running")))
+        # a duplicate inside a batch copies the first book's results, so it waits until that book is split and summarised
+        source = aliased(TaskLog)
+        source_busy = exists().where(source.book_id == func.json_extract(TaskLog.options, "$.source_book_id"), source.task_type.in_(("split_pdf", "summarize")), source.status.in_(("queued", "running")))
+        ready = and_(or_(TaskLog.task_type != "summarize", ~splitting), or_(TaskLog.task_type != "reuse_book", ~source_busy))
+        cond = [TaskLog.status == "queued", ready]
+        if batch_max_running > 0:
+            # a large batch upload runs at most this many tasks at once, leaving room for everything queued after it
+            peer = aliased(TaskLog)
+            running = select(func.count()).where(peer.batch_id == TaskLog.batch_id, peer.status == "running").scalar_subquery()
+            cond.append(or_(TaskLog.batch_id.is_(None), running < batch_max_running))
+        next_id = select(TaskLog.id).where(*cond).order_by(TaskLog.id.asc()).limit(1).scalar_subquery()
+        stmt = (
+            update(TaskLog)
+            .where(TaskLog.id == next_id, TaskLog.status == "queued")
+            .values(status="running", lease_owner=owner, lease_expires_at=now + timedelta(seconds=lease_seconds), heartbeat_at=now, attempts=TaskLog.attempts + 1)
+            .returning(TaskLog.id)
+            .execution_options(synchronize_session=False)
+        )
+        task_id = db.execute(stmt).scalar()
+        db.commit()
+        return task_id
+
+    def list_by_batch(self, db: Session, batch_id: str) -> List[TaskLog]:
+        stmt = select(TaskLog).where(TaskLog.batch_id == batch_id).order_by(TaskLog.id.asc())
+        return list(db.execute(stmt).scalars().all())
+
+    def heartbeat(self, db: Session, task_ids: List[int], owner: str, lease_seconds: int) -> None:
+        if not task_ids:
+            return
+        now = datetime.utcnow()
+        stmt = (
+            update(TaskLog)
+            .where(TaskLog.id.in_(task_ids), TaskLog.lease_owner == owner)
+            .values(lease_expires_at=now + timedelta(seconds=lease_seconds), heartbeat_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(stmt)
+        db.commit()
+
+    def release(self, db: Session, task_id: int, owner: str) -> None:
+        stmt = update(TaskLog).where(TaskLog.id == task_id, TaskLog.lease_owner == owner).values(lease_owner=None, lease_expires_at=None).execution_options(synchronize_session=False)
+        db.execute(stmt)
+        db.commit()
+
+    def requeue(self, db: Session, task_ids: List[int], max_attempts: int, message: str) -> None:
+        if not task_ids:
+            return
+        base = update(TaskLog).where(TaskLog.id.in_(task_ids), TaskLog.status == "running").execution_options(synchronize_session=False)
+        db.execute(base.where(TaskLog.attempts >= max_attempts).values(status="failed", finished_at=datetime.utcnow(), message=message, lease_owner=None, lease_expires_at=None))
+        db.execute(base.where(TaskLog.attempts < max_attempts).values(status="queued", message=message, lease_owner=None, lease_expires_at=None))
+        db.commit()
+
+    def expired_ids(self, db: Session) -> List[int]:
+        stmt = select(TaskLog.id).where(TaskLog.status == "running", or_(TaskLog.lease_expires_at.is_(None), TaskLog.lease_expires_at < datetime.utcnow()))
+        return list(db.execute(stmt).scalars().all())
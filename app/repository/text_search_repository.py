@@ -0,0 +1,105 @@
+from typing import List, Optional, Tuple, Dict, Any
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+MARK_OPEN = "<mark>"
+MARK_CLOSE = "</mark>"
+
+def split_terms(q: str) -> Tuple[List[str], List[str]]:
+    terms = [t for t in (q or "").split() if t]
+    # trigram tokenizer cannot MATCH terms shorter than 3 characters (common for Chinese words)
+    return [t for t in terms if len(t) >= 3], [t for t in terms if len(t) < 3]
+
+def match_expr(terms: List[str]) -> str:
+    return " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+def like_snippet(body: str, terms: List[str], width: int = 48) -> str:
+    body = body or ""
+    low = body.lower()
+    pos = -1
+    for t in terms:
+        pos = low.find(t.lower())
+        if pos >= 0:
+            break
+    if pos < 0:
+        return body[:width * 2]
+    start = max(0, pos - width)
+    end = min(len(body), pos + width)
+    out = body[start:end]
+    for t in terms:
+        i = out.lower().find(t.lower())
+        if i >= 0:
+            out = out[:i] + MARK_OPEN + out[i:i + len(t)] + MARK_CLOSE + out[i + len(t):]
+    return ("…" if start > 0 else "") + out + ("…" if end < len(body) else "")
+
+class TextSearchRepository:
+    def ensure_schema(self, conn) -> None:
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'doc_text_fts'")).first()
+        if exists:
+            return
+        conn.execute(text("CREATE VIRTUAL TABLE doc_text_fts USING fts5(text, book_id UNINDEXED, page_number UNINDEXED, tokenize = 'trigram')"))
+        conn.execute(text("INSERT INTO doc_text_fts (rowid, text, book_id, page_number) SELECT id, coalesce(text, ''), book_id, page_number FROM doc_text"))
+
+    def index_pages(self, db: Session, book_id: int, from_page: int, to_page: int) -> None:
+        db.execute(
+            text("INSERT INTO doc_text_fts (rowid, text, book_id, page_number) SELECT id, coalesce(text, ''), book_id, page_number FROM doc_text WHERE book_id = :b AND page_number BETWEEN :f AND :t"),
+            {"b": book_id, "f": from_page, "t": to_page},
+        )
+        db.commit()
+
+    def index_book(self, db: Session, book_id: int, commit: bool = True) -> None:
+        db.execute(
+            text("INSERT INTO doc_text_fts (rowid, text, book_id, page_number) SELECT id, coalesce(text, ''), book_id, page_number FROM doc_text WHERE book_id = :b"),
+            {"b": book_id},
+        )
+        if commit:
+            db.commit()
+
+    def delete_by_book(self, db: Session, book_id: int, after_page: int = 0) -> None:
+        db.execute(
+            text("DELETE FROM doc_text_fts WHERE rowid IN (SELECT id FROM doc_text WHERE book_id = :b AND page_number > :p)"),
+            {"b": book_id, "p": after_page},
+        )
+        db.commit()
+
+    def search(self, db: Session, q: str, book_id: Optional[int] = None, limit: int = 20, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        long_terms, short_terms = split_terms(q)
+        if not long_terms and not short_terms:
+            return [], 0
+        params: Dict[str, Any] = {"limit": limit, "offset": offset}
+        where = []
+        if book_id is not None:
+            where.append("d.book_id = :book_id")
+            params["book_id"] = book_id
+        for i, t in enumerate(short_terms):
+            where.append(f"d.text LIKE :like{i}")
+            params[f"like{i}"] = f"%{t}%"
+        if long_terms:
+            params["match"] = match_expr(long_terms)
+            base = "FROM doc_text_fts f JOIN doc_text d ON d.id = f.rowid JOIN books b ON b.id = d.book_id WHERE doc_text_fts MATCH :match"
+            cond = "".join(" AND " + w for w in where)
+            select_cols = f"d.id, d.book_id, b.title, d.page_number, d.bbox_x, d.bbox_y, d.bbox_w, d.bbox_h, snippet(doc_text_fts, 0, '{MARK_OPEN}', '{MARK_CLOSE}', '…', 24), bm25(doc_text_fts)"
+            order = "ORDER BY bm25(doc_text_fts)"
+        else:
+            base = "FROM doc_text d JOIN books b ON b.id = d.book_id WHERE 1 = 1"
+            cond = "".join(" AND " + w for w in where)
+            select_cols = "d.id, d.book_id, b.title, d.page_number, d.bbox_x, d.bbox_y, d.bbox_w, d.bbox_h, d.text, NULL"
+            order = "ORDER BY d.book_id, d.page_number, d.id"
+        total = db.execute(text(f"SELECT count(*) {base}{cond}"), params).scalar_one()
+        rows = db.execute(text(f"SELECT {select_cols} {base}{cond} {order} LIMIT :limit OFFSET :offset"), params).all()
+        items = []
+        for r in rows:
+            snippet = r[8] if long_terms else like_snippet(r[8], short_terms)
+            items.append({
+                "doc_text_id": r[0],
+                "book_id": r[1],
+                "book_title": r[2],
+                "page_number": r[3],
+                "bbox_x": r[4],
+                "bbox_y": r[5],
+                "bbox_w": r[6],
+                "bbox_h": r[7],
+                "snippet": snippet,
+                "score": -r[9] if r[9] is not None else None,
+            })
+        return items, total
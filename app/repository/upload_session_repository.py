@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import update, or_
+from sqlalchemy.orm import Session
+from app.model.upload_session import UploadSession
+
+class UploadSessionRepository:
+    def create(self, db: Session, upload: UploadSession) -> UploadSession:
+        db.add(upload)
+        db.commit()
+        db.refresh(upload)
+        return upload
+
+    def get(self, db: Session, upload_id: str) -> Optional[UploadSession]:
+        return db.get(UploadSession, upload_id)
+
+    def update(self, db: Session, upload: UploadSession, data: dict) -> UploadSession:
+        for k, v in data.items():
+            setattr(upload, k, v)
+        db.add(upload)
+        db.commit()
+        db.refresh(upload)
+        return upload
+
+    def delete(self, db: Session, upload: UploadSession) -> None:
+        db.delete(upload)
+        db.commit()
+
+    def claim_writer(self, db: Session, upload_id: str, offset: int, token: str, lease_seconds: int) -> bool:
+        now = datetime.utcnow()
+        stmt = (
+            update(UploadSession)
+            .where(UploadSession.id == upload_id, UploadSession.received == offset, or_(UploadSession.writer.is_(None), UploadSession.writer_expires_at < now))
+            .values(writer=token, writer_expires_at=now + timedelta(seconds=lease_seconds))
+            .execution_options(synchronize_session=False)
+        )
+        claimed = db.execute(stmt).rowcount == 1
+        db.commit()
+        return claimed
+
+    def release_writer(self, db: Session, upload_id: str, token: str, received: int) -> Optional[UploadSession]:
+        # a writer whose lease expired and was taken over does not move the offset
+        stmt = (
+            update(UploadSession)
+            .where(UploadSession.id == upload_id, UploadSession.writer == token)
+            .values(received=received, updated_at=datetime.utcnow(), writer=None, writer_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(stmt)
+        db.commit()
+        return db.get(UploadSession, upload_id, populate_existing=True)
@@ -22,6 +22,7 @@ class BookUpdate(BaseModel):
 class BookRead(BookBase):
     id: int
     cover_url: Optional[str] = None
+    cover_thumb_url: Optional[str] = None
     task_status: Optional[str] = None
     task_pages_count: Optional[int] = None
 
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel
 
 class BookMetaRead(BaseModel):
@@ -15,4 +16,16 @@ class BookMetaRead(BaseModel):
 class UploadBookResponse(BaseModel):
     book: dict
     meta: BookMetaRead
+    deduplicated: bool = False
 
+
+class UploadSessionCreate(BaseModel):
+    file_name: str
+    content_type: str = "application/pdf"
+    size: Optional[int] = None
+
+class UploadSessionRead(BaseModel):
+    upload_id: str
+    file_name: str
+    size: Optional[int] = None
+    received: int
@@ -1,29 +1,151 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from datetime import datetime, timedelta
+import hashlib
 import os
+import re
 import json
+import threading
+import time
 from sqlalchemy.orm import Session
+from app.config import get_settings
+from app.db import SessionLocal
 from app.repository.doc_text_repository import DocTextRepository
+from app.repository.llm_cache_repository import LlmCacheRepository
+from app.service.llm_client import LlmMetrics, get_client
+from app.service.retrieval import retrieval_service
 
-def ask_ai(book_id: int, db: Session, max_rounds: int = 6) -> List[Dict[str, Any]]:
+MODEL = "qwen-plus"
+# bump a kind's version whenever its prompt changes so stale cached answers are not reused
+PROMPT_VERSIONS = {"analyze_chat": 2, "analyze_window": 1, "summary": 1, "summary_part": 1, "summary_reduce": 1}
+
+FANOUT_SYSTEM = "你负责为指定资料生成理解性问题及解析, 帮助读者记忆相关概念。仅以 JSON 数组输出，每项包含 doc_text_id、page_number、question、answer。"
+FANOUT_PROMPT = """
+        下面是一本书中连续的若干文本段落，每段以 [doc_text_id=…, page_number=…] 标注。
+        请针对这些段落设计 1 到 {max_questions} 道考核题目，考核读者对相关概念的理解。
+        问题需要是具体的、可回答的问题，解析需要是对问题的详细解释。
+        每道题的 doc_text_id 与 page_number 取自题目所依据的段落。若文本不足以出题，输出空数组 []。
+
+{texts}
+"""
+
+SUMMARY_PROMPTS = {
+    "summary_part": "下面是一本书中连续的一部分正文。请用约{target_len}字中文总结这部分的核心内容，保留关键概念、论点和结论，不要评价。\n\n{text}",
+    "summary_reduce": "下面是一本书按页码顺序排列的各部分摘要。请将它们整合为约{target_len}字的中文总结，概括全书（或这一段落）的主线和核心信息，不要逐段复述。\n\n{text}",
+}
+
+class ResponseCache:
+    def __init__(self, repo: Optional[LlmCacheRepository] = None):
+        self.repo = repo or LlmCacheRepository()
+        self.settings = get_settings()
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    def key(self, kind: str, messages: List[Dict[str, Any]], tools: Optional[list] = None) -> str:
+        payload = {"model": MODEL, "kind": kind, "version": PROMPT_VERSIONS[kind], "messages": messages, "tools": tools}
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.settings.llm_cache_enabled:
+            return None
+        db = SessionLocal()
+        try:
+            raw = self.repo.get(db, key, self._not_before())
+            self.repo.incr(db, "hits" if raw is not None else "misses")
+        finally:
+            db.close()
+        return json.loads(raw) if raw is not None else None
+
+    def put(self, key: str, kind: str, message: Dict[str, Any]) -> None:
+        if not self.settings.llm_cache_enabled:
+            return
+        with self._lock:
+            self._puts += 1
+            due = self._puts % 64 == 1
+        db = SessionLocal()
+        try:
+            self.repo.put(db, key, MODEL, kind, json.dumps(message, ensure_ascii=False, default=str))
+            if due:
+                n = self.repo.evict(db, self._not_before(), self.settings.llm_cache_max_mb * 1024 * 1024)
+                if n:
+                    self.repo.incr(db, "evictions", n)
+        finally:
+            db.close()
+
+    def stats(self, db: Session) -> Dict[str, Any]:
+        out: Dict[str, Any] = self.repo.stats(db)
+        lookups = out["hits"] + out["misses"]
+        out["hit_ratio"] = round(out["hits"] / lookups, 4) if lookups else None
+        out["enabled"] = self.settings.llm_cache_enabled
+        out["ttl_hours"] = self.settings.llm_cache_ttl_hours
+        out["max_mb"] = self.settings.llm_cache_max_mb
+        return out
+
+    def _not_before(self) -> datetime:
+        return datetime.utcnow() - timedelta(hours=self.settings.llm_cache_ttl_hours)
+
+response_cache = ResponseCache()
+
+def generate(kind: str, messages: List[Dict[str, Any]], api_key: str, tools: Optional[list] = None, deadline: Optional[float] = None, metrics: Optional[LlmMetrics] = None) -> Dict[str, Any]:
+    key = response_cache.key(kind, messages, tools)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+    message = get_client().chat(api_key, MODEL, messages, tools=tools, deadline=deadline, metrics=metrics)
+    response_cache.put(key, kind, message)
+    return message
+
+def task_deadline() -> float:
+    return time.monotonic() + get_settings().llm_task_deadline_seconds
+
+def _fallback(metrics: Optional[LlmMetrics]) -> None:
+    get_client().metrics.record(fallbacks=1)
+    if metrics:
+        metrics.record(fallbacks=1)
+
+def parse_items(content: str, provider: str = "aliyun", model: str = MODEL) -> List[Dict[str, Any]]:
+    try:
+        data = json.loads(content)
+    except Exception:
+        m = re.search(r"\[.*\]", content or "", re.S)
+        if not m:
+            return []
+        try:
+            data = json.loads(m.group(0))
+        except Exception:
+            return []
+    if not isinstance(data, list):
+        return []
+    items: List[Dict[str, Any]] = []
+    for it in data:
+        if not isinstance(it, dict):
+            continue
+        # both texts land in NOT NULL columns, so an item missing either is dropped rather than saved half-empty
+        if not all(isinstance(it.get(k), str) and it[k].strip() for k in ("question", "answer")):
+            continue
+        items.append({
+            "doc_text_id": it.get("doc_text_id"),
+            "page_number": it.get("page_number"),
+            "question": it.get("question"),
+            "answer": it.get("answer"),
+            "provider": provider,
+            "model": model,
+        })
+    return items
+
+def ask_ai(book_id: int, db: Session, max_rounds: int = 6, on_round: Optional[Callable[[int, int], None]] = None, metrics: Optional[LlmMetrics] = None) -> List[Dict[str, Any]]:
     repo = DocTextRepository()
 
     def read_book_texts(start: int = 0, limit: int = 10, page_number: Optional[int] = None) -> str:
-        items = repo.list_range_by_book(db, book_id, start, limit)
-        if page_number is not None:
-            items = [t for t in items if t.page_number == page_number]
-        payload = []
-        for t in items:
-            payload.append({
-                "id": t.id,
-                "book_id": t.book_id,
-                "page_number": t.page_number,
-                "text": t.text or "",
-                "bbox_x": t.bbox_x,
-                "bbox_y": t.bbox_y,
-                "bbox_w": t.bbox_w,
-                "bbox_h": t.bbox_h,
-            })
-        return json.dumps({"items": payload, "count": len(payload), "start": start, "limit": limit})
+        items = repo.list_range_by_book(db, book_id, start, limit, page_number)
+        # the model only needs ids, pages and text; bboxes just cost tokens
+        payload = [{"id": t.id, "page_number": t.page_number, "text": t.text or ""} for t in items]
+        return json.dumps({"items": payload, "count": len(payload), "start": start, "limit": limit}, ensure_ascii=False)
+
+    def search_book_texts(query: str, k: int = 8) -> str:
+        payload = retrieval_service.search(db, book_id, query, max(1, min(int(k), 20)))
+        return json.dumps({"items": payload, "count": len(payload), "query": query}, ensure_ascii=False)
 
     tools = [
         {
@@ -42,6 +164,21 @@ def ask_ai(book_id: int, db: Session, max_rounds: int = 6) -> List[Dict[str, Any
                 },
             },
         },
+        {
+            "type": "function",
+            "function": {
+                "name": "search_book_texts",
+                "description": "按关键词或主题检索指定图书中最相关的文本段落（BM25 排序），返回段落 id、页码、文本与得分。",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "query": {"type": "string", "description": "检索关键词或问题，可包含多个词"},
+                        "k": {"type": "integer", "description": "返回段落数，默认 8，最大 20"},
+                    },
+                    "required": ["query"]
+                },
+            },
+        },
     ]
     prompt = f"""
         请读取接口文本，并针对返回的文本设计考核题目，考核读者对相关概念的理解。
@@ -54,42 +191,17 @@ def ask_ai(book_id: int, db: Session, max_rounds: int = 6) -> List[Dict[str, Any
     """
 
     messages = [
-        {"role": "system", "content": "你负责为指定资料生成若干理解性问题及解析, 帮助读者记忆相关概念。必要时调用 read_book_texts 获取更多上下文。最终仅以 JSON 数组输出，每项包含 doc_text_id、page_number、question、answer。"},
+        {"role": "system", "content": "你负责为指定资料生成若干理解性问题及解析, 帮助读者记忆相关概念。需要某个主题的上下文时优先调用 search_book_texts 检索相关段落，必要时再用 read_book_texts 顺序读取。最终仅以 JSON 数组输出，每项包含 doc_text_id、page_number、question、answer。"},
         {"role": "user", "content": prompt},
     ]
 
     func_mapper = {
         "read_book_texts": read_book_texts,
+        "search_book_texts": search_book_texts,
     }
 
     api_key = os.getenv("DASHSCOPE_API_KEY")
 
-    def try_parse_items(content: str) -> List[Dict[str, Any]]:
-        try:
-            data = json.loads(content)
-        except Exception:
-            import re
-            m = re.search(r"\[.*\]", content, re.S)
-            if not m:
-                return []
-            try:
-                data = json.loads(m.group(0))
-            except Exception:
-                return []
-        if not isinstance(data, list):
-            return []
-        items: List[Dict[str, Any]] = []
-        for it in data:
-            items.append({
-                "doc_text_id": it.get("doc_text_id"),
-                "page_number": it.get("page_number"),
-                "question": it.get("question"),
-                "answer": it.get("answer"),
-                "provider": "aliyun",
-                "model": "qwen-plus",
-            })
-        return items
-
     def local_fallback(max_items: int = 20) -> List[Dict[str, Any]]:
         items: List[Dict[str, Any]] = []
         cursor = 0
@@ -111,19 +223,9 @@ def ask_ai(book_id: int, db: Session, max_rounds: int = 6) -> List[Dict[str, Any
     if not api_key:
         return local_fallback()
 
+    deadline = task_deadline()
     try:
-        import dashscope
-        def call(messages):
-            return dashscope.Generation.call(
-                api_key=api_key,
-                model="qwen-plus",
-                messages=messages,
-                tools=tools,
-                result_format="message",
-            )
-
-        response = call(messages)
-        assistant_msg = response.output.choices[0].message
+        assistant_msg = generate("analyze_chat", messages, api_key, tools=tools, deadline=deadline, metrics=metrics)
         messages.append(assistant_msg)
 
         rounds = 0
@@ -134,19 +236,112 @@ def ask_ai(book_id: int, db: Session, max_rounds: int = 6) -> List[Dict[str, Any
                 tool_id = tool.get("id")
                 result = func_mapper[name](**args)
                 messages.append({"role": "tool", "content": result, "tool_call_id": tool_id})
-            response = call(messages)
-            assistant_msg = response.output.choices[0].message
+            assistant_msg = generate("analyze_chat", messages, api_key, tools=tools, deadline=deadline, metrics=metrics)
             messages.append(assistant_msg)
             rounds += 1
+            if on_round:
+                on_round(rounds, max_rounds)
 
-        items = try_parse_items(assistant_msg.get("content", ""))
+        items = parse_items(assistant_msg.get("content", ""))
         if items:
             return items
-        return local_fallback()
     except Exception:
-        return local_fallback()
+        pass
+    _fallback(metrics)
+    return local_fallback()
+
+def iter_windows(db: Session, book_id: int, window_chunks: int, uncovered: bool = False):
+    repo = DocTextRepository()
+    after = None
+    while True:
+        batch = repo.list_after_by_book(db, book_id, after, window_chunks, uncovered=uncovered)
+        if not batch:
+            return
+        after = (batch[-1].page_number, batch[-1].id)
+        yield [(t.id, t.page_number, (t.text or "").strip()) for t in batch]
+
+def local_window_items(window) -> List[Dict[str, Any]]:
+    for doc_text_id, page_number, base in window:
+        if base:
+            q = f"请基于该段文本提出理解性问题：{base[:140]}"
+            a = f"解析：该段文本要点概述：{base[:280]}"
+            return [{"doc_text_id": doc_text_id, "page_number": page_number, "question": q, "answer": a, "provider": "local", "model": "fallback"}]
+    return []
+
+def ask_window(window, api_key: Optional[str], deadline: Optional[float] = None, metrics: Optional[LlmMetrics] = None, max_questions: int = 3) -> Tuple[List[Dict[str, Any]], bool]:
+    chunks = [w for w in window if w[2]]
+    if not chunks:
+        return [], True
+    if not api_key:
+        return local_window_items(chunks), False
+    texts = "\n\n".join(f"[doc_text_id={i}, page_number={p}]\n{t}" for i, p, t in chunks)
+    messages = [
+        {"role": "system", "content": FANOUT_SYSTEM},
+        {"role": "user", "content": FANOUT_PROMPT.format(max_questions=max_questions, texts=texts)},
+    ]
+    try:
+        items = parse_items(generate("analyze_window", messages, api_key, deadline=deadline, metrics=metrics).get("content", ""))
+    except Exception:
+        _fallback(metrics)
+        return local_window_items(chunks), False
+    by_id = {i: (i, p) for i, p, _ in chunks}
+    out = []
+    for it in items:
+        try:
+            key = int(it.get("doc_text_id"))
+        except (TypeError, ValueError):
+            key = None
+        # keep results anchored to the window even if the model invents an id
+        it["doc_text_id"], it["page_number"] = by_id.get(key, (chunks[0][0], chunks[0][1]))
+        out.append(it)
+    return out, True
+
+def ask_ai_fanout(book_id: int, db: Session, on_window: Optional[Callable[[int, int], None]] = None, window_chunks: Optional[int] = None, concurrency: Optional[int] = None, metrics: Optional[LlmMetrics] = None, uncovered: bool = False, on_result: Optional[Callable[[list, List[Dict[str, Any]], bool], None]] = None) -> List[Dict[str, Any]]:
+    settings = get_settings()
+    window_chunks = max(1, window_chunks or settings.ai_window_chunks)
+    workers = max(1, concurrency or settings.ai_concurrency)
+    api_key = os.getenv("DASHSCOPE_API_KEY")
+    deadline = task_deadline()
+    total = -(-DocTextRepository().count_by_book(db, book_id, uncovered=uncovered) // window_chunks)
+    results: Dict[int, List[Dict[str, Any]]] = {}
+    pending = deque()
+
+    def collect():
+        idx, window, f = pending.popleft()
+        items, ok = f.result()
+        results[idx] = items
+        # runs on the calling thread, so the callback may write through db
+        if on_result:
+            on_result(window, items, ok)
+        if on_window:
+            on_window(len(results), total)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for idx, window in enumerate(iter_windows(db, book_id, window_chunks, uncovered)):
+            pending.append((idx, window, pool.submit(ask_window, window, api_key, deadline, metrics)))
+            while len(pending) >= workers * 2:
+                collect()
+        while pending:
+            collect()
+    return [it for idx in sorted(results) for it in results[idx]]
+
+def summarize_text(kind: str, text: str, target_len: int, api_key: Optional[str], deadline: Optional[float] = None, metrics: Optional[LlmMetrics] = None) -> Tuple[str, bool]:
+    content = (text or "").strip()
+    if not content:
+        return "", True
+    if api_key:
+        prompt = SUMMARY_PROMPTS[kind].format(target_len=target_len, text=content)
+        try:
+            msg = generate(kind, [{"role": "user", "content": prompt}], api_key, deadline=deadline, metrics=metrics)
+            out = (msg.get("content") or "").strip()
+            if out:
+                return out, True
+        except Exception:
+            pass
+        _fallback(metrics)
+    return content[:target_len], False
 
-def ask_summary(text: str, target_len: int = 200) -> str:
+def ask_summary(text: str, target_len: int = 200, metrics: Optional[LlmMetrics] = None) -> str:
     api_key = os.getenv("DASHSCOPE_API_KEY")
     content = (text or "").strip()
     if not content:
@@ -156,15 +351,9 @@ def ask_summary(text: str, target_len: int = 200) -> str:
         s = content[:target_len*2]
         return s[:target_len]
     try:
-        import dashscope
-        resp = dashscope.Generation.call(
-            api_key=api_key,
-            model="qwen-plus",
-            messages=[{"role": "user", "content": prompt}],
-            result_format="message",
-        )
-        msg = resp.output.choices[0].message
+        msg = generate("summary", [{"role": "user", "content": prompt}], api_key, deadline=task_deadline(), metrics=metrics)
         return (msg.get("content") or "").strip()
     except Exception:
+        _fallback(metrics)
         s = content[:target_len*2]
         return s[:target_len]
@@ -2,15 +2,31 @@ from typing import Optional, List, Tuple
 from sqlalchemy.orm import Session
 from pathlib import Path
 import shutil
+import re
 from app.config import get_settings
 from app.repository.book_meta_repository import BookMetaRepository
 from app.model.book import Book
 from app.repository.book_repository import BookRepository
+from app.repository.text_search_repository import TextSearchRepository
+from app.repository.book_search_repository import BookSearchRepository
+from app.repository.task_log_repository import TaskLogRepository
+from app.repository.summary_part_repository import SummaryPartRepository
+from app.repository.analysis_coverage_repository import AnalysisCoverageRepository
+from app.service.cursor import encode_cursor, decode_cursor
+from app.service.cover_service import cover_service
+from app.service.retrieval import retrieval_service
+
+ISBN_RE = re.compile(r"^(?:\d[\d-]{8,15}[\dXx])$")
 
 class BookService:
     def __init__(self, repo: Optional[BookRepository] = None, meta_repo: Optional[BookMetaRepository] = None):
         self.repo = repo or BookRepository()
         self.meta_repo = meta_repo or BookMetaRepository()
+        self.search_repo = TextSearchRepository()
+        self.catalog_repo = BookSearchRepository()
+        self.task_repo = TaskLogRepository()
+        self.summary_repo = SummaryPartRepository()
+        self.coverage_repo = AnalysisCoverageRepository()
 
     def create_book(self, db: Session, data: dict) -> Book:
         isbn = data.get("isbn")
@@ -18,16 +34,33 @@ class BookService:
             existing = self.repo.get_by_isbn(db, isbn)
             if existing:
                 raise ValueError("ISBN already exists")
-        book = Book(**data)
-        return self.repo.create(db, book)
+        book = self.repo.create(db, Book(**data))
+        self.catalog_repo.upsert(db, book)
+        return book
+
+    def create_books(self, db: Session, rows: List[dict]) -> List[Book]:
+        # batch uploads carry no ISBNs, so only the catalog index needs updating; the caller commits
+        books = self.repo.create_many(db, [Book(**data) for data in rows])
+        for book in books:
+            self.catalog_repo.upsert(db, book, commit=False)
+        return books
 
     def get_book(self, db: Session, book_id: int) -> Optional[Book]:
         return self.repo.get(db, book_id)
 
     def list_books(self, db: Session, q: Optional[str], page: int, page_size: int) -> Tuple[List[Book], int]:
         offset = (page - 1) * page_size
+        if q and ISBN_RE.match(q.strip()):
+            book = self.repo.get_by_isbn(db, q.strip())
+            if book:
+                return ([book] if offset == 0 else []), 1
         return self.repo.list(db, q, offset, page_size)
 
+    def list_books_after(self, db: Session, q: Optional[str], cursor: Optional[str], page_size: int) -> Tuple[List[Book], Optional[str]]:
+        after = decode_cursor(cursor, str, int) if cursor else None
+        items, next_key = self.repo.list_after(db, q, after, page_size)
+        return items, encode_cursor(*next_key) if next_key else None
+
     def update_book(self, db: Session, book_id: int, data: dict) -> Optional[Book]:
         book = self.repo.get(db, book_id)
         if not book:
@@ -37,7 +70,9 @@ class BookService:
             existing = self.repo.get_by_isbn(db, isbn)
             if existing:
                 raise ValueError("ISBN already exists")
-        return self.repo.update(db, book, data)
+        book = self.repo.update(db, book, data)
+        self.catalog_repo.upsert(db, book)
+        return book
 
     def delete_book(self, db: Session, book_id: int) -> bool:
         book = self.repo.get(db, book_id)
@@ -46,29 +81,36 @@ class BookService:
         settings = get_settings()
         metas = self.meta_repo.list_by_book(db, book_id)
         for m in metas:
+            shared = self.meta_repo.count_other_refs(db, m.file_path, book_id) > 0
+            if not shared:
+                try:
+                    p = Path(m.file_path)
+                    if p.exists():
+                        p.unlink()
+                except Exception:
+                    pass
+                try:
+                    if m.cover_file:
+                        cp = settings.covers_dir / m.cover_file
+                        if cp.is_file():
+                            cp.unlink()
+                    cover_service.purge(m.sha256)
+                except Exception:
+                    pass
+        split_dirs = {str(settings.files_dir / Path(m.file_name).stem) for m in metas}
+        split_dirs.update(self.task_repo.output_dirs_by_book(db, book_id))
+        for d in split_dirs:
             try:
-                p = Path(m.file_path)
-                if p.exists():
-                    p.unlink()
-            except Exception:
-                pass
-            try:
-                split_dir = settings.files_dir / Path(m.file_name).stem
-                if split_dir.exists():
-                    shutil.rmtree(split_dir, ignore_errors=True)
-            except Exception:
-                pass
-            try:
-                if m.cover_file:
-                    cp = settings.covers_dir / m.cover_file
-                    if cp.exists():
-                        cp.unlink()
-                    fe = settings.covers_dir.parent.parent / "front" / "public" / "covers" / m.cover_file
-                    if fe.exists():
-                        fe.unlink()
+                if Path(d).exists() and not self.task_repo.count_other_output_refs(db, d, book_id):
+                    shutil.rmtree(d, ignore_errors=True)
             except Exception:
                 pass
         if metas:
             self.meta_repo.delete_many(db, metas)
+        self.search_repo.delete_by_book(db, book_id)
+        self.catalog_repo.delete(db, book_id)
+        self.summary_repo.delete_by_book(db, book_id)
+        self.coverage_repo.delete_by_book(db, book_id)
+        retrieval_service.drop(db, book_id)
         self.repo.delete(db, book)
         return True
@@ -0,0 +1,195 @@
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from app.config import get_settings
+
+Bbox = Tuple[float, float, float, float]
+
+# ASCII terminators only end a sentence before whitespace ("3.14", "a.b" stay whole);
+# CJK terminators end one on their own, together with any closing quotes or brackets.
+# The leading lookahead lets the scanner skip to candidate characters instead of trying both branches everywhere.
+SENT_END_RE = re.compile(r"(?=[.!?。！？])(?:[.!?]+[\"')\]]*(?=\s)|[。！？]+[」』”’）》]*)")
+CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+CJK_RE = re.compile(f"[{CJK_CHARS}]")
+# CJK text puts no space between words or sentences, so pieces are glued directly where either side of the seam is CJK
+CJK_SEAM_RE = re.compile(f"[{CJK_CHARS}\u3000-\u303f\uff00-\uffef]")
+CJK_END_RE = re.compile(r"[。！？][」』”’）》]*$")
+
+def approx_tokens(text: str) -> int:
+    cjk = len(CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+def gap(left: str, right: str) -> str:
+    if (CJK_SEAM_RE.match(left[-1]) and CJK_SEAM_RE.match(right[0])) or CJK_END_RE.search(left):
+        return ""
+    return " "
+
+def join_text(parts: List[str]) -> str:
+    out = [parts[0]]
+    for prev, cur in zip(parts, parts[1:]):
+        out.append(gap(prev, cur))
+        out.append(cur)
+    return "".join(out)
+
+def split_sentences(text: str) -> List[str]:
+    out = []
+    start = 0
+    for m in SENT_END_RE.finditer(text):
+        s = text[start:m.end()].strip()
+        if s:
+            out.append(s)
+        start = m.end()
+    s = text[start:].strip()
+    if s:
+        out.append(s)
+    return out or [text]
+
+class Chunker:
+    def __init__(self, target: int = 400, max_size: Optional[int] = None, overlap: int = 0, unit: str = "chars", min_block: Optional[int] = None):
+        if unit not in ("chars", "tokens"):
+            raise ValueError(f"unknown chunk unit: {unit}")
+        self.unit = unit
+        self.target = max(1, target)
+        self.max_size = max(self.target, max_size or self.target * 2)
+        self.overlap = max(0, min(overlap, self.target // 2))
+        self.min_block = self.target // 2 if min_block is None else min_block
+        self.measure = len if unit == "chars" else approx_tokens
+        self.sep = 1 if unit == "chars" else 0
+
+    def chunk_page(self, page) -> List[Tuple[str, Bbox]]:
+        return self.chunk_blocks(page.get_text("dict").get("blocks", []))
+
+    def chunk_blocks(self, blocks: Iterable[dict]) -> List[Tuple[str, Bbox]]:
+        out = []
+        for text, (x0, y0, x1, y1), cjk in self._groups(self._segments(blocks)):
+            bbox = (float(x0), float(y0), float(max(0.0, x1 - x0)), float(max(0.0, y1 - y0)))
+            for ch in self._chunk(text, cjk):
+                out.append((ch, bbox))
+        return out
+
+    def chunk_text(self, text: str) -> List[str]:
+        return self._chunk(text, CJK_SEAM_RE.search(text) is not None)
+
+    def _chunk(self, text: str, cjk: bool) -> List[str]:
+        chunks: List[str] = []
+        buf: List[str] = []
+        sizes: List[int] = []
+        size = 0
+        fresh = 0
+        # most text has no CJK at all and keeps the plain single-space joins
+        join = join_text if cjk else " ".join
+        for sent in split_sentences(text):
+            n = self.measure(sent)
+            if n > self.max_size:
+                if fresh:
+                    chunks.append(join(buf))
+                chunks.extend(self._hard_split(sent))
+                buf, sizes, size, fresh = [], [], 0, 0
+                continue
+            sep = self._sep(buf[-1], sent, cjk) if buf else 0
+            if fresh and size + sep + n > self.target:
+                chunks.append(join(buf))
+                buf, sizes, size = self._tail(buf, sizes, n)
+                sep = self._sep(buf[-1], sent, cjk) if buf else 0
+                fresh = 0
+            size += sep
+            buf.append(sent)
+            sizes.append(n)
+            size += n
+            fresh += 1
+        if fresh:
+            chunks.append(join(buf))
+        return chunks
+
+    def _sep(self, left: str, right: str, cjk: bool = True) -> int:
+        if not cjk or not self.sep:
+            return self.sep
+        return self.sep if gap(left, right) else 0
+
+    def _segments(self, blocks: Iterable[dict]) -> Iterator[Tuple[str, Bbox, bool]]:
+        for b in blocks:
+            if b.get("type", 0) != 0:
+                continue
+            parts = []
+            x0 = y0 = x1 = y1 = None
+            for line in b.get("lines", []):
+                bb = line.get("bbox")
+                if bb:
+                    x0 = bb[0] if x0 is None else min(x0, bb[0])
+                    y0 = bb[1] if y0 is None else min(y0, bb[1])
+                    x1 = bb[2] if x1 is None else max(x1, bb[2])
+                    y1 = bb[3] if y1 is None else max(y1, bb[3])
+                parts.append("".join([s.get("text", "") for s in line.get("spans", [])]))
+            # str.split() collapses the same unicode whitespace as \s+ without the regex engine
+            txt = " ".join(" ".join(parts).split())
+            if not txt:
+                continue
+            cjk = CJK_SEAM_RE.search(txt) is not None
+            if cjk:
+                txt = join_text([p for p in (" ".join(p.split()) for p in parts) if p])
+            yield txt, (x0 or 0.0, y0 or 0.0, x1 or 0.0, y1 or 0.0), cjk
+
+    def _groups(self, segments: Iterable[Tuple[str, Bbox, bool]]) -> Iterator[Tuple[str, Bbox, bool]]:
+        # merge short neighbouring blocks (headings, captions) until they are worth a chunk
+        buf: List[str] = []
+        size = 0
+        box = None
+        cjk = False
+        for txt, bb, seg_cjk in segments:
+            cjk = cjk or seg_cjk
+            if buf:
+                size += self._sep(buf[-1], txt, cjk)
+                box = (min(box[0], bb[0]), min(box[1], bb[1]), max(box[2], bb[2]), max(box[3], bb[3]))
+            else:
+                box = bb
+            buf.append(txt)
+            size += self.measure(txt)
+            if size >= self.min_block:
+                yield (join_text(buf) if cjk else " ".join(buf)), box, cjk
+                buf, size, cjk = [], 0, False
+        if buf:
+            yield (join_text(buf) if cjk else " ".join(buf)), box, cjk
+
+    def _tail(self, buf: List[str], sizes: List[int], incoming: int) -> Tuple[List[str], List[int], int]:
+        if not self.overlap:
+            return [], [], 0
+        keep = 0
+        size = 0
+        for n in reversed(sizes):
+            extra = n + (self.sep if keep else 0)
+            if size + extra > self.overlap or size + extra + self.sep + incoming > self.target:
+                break
+            size += extra
+            keep += 1
+        if not keep:
+            return [], [], 0
+        return buf[-keep:], sizes[-keep:], size
+
+    def _hard_split(self, sent: str) -> List[str]:
+        # run-on text without sentence breaks is cut into target-sized pieces, at a space where possible
+        width = self.target if self.unit == "chars" or CJK_RE.search(sent) else self.target * 4
+        out = []
+        start = 0
+        while start < len(sent):
+            end = min(len(sent), start + width)
+            if end < len(sent):
+                cut = sent.rfind(" ", start + width // 2, end)
+                if cut > start:
+                    end = cut
+            piece = sent[start:end].strip()
+            if piece:
+                out.append(piece)
+            start = end
+        return out
+
+_chunker: Optional[Chunker] = None
+
+def default_chunker() -> Chunker:
+    global _chunker
+    if _chunker is None:
+        s = get_settings()
+        _chunker = Chunker(s.chunk_target, s.chunk_max, s.chunk_overlap, s.chunk_unit)
+    return _chunker
+
+def extract_page_chunks(page) -> List[Tuple[str, Bbox]]:
+    return default_chunker().chunk_page(page)
@@ -0,0 +1,149 @@
+import io
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import fitz
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.repository.book_meta_repository import BookMetaRepository
+
+try:
+    from PIL import Image
+except ImportError:  # webp thumbnails need the optional Pillow dependency
+    Image = None
+
+# bump when rendering changes so ETags of previously cached thumbnails stop matching
+COVER_VERSION = 1
+SIZES: Dict[str, int] = {"sm": 240, "md": 480, "lg": 960}
+MIME = {"jpg": "image/jpeg", "webp": "image/webp"}
+QUALITY = 80
+
+def formats() -> Tuple[str, ...]:
+    return ("webp", "jpg") if Image is not None else ("jpg",)
+
+def cover_url(sha: str, size: str = "lg", fmt: str = "jpg") -> str:
+    return f"/covers/{sha}/{size}.{fmt}"
+
+def render_cover(pdf_path: str, width: int, fmt: str) -> Tuple[bytes, int, int]:
+    doc = fitz.open(pdf_path)
+    try:
+        page = doc.load_page(0)
+        zoom = width / page.rect.width if page.rect.width else 1.0
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    finally:
+        doc.close()
+    if fmt == "webp":
+        img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        buf = io.BytesIO()
+        img.save(buf, "WEBP", quality=QUALITY, method=4)
+        return buf.getvalue(), pix.width, pix.height
+    return pix.tobytes("jpeg", jpg_quality=QUALITY), pix.width, pix.height
+
+class CoverService:
+    def __init__(self, meta_repo: Optional[BookMetaRepository] = None, cache_dir: Optional[Path] = None, max_bytes: Optional[int] = None):
+        settings = get_settings()
+        self.meta_repo = meta_repo or BookMetaRepository()
+        self.cache_dir = Path(cache_dir or settings.covers_dir)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.cover_cache_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._total: Optional[int] = None
+
+    def etag(self, sha: str, size: str, fmt: str) -> str:
+        return f'"{sha[:32]}-{size}-{COVER_VERSION}.{fmt}"'
+
+    def get(self, db: Session, sha: str, size: str, fmt: str) -> Optional[bytes]:
+        if size not in SIZES or fmt not in formats():
+            return None
+        path = self.cache_dir / sha / f"{size}.{fmt}"
+        try:
+            data = path.read_bytes()
+            # mtime doubles as the LRU clock (atime is unreliable on noatime mounts)
+            os.utime(path)
+            return data
+        except OSError:
+            pass
+        src = self._source(db, sha)
+        if src is None:
+            return None
+        data, _, _ = render_cover(src, SIZES[size], fmt)
+        self._store(path, data)
+        return data
+
+    def warm(self, db: Session, sha: str, sizes: Tuple[str, ...] = ("sm", "lg")) -> Optional[Tuple[int, int]]:
+        src = self._source(db, sha)
+        if src is None:
+            return None
+        dims = None
+        for size in sizes:
+            for fmt in formats():
+                data, w, h = render_cover(src, SIZES[size], fmt)
+                self._store(self.cache_dir / sha / f"{size}.{fmt}", data)
+                dims = (w, h)
+        return dims
+
+    def purge(self, sha: str) -> None:
+        d = self.cache_dir / sha
+        if d.is_dir():
+            shutil.rmtree(d, ignore_errors=True)
+            with self._lock:
+                self._total = None
+
+    def _source(self, db: Session, sha: str) -> Optional[str]:
+        for m in self.meta_repo.list_by_sha256(db, sha):
+            if Path(m.file_path).exists():
+                return m.file_path
+        return None
+
+    def _store(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._entries())
+            else:
+                self._total += len(data)
+            if self._total > self.max_bytes:
+                self._evict(keep=path)
+
+    def _entries(self):
+        out = []
+        for d in self.cache_dir.iterdir():
+            if not d.is_dir():
+                continue
+            for f in d.iterdir():
+                if f.name.startswith("."):
+                    continue
+                try:
+                    st = f.stat()
+                except OSError:
+                    continue
+                out.append((st.st_mtime, st.st_size, f))
+        return out
+
+    def _evict(self, keep: Path) -> None:
+        entries = sorted(self._entries())
+        total = sum(e[1] for e in entries)
+        # evict least recently served thumbnails down to 90% of the cap
+        target = self.max_bytes * 9 // 10
+        for _, size, f in entries:
+            if total <= target:
+                break
+            if f == keep:
+                continue
+            try:
+                f.unlink()
+                total -= size
+            except OSError:
+                pass
+            try:
+                f.parent.rmdir()
+            except OSError:
+                pass
+        self._total = total
+
+cover_service = CoverService()
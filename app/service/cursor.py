@@ -0,0 +1,14 @@
+import base64
+import json
+
+def encode_cursor(*values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str, *types) -> tuple:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if len(values) != len(types):
+            raise ValueError("Invalid cursor")
+        return tuple(t(v) for t, v in zip(types, values))
+    except Exception:
+        raise ValueError("Invalid cursor")
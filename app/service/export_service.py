@@ -0,0 +1,262 @@
+import gzip
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.api.responses import dumps
+from app.db import SessionLocal
+from app.model.analysis_coverage import AnalysisCoverage
+from app.model.book import Book
+from app.model.doc_text import DocText
+from app.model.explanation import Explanation
+from app.model.question import Question
+from app.model.task_log import TaskLog
+from app.repository.analysis_coverage_repository import AnalysisCoverageRepository
+from app.repository.book_meta_repository import BookMetaRepository
+from app.repository.bulk import bulk_insert
+from app.repository.doc_text_repository import DocTextRepository
+from app.repository.explanation_repository import ExplanationRepository
+from app.repository.question_repository import QuestionRepository
+from app.repository.task_log_repository import TaskLogRepository
+from app.repository.text_search_repository import TextSearchRepository
+from app.service.book_service import BookService
+
+try:
+    import zstandard
+except ImportError:  # zstd streams need the optional zstandard dependency; gzip is always available
+    zstandard = None
+
+FORMAT = "bitebook-export"
+VERSION = 1
+BOOK_FIELDS = ("title", "author", "description", "summary", "published_year", "isbn")
+TEXT_FIELDS = ("id", "page_number", "source", "file_path", "text", "bbox_x", "bbox_y", "bbox_w", "bbox_h")
+QUESTION_FIELDS = ("id", "doc_text_id", "page_number", "text")
+EXPLANATION_FIELDS = ("question_id", "text", "provider", "model")
+COVERAGE_FIELDS = ("doc_text_id", "fallback")
+FLUSH_BYTES = 64 * 1024
+# per record type: field -> (accepted types, required); bool is rejected where an int is expected
+NUM = (int, float)
+RECORD_SCHEMA = {
+    "book": {"title": (str, True), "author": (str, True), "description": (str, False), "summary": (str, False), "published_year": (int, False), "isbn": (str, False), "file_name": (str, False)},
+    "doc_text": {"id": (int, True), "page_number": (int, True), "source": (str, True), "file_path": (str, True), "text": (str, False), "bbox_x": (NUM, False), "bbox_y": (NUM, False), "bbox_w": (NUM, False), "bbox_h": (NUM, False)},
+    "question": {"id": (int, True), "doc_text_id": (int, False), "page_number": (int, False), "text": (str, True)},
+    "explanation": {"question_id": (int, True), "text": (str, True), "provider": (str, False), "model": (str, False)},
+    "coverage": {"doc_text_id": (int, True), "fallback": (bool, False)},
+}
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+class _Compressor:
+    def __init__(self, compress: str):
+        if compress == "zstd":
+            self.obj = zstandard.ZstdCompressor(level=3).compressobj()
+        elif compress == "gzip":
+            self.obj = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        else:
+            self.obj = None
+
+    def feed(self, data: bytes) -> bytes:
+        return self.obj.compress(data) if self.obj else data
+
+    def finish(self) -> bytes:
+        if not self.obj:
+            return b""
+        return self.obj.flush()
+
+class ExportService:
+    def __init__(self):
+        self.book_service = BookService()
+        self.meta_repo = BookMetaRepository()
+        self.text_repo = DocTextRepository()
+        self.question_repo = QuestionRepository()
+        self.expl_repo = ExplanationRepository()
+        self.coverage_repo = AnalysisCoverageRepository()
+        self.search_repo = TextSearchRepository()
+        self.task_repo = TaskLogRepository()
+
+    def stream(self, book_id: int, compress: str = "none", batch_size: int = 1000) -> Iterator[bytes]:
+        if compress == "zstd" and zstandard is None:
+            raise ValueError("zstd export requires the zstandard package")
+        return self._stream(book_id, compress, batch_size)
+
+    def _stream(self, book_id: int, compress: str, batch_size: int) -> Iterator[bytes]:
+        # the request session may be closed before the body is sent, so the stream owns its session
+        db = SessionLocal()
+        try:
+            enc = _Compressor(compress)
+            buf = bytearray()
+            for line in self._lines(db, book_id, batch_size):
+                buf += line
+                if len(buf) >= FLUSH_BYTES:
+                    out = enc.feed(bytes(buf))
+                    buf.clear()
+                    if out:
+                        yield out
+            yield enc.feed(bytes(buf)) + enc.finish()
+        finally:
+            db.close()
+
+    def _lines(self, db: Session, book_id: int, batch_size: int) -> Iterator[bytes]:
+        book = db.get(Book, book_id)
+        if not book:
+            return
+        metas = self.meta_repo.list_by_book(db, book_id)
+        yield dumps({"type": "header", "format": FORMAT, "version": VERSION, "book_id": book_id, "exported_at": datetime.utcnow().isoformat()}) + b"\n"
+        head = {k: getattr(book, k) for k in BOOK_FIELDS}
+        head["file_name"] = metas[0].file_name if metas else None
+        yield dumps({"type": "book", **head}) + b"\n"
+        counts = {"doc_text": 0, "question": 0, "explanation": 0, "coverage": 0}
+        sections = (
+            ("doc_text", TEXT_FIELDS, self.text_repo.iter_by_book(db, book_id, [getattr(DocText, k) for k in TEXT_FIELDS], batch_size)),
+            ("question", QUESTION_FIELDS, self.question_repo.iter_by_book(db, book_id, [getattr(Question, k) for k in QUESTION_FIELDS], batch_size)),
+            ("explanation", EXPLANATION_FIELDS, self.expl_repo.iter_by_book(db, book_id, [getattr(Explanation, k) for k in EXPLANATION_FIELDS], batch_size)),
+            ("coverage", COVERAGE_FIELDS, self.coverage_repo.iter_by_book(db, book_id, [getattr(AnalysisCoverage, k) for k in COVERAGE_FIELDS], batch_size)),
+        )
+        for kind, fields, batches in sections:
+            for rows in batches:
+                yield b"".join(dumps({"type": kind, **dict(zip(fields, r))}) + b"\n" for r in rows)
+                counts[kind] += len(rows)
+        yield dumps({"type": "end", "counts": counts}) + b"\n"
+
+    def import_stream(self, db: Session, f: BinaryIO, batch_size: int = 1000) -> Dict[str, Any]:
+        reader = self._open(f)
+        book: Optional[Book] = None
+        try:
+            state = _ImportState(batch_size)
+            for n, raw in enumerate(reader, 1):
+                if not raw.strip():
+                    continue
+                try:
+                    rec = json.loads(raw)
+                except ValueError:
+                    raise ValueError(f"line {n}: invalid JSON")
+                if not isinstance(rec, dict):
+                    raise ValueError(f"line {n}: record is not an object")
+                kind = rec.pop("type", None)
+                if state.header is None:
+                    if kind != "header" or rec.get("format") != FORMAT:
+                        raise ValueError("not a bitebook export")
+                    if not isinstance(rec.get("version"), int) or rec["version"] > VERSION:
+                        raise ValueError(f"unsupported export version {rec.get('version')}")
+                    state.header = rec
+                    continue
+                if kind in RECORD_SCHEMA:
+                    _check(n, kind, rec)
+                if kind == "book":
+                    if book is not None:
+                        raise ValueError(f"line {n}: more than one book in export")
+                    if not rec["title"].strip() or not rec["author"].strip():
+                        raise ValueError(f"line {n}: book needs a title and an author")
+                    if rec.get("isbn") and self.book_service.repo.get_by_isbn(db, rec["isbn"]):
+                        raise ValueError("ISBN already exists")
+                    state.file_name = rec.get("file_name") or ""
+                    # flushed, not committed: a failed import rolls the book back with its rows
+                    book = Book(**{k: rec.get(k) for k in BOOK_FIELDS})
+                    db.add(book)
+                    db.flush()
+                    self.book_service.catalog_repo.upsert(db, book, commit=False)
+                    state.book_id = book.id
+                elif kind in ("doc_text", "question", "explanation", "coverage"):
+                    if book is None:
+                        raise ValueError(f"line {n}: {kind} before book")
+                    state.add(db, kind, rec)
+                elif kind == "end":
+                    state.flush(db)
+                    state.done = True
+                    break
+                else:
+                    raise ValueError(f"line {n}: unknown record type {kind!r}")
+            if book is None or not state.done:
+                raise ValueError("export is truncated")
+            self._finish(db, book, state)
+            db.commit()
+        except (EOFError, OSError, zlib.error) as e:
+            db.rollback()
+            raise ValueError(f"corrupt export stream: {e}")
+        except (SQLAlchemyError, TypeError, KeyError) as e:
+            db.rollback()
+            raise ValueError(f"invalid export: {e}")
+        except Exception:
+            db.rollback()
+            raise
+        return {"book_id": book.id, "counts": state.counts}
+
+    def _open(self, f: BinaryIO):
+        magic = f.read(4)
+        f.seek(0)
+        if magic.startswith(GZIP_MAGIC):
+            return gzip.GzipFile(fileobj=f)
+        if magic == ZSTD_MAGIC:
+            if zstandard is None:
+                raise ValueError("zstd import requires the zstandard package")
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(f))
+        return f
+
+    def _finish(self, db: Session, book: Book, state: "_ImportState") -> None:
+        self.search_repo.index_book(db, book.id, commit=False)
+        now = datetime.utcnow()
+        note = f"imported from book {state.header.get('book_id')}"
+        tasks = [TaskLog(book_id=book.id, task_type="split_pdf", status="done", message=note, file_name=state.file_name, output_dir="", pages_count=state.pages, checkpoint=state.pages, started_at=now, finished_at=now)]
+        if book.summary:
+            tasks.append(TaskLog(book_id=book.id, task_type="summarize", status="done", message=note, file_name=state.file_name, output_dir="", started_at=now, finished_at=now))
+        self.task_repo.create_many(db, tasks, commit=False)
+
+def _check(n: int, kind: str, rec: dict) -> None:
+    for field, (types, required) in RECORD_SCHEMA[kind].items():
+        v = rec.get(field)
+        if v is None:
+            if required:
+                raise ValueError(f"line {n}: {kind} needs {field}")
+            continue
+        if not isinstance(v, types) or (isinstance(v, bool) and types is not bool):
+            raise ValueError(f"line {n}: {kind}.{field} has the wrong type")
+
+class _ImportState:
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self.header: Optional[dict] = None
+        self.book_id: Optional[int] = None
+        self.file_name = ""
+        self.pages = 0
+        self.done = False
+        # exported ids -> ids in this database; only integers are kept, text is flushed per batch
+        self.text_ids: Dict[int, int] = {}
+        self.question_ids: Dict[int, int] = {}
+        self.kind: Optional[str] = None
+        self.pending: List[dict] = []
+        self.counts = {"doc_text": 0, "question": 0, "explanation": 0, "coverage": 0}
+
+    def add(self, db: Session, kind: str, rec: dict) -> None:
+        if kind != self.kind or len(self.pending) >= self.batch_size:
+            self.flush(db)
+            self.kind = kind
+        self.pending.append(rec)
+
+    def flush(self, db: Session) -> None:
+        rows, kind = self.pending, self.kind
+        self.pending = []
+        if not rows:
+            return
+        if kind == "doc_text":
+            old = [r.get("id") for r in rows]
+            ids = bulk_insert(db, DocText, [{"book_id": self.book_id, **{k: r.get(k) for k in TEXT_FIELDS if k != "id"}} for r in rows], commit=False)
+            self.text_ids.update(zip(old, ids))
+            self.pages = max(self.pages, max(r.get("page_number") or 0 for r in rows))
+        elif kind == "question":
+            old = [r.get("id") for r in rows]
+            ids = bulk_insert(db, Question, [{"book_id": self.book_id, "doc_text_id": self.text_ids.get(r.get("doc_text_id")), "page_number": r.get("page_number"), "text": r.get("text") or ""} for r in rows], commit=False)
+            self.question_ids.update(zip(old, ids))
+        elif kind == "explanation":
+            rows = [r for r in rows if r.get("question_id") in self.question_ids]
+            bulk_insert(db, Explanation, [{"question_id": self.question_ids[r["question_id"]], "text": r.get("text") or "", "provider": r.get("provider"), "model": r.get("model")} for r in rows], returning=False, commit=False)
+        elif kind == "coverage":
+            rows = [r for r in rows if r.get("doc_text_id") in self.text_ids]
+            now = datetime.utcnow()
+            bulk_insert(db, AnalysisCoverage, [{"doc_text_id": self.text_ids[r["doc_text_id"]], "book_id": self.book_id, "fallback": bool(r.get("fallback")), "created_at": now} for r in rows], returning=False, commit=False)
+        self.counts[kind] += len(rows)
+
+export_service = ExportService()
@@ -0,0 +1,203 @@
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import get_settings
+from app.db import SessionLocal
+from app.repository.rate_limit_repository import RateLimitRepository
+
+GENERATION_PATH = "/services/aigc/text-generation/generation"
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+class LlmError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None, retryable: bool = False):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+
+class DeadlineExceeded(LlmError):
+    pass
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, deadline: Optional[float] = None) -> bool:
+        if self.rate <= 0:
+            return True
+        while True:
+            wait = self._take()
+            if wait <= 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def _take(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+class SharedRateLimiter(RateLimiter):
+    # the bucket lives in a database row, so the API process and every worker process draw from one DashScope quota
+    def __init__(self, name: str, rate: float, burst: int = 1, repo: Optional[RateLimitRepository] = None):
+        super().__init__(rate, burst)
+        self.name = name
+        self.repo = repo or RateLimitRepository()
+
+    def _take(self) -> float:
+        db = SessionLocal()
+        try:
+            return self.repo.take(db, self.name, self.rate, self.capacity, time.time())
+        finally:
+            db.close()
+
+class LlmMetrics:
+    def __init__(self, window: int = 1000):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.fallbacks = 0
+        self.throttle_wait = 0.0
+
+    def record(self, **counts) -> None:
+        with self.lock:
+            for k, v in counts.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def observe(self, seconds: float) -> None:
+        with self.lock:
+            self.latencies.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            lat = sorted(self.latencies)
+            out = {
+                "calls": self.calls,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "failures": self.failures,
+                "fallbacks": self.fallbacks,
+                "throttle_wait_seconds": round(self.throttle_wait, 3),
+            }
+        out["latency_p50_ms"] = round(lat[len(lat) // 2] * 1000, 1) if lat else None
+        out["latency_p99_ms"] = round(lat[min(len(lat) - 1, int(len(lat) * 0.99))] * 1000, 1) if lat else None
+        return out
+
+class LlmClient:
+    def __init__(self, base_url: Optional[str] = None, rate: Optional[float] = None, burst: Optional[int] = None):
+        self.settings = get_settings()
+        self.base_url = (base_url or self.settings.dashscope_base_url).rstrip("/")
+        self.limiter = SharedRateLimiter("dashscope", self.settings.ai_rate_per_second if rate is None else rate, burst or self.settings.ai_rate_burst)
+        self.metrics = LlmMetrics()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(4, self.settings.ai_concurrency * 2))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def chat(self, api_key: str, model: str, messages: List[Dict[str, Any]], tools: Optional[list] = None, deadline: Optional[float] = None, metrics: Optional[LlmMetrics] = None) -> Dict[str, Any]:
+        sinks = [self.metrics] + ([metrics] if metrics else [])
+        body: Dict[str, Any] = {"model": model, "input": {"messages": messages}, "parameters": {"result_format": "message"}}
+        if tools:
+            body["parameters"]["tools"] = tools
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        for m in sinks:
+            m.record(calls=1)
+        attempts = max(1, self.settings.llm_max_attempts)
+        for attempt in range(attempts):
+            waited = time.monotonic()
+            if not self.limiter.acquire(deadline):
+                self._fail(sinks)
+                raise DeadlineExceeded("deadline exceeded waiting for rate limit")
+            timeout = self.settings.llm_timeout_seconds
+            now = time.monotonic()
+            for m in sinks:
+                m.record(attempts=1, throttle_wait=now - waited)
+            if deadline is not None:
+                timeout = min(timeout, deadline - now)
+                if timeout <= 0:
+                    self._fail(sinks)
+                    raise DeadlineExceeded("deadline exceeded")
+            t0 = time.monotonic()
+            retry_after = None
+            try:
+                resp = self.session.post(self.base_url + GENERATION_PATH, json=body, headers=headers, timeout=(min(5.0, timeout), timeout))
+                for m in sinks:
+                    m.observe(time.monotonic() - t0)
+                if resp.status_code == 200:
+                    return self._message(resp.json())
+                err = LlmError(f"HTTP {resp.status_code}: {resp.text[:200]}", resp.status_code, resp.status_code in RETRY_STATUS)
+                retry_after = resp.headers.get("Retry-After")
+                if resp.status_code == 429:
+                    for m in sinks:
+                        m.record(throttled=1)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                err = LlmError(str(e), None, True)
+            except ValueError as e:
+                err = LlmError(f"invalid response: {e}")
+            if not err.retryable or attempt == attempts - 1:
+                self._fail(sinks)
+                raise err
+            delay = self._backoff(attempt, retry_after)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                self._fail(sinks)
+                raise DeadlineExceeded(f"deadline exceeded after {attempt + 1} attempts: {err}")
+            for m in sinks:
+                m.record(retries=1)
+            time.sleep(delay)
+        raise LlmError("unreachable")
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        cap = min(self.settings.llm_backoff_max_seconds, self.settings.llm_backoff_seconds * (2 ** attempt))
+        # full jitter keeps concurrent windows from retrying in lockstep after a 429 burst
+        delay = random.uniform(0, cap)
+        try:
+            if retry_after is not None:
+                delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+        return delay
+
+    def _fail(self, sinks) -> None:
+        for m in sinks:
+            m.record(failures=1)
+
+    def _message(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            msg = data["output"]["choices"][0]["message"]
+        except (KeyError, IndexError, TypeError):
+            raise LlmError(f"unexpected response: {str(data)[:200]}")
+        out = {"role": msg.get("role") or "assistant", "content": msg.get("content") or ""}
+        if msg.get("tool_calls"):
+            out["tool_calls"] = msg["tool_calls"]
+        return out
+
+_client: Optional[LlmClient] = None
+_client_lock = threading.Lock()
+
+def get_client() -> LlmClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LlmClient()
+    return _client
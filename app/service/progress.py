@@ -0,0 +1,102 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.db import SessionLocal
+from app.model.task_log import TaskLog
+from app.repository.task_log_repository import TaskLogRepository
+
+TERMINAL = ("done", "failed", "gone")
+
+def task_snapshot(task: TaskLog) -> Dict[str, Any]:
+    try:
+        progress = json.loads(task.progress) if task.progress else None
+    except ValueError:
+        progress = None
+    return {
+        "task_id": task.id,
+        "book_id": task.book_id,
+        "task_type": task.task_type,
+        "status": task.status,
+        "message": task.message,
+        "pages_count": task.pages_count,
+        "progress": progress,
+    }
+
+class ProgressHub:
+    def __init__(self, repo: Optional[TaskLogRepository] = None):
+        self.repo = repo or TaskLogRepository()
+        self.settings = get_settings()
+        self._subs: Dict[int, Set[asyncio.Queue]] = {}
+        self._pollers: Dict[int, asyncio.Task] = {}
+        self._last: Dict[int, Dict[str, Any]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def publish(self, task_id: int, snapshot: Dict[str, Any]) -> None:
+        loop = self._loop
+        if loop is None or task_id not in self._subs:
+            return
+        loop.call_soon_threadsafe(self._fanout, task_id, snapshot)
+
+    async def subscribe(self, task_id: int, keepalive: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        self._loop = asyncio.get_running_loop()
+        q: asyncio.Queue = asyncio.Queue(maxsize=16)
+        self._subs.setdefault(task_id, set()).add(q)
+        if task_id not in self._pollers:
+            self._pollers[task_id] = asyncio.create_task(self._poll(task_id))
+        try:
+            if task_id in self._last:
+                q.put_nowait(self._last[task_id])
+            while True:
+                try:
+                    snap = await asyncio.wait_for(q.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield snap
+                if snap["status"] in TERMINAL:
+                    break
+        finally:
+            subs = self._subs.get(task_id)
+            if subs is not None:
+                subs.discard(q)
+                if not subs:
+                    self._subs.pop(task_id, None)
+                    self._last.pop(task_id, None)
+                    poller = self._pollers.pop(task_id, None)
+                    if poller:
+                        poller.cancel()
+
+    def _fanout(self, task_id: int, snapshot: Dict[str, Any]) -> None:
+        if self._last.get(task_id) == snapshot:
+            return
+        self._last[task_id] = snapshot
+        for q in self._subs.get(task_id, ()):
+            if q.full():
+                q.get_nowait()
+            q.put_nowait(snapshot)
+
+    async def _poll(self, task_id: int) -> None:
+        while True:
+            snap = await run_in_threadpool(self._load, task_id)
+            if snap is None:
+                # the task row was deleted (e.g. with its book); end the streams instead of leaving them on keepalives
+                self._fanout(task_id, {"task_id": task_id, "status": "gone"})
+                return
+            self._fanout(task_id, snap)
+            if snap["status"] in TERMINAL:
+                return
+            await asyncio.sleep(self.settings.progress_poll_seconds)
+
+    def _load(self, task_id: int) -> Optional[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            task = self.repo.get(db, task_id)
+            return task_snapshot(task) if task else None
+        finally:
+            db.close()
+
+progress_hub = ProgressHub()
@@ -0,0 +1,142 @@
+import heapq
+import json
+import math
+import re
+import threading
+import zlib
+from collections import Counter, OrderedDict, defaultdict
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.repository.doc_text_repository import DocTextRepository
+from app.repository.retrieval_index_repository import RetrievalIndexRepository
+from app.service.chunker import CJK_CHARS
+
+# bump when tokenisation or the stored format changes; older rows are rebuilt on first use
+INDEX_VERSION = 1
+TOKEN_RE = re.compile(f"(?P<cjk>[{CJK_CHARS}]+)|(?P<word>[^\\W_{CJK_CHARS}]+)")
+K1 = 1.2
+B = 0.75
+
+def tokenize(text: str) -> List[str]:
+    out: List[str] = []
+    for m in TOKEN_RE.finditer((text or "").lower()):
+        w = m.group()
+        if m.lastgroup == "cjk" and len(w) > 1:
+            # no word segmentation for CJK: overlapping bigrams match words of any length reasonably well
+            out.extend(w[i:i + 2] for i in range(len(w) - 1))
+        else:
+            out.append(w)
+    return out
+
+class Bm25Index:
+    def __init__(self, ids: List[int], pages: List[int], lengths: List[int], postings: Dict[str, List[int]]):
+        self.ids = ids
+        self.pages = pages
+        self.lengths = lengths
+        # term -> flat [doc, tf, doc, tf, ...] over positions in ids
+        self.postings = postings
+        avgdl = sum(lengths) / len(lengths) if lengths else 0.0
+        self.norm = [K1 * (1 - B + B * dl / avgdl) if avgdl else K1 for dl in lengths]
+
+    @classmethod
+    def build(cls, rows: Iterable[Tuple[int, int, str]]) -> "Bm25Index":
+        ids: List[int] = []
+        pages: List[int] = []
+        lengths: List[int] = []
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for doc_id, page_number, text in rows:
+            tokens = tokenize(text)
+            d = len(ids)
+            ids.append(doc_id)
+            pages.append(page_number)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term] += (d, tf)
+        return cls(ids, pages, lengths, dict(postings))
+
+    def search(self, query: str, k: int = 8) -> List[Tuple[int, int, float]]:
+        n = len(self.ids)
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            df = len(plist) // 2
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            norm = self.norm
+            for i in range(0, len(plist), 2):
+                d = plist[i]
+                tf = plist[i + 1]
+                scores[d] += idf * tf * (K1 + 1) / (tf + norm[d])
+        top = heapq.nlargest(k, scores.items(), key=itemgetter(1))
+        return [(self.ids[d], self.pages[d], s) for d, s in top]
+
+    def to_bytes(self) -> bytes:
+        payload = {"ids": self.ids, "pages": self.pages, "lengths": self.lengths, "postings": self.postings}
+        return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Bm25Index":
+        payload = json.loads(zlib.decompress(data))
+        return cls(payload["ids"], payload["pages"], payload["lengths"], payload["postings"])
+
+class RetrievalService:
+    def __init__(self, repo: Optional[RetrievalIndexRepository] = None, text_repo: Optional[DocTextRepository] = None, max_books: Optional[int] = None):
+        self.repo = repo or RetrievalIndexRepository()
+        self.text_repo = text_repo or DocTextRepository()
+        self.max_books = max_books or get_settings().retrieval_cache_books
+        self._cache: "OrderedDict[int, Tuple[Any, Bm25Index]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def build(self, db: Session, book_id: int) -> Bm25Index:
+        index = Bm25Index.build(self._rows(db, book_id))
+        stamp = self.repo.put(db, book_id, INDEX_VERSION, len(index.ids), len(index.postings), index.to_bytes())
+        self._remember(book_id, stamp, index)
+        return index
+
+    def get(self, db: Session, book_id: int) -> Bm25Index:
+        stamp = self.repo.stamp(db, book_id)
+        if stamp is None or stamp[0] != INDEX_VERSION:
+            return self.build(db, book_id)
+        with self._lock:
+            cached = self._cache.get(book_id)
+            # the stored timestamp tells us whether another process rebuilt the index since we loaded it
+            if cached and cached[0] == stamp[1]:
+                self._cache.move_to_end(book_id)
+                return cached[1]
+        row = self.repo.get(db, book_id)
+        index = Bm25Index.from_bytes(row.data)
+        self._remember(book_id, row.created_at, index)
+        return index
+
+    def search(self, db: Session, book_id: int, query: str, k: int = 8) -> List[Dict[str, Any]]:
+        hits = self.get(db, book_id).search(query, k)
+        texts = {t.id: t.text for t in self.text_repo.list_by_ids(db, [h[0] for h in hits])}
+        return [{"id": i, "page_number": p, "text": texts.get(i) or "", "score": round(s, 3)} for i, p, s in hits if i in texts]
+
+    def drop(self, db: Session, book_id: int) -> None:
+        self.repo.delete_by_book(db, book_id)
+        with self._lock:
+            self._cache.pop(book_id, None)
+
+    def _rows(self, db: Session, book_id: int):
+        after = None
+        while True:
+            batch = self.text_repo.list_after_by_book(db, book_id, after, 1000)
+            if not batch:
+                return
+            after = (batch[-1].page_number, batch[-1].id)
+            for t in batch:
+                yield t.id, t.page_number, t.text or ""
+
+    def _remember(self, book_id: int, stamp, index: Bm25Index) -> None:
+        with self._lock:
+            self._cache[book_id] = (stamp, index)
+            self._cache.move_to_end(book_id)
+            while len(self._cache) > self.max_books:
+                self._cache.popitem(last=False)
+
+retrieval_service = RetrievalService()
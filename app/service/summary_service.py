@@ -0,0 +1,108 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.repository.doc_text_repository import DocTextRepository
+from app.repository.summary_part_repository import SummaryPartRepository
+from app.service.ai_client import MODEL, PROMPT_VERSIONS, summarize_text, task_deadline
+from app.service.llm_client import LlmMetrics
+
+# (start_page, end_page, text)
+Node = Tuple[int, int, str]
+
+class SummaryService:
+    def __init__(self, part_repo: Optional[SummaryPartRepository] = None, text_repo: Optional[DocTextRepository] = None):
+        self.part_repo = part_repo or SummaryPartRepository()
+        self.text_repo = text_repo or DocTextRepository()
+
+    def summarize_book(self, db: Session, book_id: int, target_len: int = 200, on_part: Optional[Callable[[int, int, int], None]] = None, metrics: Optional[LlmMetrics] = None) -> Optional[str]:
+        settings = get_settings()
+        nodes = self._groups(db, book_id, max(1, settings.summary_group_chars))
+        if not nodes:
+            return None
+        fanin = max(2, settings.summary_fanin)
+        total = n = len(nodes)
+        while n > 1:
+            n = -(-n // fanin)
+            total += n
+        api_key = os.getenv("DASHSCOPE_API_KEY")
+        deadline = task_deadline()
+        cached = self.part_repo.map_by_book(db, book_id)
+        keep = {}
+        done = 0
+        reused = 0
+        level = 0
+        with ThreadPoolExecutor(max_workers=max(1, settings.ai_concurrency)) as pool:
+            while True:
+                final = len(nodes) == 1
+                kind = "summary_part" if level == 0 else "summary_reduce"
+                size = target_len if final else settings.summary_part_chars
+                results: List[Optional[str]] = [None] * len(nodes)
+                futures = {}
+                for seq, (start, end, text) in enumerate(nodes):
+                    h = self._hash(kind, size, text)
+                    part = cached.get((level, seq))
+                    if part is not None and part.input_hash == h:
+                        results[seq] = part.summary
+                        done += 1
+                        reused += 1
+                    else:
+                        futures[pool.submit(summarize_text, kind, text, size, api_key, deadline, metrics)] = (seq, h)
+                if on_part:
+                    on_part(done, total, reused)
+                for f in as_completed(futures):
+                    seq, h = futures[f]
+                    summary, ok = f.result()
+                    results[seq] = summary
+                    # fallbacks are truncated source text; keep them out of the cache so a later run retries
+                    if ok:
+                        start, end, _ = nodes[seq]
+                        self.part_repo.put(db, book_id, level, seq, start, end, h, summary)
+                    done += 1
+                    if on_part:
+                        on_part(done, total, reused)
+                keep[level] = len(nodes)
+                if final:
+                    break
+                nodes = [self._merge(nodes[i:i + fanin], results[i:i + fanin]) for i in range(0, len(nodes), fanin)]
+                level += 1
+        self.part_repo.delete_beyond(db, book_id, keep)
+        return results[0]
+
+    def _groups(self, db: Session, book_id: int, group_chars: int) -> List[Node]:
+        groups: List[Node] = []
+        buf: List[str] = []
+        size = 0
+        start = end = None
+        after = None
+        while True:
+            batch = self.text_repo.list_after_by_book(db, book_id, after, 500)
+            if not batch:
+                break
+            after = (batch[-1].page_number, batch[-1].id)
+            for t in batch:
+                text = (t.text or "").strip()
+                if not text:
+                    continue
+                if buf and size + len(text) > group_chars:
+                    groups.append((start, end, "\n".join(buf)))
+                    buf, size, start = [], 0, None
+                if start is None:
+                    start = t.page_number
+                end = t.page_number
+                buf.append(text)
+                size += len(text) + 1
+        if buf:
+            groups.append((start, end, "\n".join(buf)))
+        return groups
+
+    def _merge(self, nodes: List[Node], summaries: List[Optional[str]]) -> Node:
+        text = "\n\n".join(f"【第{s}-{e}页】{summary}" for (s, e, _), summary in zip(nodes, summaries) if summary)
+        return nodes[0][0], nodes[-1][1], text
+
+    def _hash(self, kind: str, target_len: int, text: str) -> str:
+        key = f"{MODEL}\x00{kind}\x00{PROMPT_VERSIONS[kind]}\x00{target_len}\x00{text}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
@@ -1,9 +1,15 @@
 from datetime import datetime
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
 import fitz
-from typing import Optional
+from typing import Optional, List, Tuple
 from sqlalchemy.orm import Session
-import re
+import json
+import time
+
+from app.config import get_settings
+from app.service.progress import progress_hub, task_snapshot
 
 from app.repository.task_log_repository import TaskLogRepository
 from app.model.task_log import TaskLog
@@ -11,11 +17,35 @@ from app.repository.doc_text_repository import DocTextRepository
 from app.model.doc_text import DocText
 from app.repository.analysis_item_repository import AnalysisItemRepository
 from app.model.analysis_item import AnalysisItem
-from app.service.ai_client import ask_ai
+from app.service.ai_client import ask_ai, ask_ai_fanout
+from app.service.llm_client import LlmMetrics
 from app.repository.question_repository import QuestionRepository
 from app.repository.explanation_repository import ExplanationRepository
 from app.model.question import Question
 from app.model.explanation import Explanation
+from app.repository.text_search_repository import TextSearchRepository
+from app.repository.book_search_repository import BookSearchRepository
+from app.repository.book_meta_repository import BookMetaRepository
+from app.repository.analysis_coverage_repository import AnalysisCoverageRepository
+from app.service.cover_service import cover_service
+from app.service.summary_service import SummaryService
+from app.service.chunker import extract_page_chunks
+from app.service.retrieval import retrieval_service
+
+def split_page_range(src: str, out_dir: str, start: int, end: int) -> List[Tuple[int, str, list]]:
+    doc = fitz.open(src)
+    try:
+        results = []
+        for i in range(start, end):
+            ndoc = fitz.open()
+            ndoc.insert_pdf(doc, from_page=i, to_page=i)
+            out_path = Path(out_dir) / f"page_{i+1:04d}.pdf"
+            ndoc.save(str(out_path))
+            ndoc.close()
+            results.append((i + 1, str(out_path), extract_page_chunks(doc.load_page(i))))
+        return results
+    finally:
+        doc.close()
 
 class TaskService:
     def __init__(self, repo: Optional[TaskLogRepository] = None, text_repo: Optional[DocTextRepository] = None, analysis_repo: Optional[AnalysisItemRepository] = None):
@@ -24,6 +54,10 @@ class TaskService:
         self.analysis_repo = analysis_repo or AnalysisItemRepository()
         self.question_repo = QuestionRepository()
         self.expl_repo = ExplanationRepository()
+        self.search_repo = TextSearchRepository()
+        self.meta_repo = BookMetaRepository()
+        self.summary_service = SummaryService()
+        self.coverage_repo = AnalysisCoverageRepository()
 
     def queue_split_pdf(self, db: Session, book_id: int, file_name: str, file_path: str, output_dir: Path) -> TaskLog:
         t = TaskLog(
@@ -42,91 +76,196 @@ class TaskService:
             return
         try:
             task = self.repo.update(db, task, {"status": "running", "started_at": datetime.utcnow()})
+            settings = get_settings()
             src = Path(files_dir) / task.file_name
             doc = fitz.open(str(src))
+            pages = doc.page_count
+            doc.close()
             out_dir = Path(task.output_dir)
             out_dir.mkdir(parents=True, exist_ok=True)
-            pages = doc.page_count
-            texts = []
-            for i in range(pages):
-                ndoc = fitz.open()
-                ndoc.insert_pdf(doc, from_page=i, to_page=i)
-                out_path = out_dir / f"page_{i+1:04d}.pdf"
-                ndoc.save(str(out_path))
-                ndoc.close()
-                page = doc.load_page(i)
-                data = page.get_text("dict")
-                segs = []
-                for b in data.get("blocks", []):
-                    if b.get("type", 0) != 0:
-                        continue
-                    parts = []
-                    x0 = None
-                    y0 = None
-                    x1 = None
-                    y1 = None
-                    for line in b.get("lines", []):
-                        bb = line.get("bbox")
-                        if bb:
-                            x0 = bb[0] if x0 is None else min(x0, bb[0])
-                            y0 = bb[1] if y0 is None else min(y0, bb[1])
-                            x1 = bb[2] if x1 is None else max(x1, bb[2])
-                            y1 = bb[3] if y1 is None else max(y1, bb[3])
-                        tline = "".join([s.get("text", "") for s in line.get("spans", [])])
-                        parts.append(tline)
-                    txt = "\n".join(parts)
-                    txt = re.sub(r"\s+", " ", txt).strip()
-                    if txt:
-                        segs.append({"text": txt, "bbox": (x0 or 0.0, y0 or 0.0, x1 or 0.0, y1 or 0.0)})
-                def union(a, b):
-                    ax0, ay0, ax1, ay1 = a
-                    bx0, by0, bx1, by1 = b
-                    return (min(ax0, bx0), min(ay0, by0), max(ax1, bx1), max(ay1, by1))
-                def split_sentences(s: str):
-                    parts = re.split(r"(?<=[\.\!\?。！？])\s+", s)
-                    parts = [p.strip() for p in parts if p.strip()]
-                    return parts if parts else [s]
-                def chunk_by_limit(sents, limit=400):
-                    chunks = []
-                    buf = ""
-                    for sent in sents:
-                        if not buf:
-                            buf = sent
-                        elif len(buf) + 1 + len(sent) <= limit:
-                            buf = buf + " " + sent
-                        else:
-                            chunks.append(buf)
-                            buf = sent
-                    if buf:
-                        chunks.append(buf)
-                    return chunks
-                idx = 0
-                while idx < len(segs):
-                    acc_txt = segs[idx]["text"]
-                    acc_bbox = segs[idx]["bbox"]
-                    j = idx + 1
-                    while len(acc_txt) < 200 and j < len(segs):
-                        acc_txt = acc_txt + " " + segs[j]["text"]
-                        acc_bbox = union(acc_bbox, segs[j]["bbox"])
-                        j += 1
-                    sents = split_sentences(acc_txt)
-                    chunks = chunk_by_limit(sents, 400)
-                    x0, y0, x1, y1 = acc_bbox
-                    bx = float(x0)
-                    by = float(y0)
-                    bw = float(max(0.0, x1 - x0))
-                    bh = float(max(0.0, y1 - y0))
-                    for ch in chunks:
-                        texts.append(DocText(book_id=task.book_id, page_number=i+1, source="pdf", file_path=str(out_path), text=ch, bbox_x=bx, bbox_y=by, bbox_w=bw, bbox_h=bh))
-                    idx = j
-            if texts:
-                self.text_repo.bulk_create(db, texts)
+            resume_from = min(task.checkpoint or 0, pages)
+            self.search_repo.delete_by_book(db, task.book_id, resume_from)
+            self.text_repo.delete_after_page(db, task.book_id, resume_from)
+            # only chat-mode analysis reads the BM25 index, so it is rebuilt on its first lookup rather than per split
+            retrieval_service.drop(db, task.book_id)
+            shard = max(1, settings.split_shard_pages)
+            starts = list(range(resume_from, pages, shard))
+            ends = [min(s + shard, pages) for s in starts]
+            workers = max(1, min(settings.split_workers, len(starts)))
+            t0 = time.monotonic()
+            chunks = 0
+            task = self._report(db, task, resume_from, pages, "pages", t0, resume_from, chunks=chunks)
+            for shard_pages in self._iter_shards(str(src), str(out_dir), starts, ends, workers):
+                texts = self._doc_texts(task.book_id, shard_pages)
+                if texts:
+                    self.text_repo.bulk_create(db, texts, returning=False)
+                    self.search_repo.index_pages(db, task.book_id, shard_pages[0][0], shard_pages[-1][0])
+                chunks += len(texts)
+                task = self._report(db, task, shard_pages[-1][0], pages, "pages", t0, resume_from, chunks=chunks, checkpoint=shard_pages[-1][0])
             self.repo.update(db, task, {"status": "done", "finished_at": datetime.utcnow(), "pages_count": pages})
         except Exception as e:
+            db.rollback()
             self.repo.update(db, task, {"status": "failed", "finished_at": datetime.utcnow(), "message": str(e)})
 
-    def queue_analyze_ai(self, db: Session, book_id: int) -> TaskLog:
-        t = TaskLog(book_id=book_id, task_type="analyze_ai", status="queued", message=None, file_name="", output_dir="")
+    def _report(self, db: Session, task: TaskLog, done: int, total: int, unit: str, t0: float, base: int = 0, checkpoint: Optional[int] = None, **counters) -> TaskLog:
+        elapsed = time.monotonic() - t0
+        rate = (done - base) / elapsed if elapsed > 0 and done > base else 0.0
+        progress = {"unit": unit, "done": done, "total": total, "eta_seconds": round((total - done) / rate, 1) if rate else None, **counters}
+        data = {"progress": json.dumps(progress)}
+        if checkpoint is not None:
+            data["checkpoint"] = checkpoint
+        task = self.repo.update(db, task, data)
+        progress_hub.publish(task.id, task_snapshot(task))
+        return task
+
+    def _iter_shards(self, src: str, out_dir: str, starts: List[int], ends: List[int], workers: int):
+        if workers <= 1:
+            for s, e in zip(starts, ends):
+                yield split_page_range(src, out_dir, s, e)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            pending = deque()
+            for s, e in zip(starts, ends):
+                pending.append(ex.submit(split_page_range, src, out_dir, s, e))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _doc_texts(self, book_id: int, shard_pages) -> List[DocText]:
+        texts = []
+        for page_number, out_path, chunks in shard_pages:
+            for ch, (bx, by, bw, bh) in chunks:
+                texts.append(DocText(book_id=book_id, page_number=page_number, source="pdf", file_path=out_path, text=ch, bbox_x=bx, bbox_y=by, bbox_w=bw, bbox_h=bh))
+        return texts
+
+    def reuse_book(self, db: Session, src_book_id: int, book_id: int, file_name: str, batch_id: Optional[str] = None) -> bool:
+        from app.model.book import Book
+        split = self.repo.latest_done(db, src_book_id, "split_pdf")
+        if not split:
+            return False
+        self.text_repo.copy_to_book(db, src_book_id, book_id)
+        self.search_repo.index_book(db, book_id)
+        now = datetime.utcnow()
+        note = f"reused from book {src_book_id}"
+        self.repo.create(db, TaskLog(book_id=book_id, task_type="split_pdf", status="done", message=note, file_name=file_name, output_dir=split.output_dir, pages_count=split.pages_count, checkpoint=split.pages_count, started_at=now, finished_at=now, batch_id=batch_id))
+        src = db.get(Book, src_book_id)
+        book = db.get(Book, book_id)
+        if src and src.summary and book:
+            book.summary = src.summary
+            db.add(book)
+            db.commit()
+            BookSearchRepository().upsert(db, book)
+            self.repo.create(db, TaskLog(book_id=book_id, task_type="summarize", status="done", message=note, file_name=file_name, output_dir="", started_at=now, finished_at=now, batch_id=batch_id))
+        else:
+            self.repo.create(db, TaskLog(book_id=book_id, task_type="summarize", status="queued", message=None, file_name=file_name, output_dir="", batch_id=batch_id))
+        return True
+
+    def queue_batch(self, db: Session, batch_id: str, entries: List[tuple], files_dir: Path) -> List[bool]:
+        # one commit for all queued tasks; the worker caps how many of them run at once (BITEBOOK_BATCH_MAX_RUNNING)
+        reused = []
+        tasks = []
+        first: dict = {}
+        for book, meta, source in entries:
+            blob = Path(meta.file_path).name
+            if not meta.cover_file:
+                tasks.append(TaskLog(book_id=book.id, task_type="render_cover", status="queued", file_name=blob, output_dir="", batch_id=batch_id))
+            # duplicates, whether already stored or earlier in this batch, copy the source's results in the worker
+            src_book_id = source.book_id if source is not None else first.get(meta.sha256)
+            if src_book_id is not None:
+                tasks.append(TaskLog(book_id=book.id, task_type="reuse_book", status="queued", file_name=blob, output_dir="", options=json.dumps({"source_book_id": src_book_id}), batch_id=batch_id))
+            else:
+                first[meta.sha256] = book.id
+                out_dir = files_dir / Path(meta.file_path).stem
+                tasks.append(TaskLog(book_id=book.id, task_type="split_pdf", status="queued", file_name=blob, output_dir=str(out_dir), batch_id=batch_id))
+                tasks.append(TaskLog(book_id=book.id, task_type="summarize", status="queued", file_name=blob, output_dir="", batch_id=batch_id))
+            reused.append(src_book_id is not None)
+        self.repo.create_many(db, tasks)
+        return reused
+
+    def run_reuse_book(self, db: Session, task_id: int, files_dir: Path):
+        task = self.repo.get(db, task_id)
+        if not task:
+            return
+        try:
+            task = self.repo.update(db, task, {"status": "running", "started_at": datetime.utcnow()})
+            src_book_id = json.loads(task.options or "{}").get("source_book_id")
+            if src_book_id and self.reuse_book(db, src_book_id, task.book_id, task.file_name, task.batch_id):
+                message = f"reused from book {src_book_id}"
+            else:
+                # the source split failed or its book was deleted: split this copy itself
+                out_dir = Path(files_dir) / Path(task.file_name).stem
+                self.repo.create_many(db, [
+                    TaskLog(book_id=task.book_id, task_type="split_pdf", status="queued", file_name=task.file_name, output_dir=str(out_dir), batch_id=task.batch_id),
+                    TaskLog(book_id=task.book_id, task_type="summarize", status="queued", file_name=task.file_name, output_dir="", batch_id=task.batch_id),
+                ])
+                message = f"book {src_book_id} has no split to reuse; queued a split"
+            self.repo.update(db, task, {"status": "done", "finished_at": datetime.utcnow(), "message": message})
+        except Exception as e:
+            db.rollback()
+            self.repo.update(db, task, {"status": "failed", "finished_at": datetime.utcnow(), "message": str(e)})
+
+    def batch_progress(self, db: Session, batch_id: str) -> Optional[dict]:
+        tasks = self.repo.list_by_batch(db, batch_id)
+        if not tasks:
+            return None
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        by_type: dict = {}
+        books: dict = {}
+        work = 0.0
+        for t in tasks:
+            counts[t.status] = counts.get(t.status, 0) + 1
+            per = by_type.setdefault(t.task_type, {"queued": 0, "running": 0, "done": 0, "failed": 0})
+            per[t.status] = per.get(t.status, 0) + 1
+            books.setdefault(t.book_id, {})[t.task_type] = t.status
+            if t.status in ("done", "failed"):
+                work += 1
+            elif t.status == "running" and t.progress:
+                p = json.loads(t.progress)
+                if p.get("total"):
+                    work += min(1.0, p.get("done", 0) / p["total"])
+        finished = counts["queued"] == 0 and counts["running"] == 0
+        return {
+            "batch_id": batch_id,
+            "status": "done" if finished else ("running" if counts["running"] or counts["done"] else "queued"),
+            "books": len(books),
+            "tasks": len(tasks),
+            "progress": round(work / len(tasks), 4),
+            "counts": counts,
+            "by_type": by_type,
+            "items": [{"book_id": b, "tasks": s} for b, s in books.items()],
+        }
+
+    def queue_reuse_book(self, db: Session, book_id: int, file_name: str, src_book_id: int) -> TaskLog:
+        t = TaskLog(book_id=book_id, task_type="reuse_book", status="queued", message=None, file_name=file_name, output_dir="", options=json.dumps({"source_book_id": src_book_id}))
+        return self.repo.create(db, t)
+
+    def queue_render_cover(self, db: Session, book_id: int, file_name: str) -> TaskLog:
+        t = TaskLog(book_id=book_id, task_type="render_cover", status="queued", message=None, file_name=file_name, output_dir="")
+        return self.repo.create(db, t)
+
+    def run_render_cover(self, db: Session, task_id: int):
+        task = self.repo.get(db, task_id)
+        if not task:
+            return
+        try:
+            task = self.repo.update(db, task, {"status": "running", "started_at": datetime.utcnow()})
+            metas = self.meta_repo.list_by_book(db, task.book_id)
+            if metas:
+                sha = metas[0].sha256
+                done = next((m for m in self.meta_repo.list_by_sha256(db, sha) if m.cover_file), None)
+                if done:
+                    self.meta_repo.set_cover_by_sha256(db, sha, done.cover_file, done.cover_mime, done.cover_width, done.cover_height)
+                else:
+                    dims = cover_service.warm(db, sha)
+                    if dims:
+                        self.meta_repo.set_cover_by_sha256(db, sha, f"{sha}/lg.jpg", "image/jpeg", dims[0], dims[1])
+            self.repo.update(db, task, {"status": "done", "finished_at": datetime.utcnow()})
+        except Exception as e:
+            self.repo.update(db, task, {"status": "failed", "finished_at": datetime.utcnow(), "message": str(e)})
+
+    def queue_analyze_ai(self, db: Session, book_id: int, mode: str = "incremental") -> TaskLog:
+        t = TaskLog(book_id=book_id, task_type="analyze_ai", status="queued", message=None, file_name="", output_dir="", options=json.dumps({"mode": mode}))
         return self.repo.create(db, t)
 
     def run_analyze_ai(self, db: Session, task_id: int):
@@ -135,21 +274,65 @@ class TaskService:
             return
         try:
             task = self.repo.update(db, task, {"status": "running", "started_at": datetime.utcnow()})
-            ai_items = ask_ai(task.book_id, db)
-            qs = []
-            for it in ai_items:
-                qs.append(Question(book_id=task.book_id, doc_text_id=it.get("doc_text_id"), page_number=it.get("page_number"), text=it.get("question")))
-            if qs:
-                qs = self.question_repo.bulk_create(db, qs)
-                exps = []
-                for q, it in zip(qs, ai_items):
-                    exps.append(Explanation(question_id=q.id, text=it.get("answer"), provider=it.get("provider"), model=it.get("model")))
-                if exps:
-                    self.expl_repo.bulk_create(db, exps)
+            t0 = time.monotonic()
+            metrics = LlmMetrics()
+            mode = json.loads(task.options or "{}").get("mode", "incremental")
+            # coverage is tracked per chunk, so incremental runs always use windowed fan-out
+            fanout = mode == "incremental" or get_settings().ai_analyze_mode == "fanout"
+            if mode == "full" and fanout:
+                self.question_repo.delete_by_book(db, task.book_id)
+                self.coverage_repo.delete_by_book(db, task.book_id)
+            counts = {"questions": 0, "fallback_windows": 0}
+            if fanout:
+                unit = "windows"
+                windows = {"total": 0}
+                def on_window(done: int, total: int):
+                    windows["total"] = total
+                    self._report(db, task, done, total, unit, t0, **counts)
+                def on_result(window, items, ok: bool):
+                    ids = [w[0] for w in window]
+                    stale = self.coverage_repo.fallback_ids(db, ids)
+                    # questions and coverage of a window land together, so a crash cannot leave saved but uncovered chunks
+                    if stale:
+                        self.question_repo.delete_by_book(db, task.book_id, stale, commit=False)
+                    saved = self._save_items(db, task.book_id, items, commit=False)
+                    self.coverage_repo.mark(db, task.book_id, ids, not ok, task.id, commit=False)
+                    db.commit()
+                    counts["questions"] += saved
+                    counts["fallback_windows"] += 0 if ok else 1
+                ask_ai_fanout(task.book_id, db, on_window=on_window, metrics=metrics, uncovered=mode == "incremental", on_result=on_result)
+                done = windows["total"]
+            else:
+                unit = "rounds"
+                rounds = {"done": 0}
+                def on_round(done: int, max_rounds: int):
+                    rounds["done"] = done
+                    self._report(db, task, done, max_rounds, unit, t0)
+                items = ask_ai(task.book_id, db, on_round=on_round, metrics=metrics)
+                # the chat run read the whole book: replace its questions and cover every chunk in one transaction,
+                # otherwise the next incremental run would analyze the whole book again
+                self.question_repo.delete_by_book(db, task.book_id, commit=False)
+                counts["questions"] = self._save_items(db, task.book_id, items, commit=False)
+                fallback = not items or any(it.get("provider") == "local" for it in items)
+                self.coverage_repo.mark_book(db, task.book_id, fallback, task.id, commit=False)
+                db.commit()
+                # the model usually stops calling tools before max_rounds; report the rounds it actually used
+                done = rounds["done"]
+            task = self._report(db, task, done, done, unit, t0, mode=mode, llm=metrics.snapshot(), **counts)
             self.repo.update(db, task, {"status": "done", "finished_at": datetime.utcnow(), "pages_count": None})
         except Exception as e:
+            db.rollback()
             self.repo.update(db, task, {"status": "failed", "finished_at": datetime.utcnow(), "message": str(e)})
 
+    def _save_items(self, db: Session, book_id: int, ai_items: List[dict], commit: bool = True) -> int:
+        qs = [Question(book_id=book_id, doc_text_id=it.get("doc_text_id"), page_number=it.get("page_number"), text=it.get("question")) for it in ai_items]
+        if not qs:
+            return 0
+        qs = self.question_repo.bulk_create(db, qs, commit=False)
+        exps = [Explanation(question_id=q.id, text=it.get("answer"), provider=it.get("provider"), model=it.get("model")) for q, it in zip(qs, ai_items)]
+        self.expl_repo.bulk_create(db, exps, returning=False, commit=commit)
+        return len(qs)
+
     def queue_summarize_book(self, db: Session, book_id: int, file_path: str) -> TaskLog:
         t = TaskLog(book_id=book_id, task_type="summarize", status="queued", message=None, file_name=Path(file_path).name, output_dir="")
         return self.repo.create(db, t)
@@ -162,25 +345,41 @@ class TaskService:
             return
         try:
             task = self.repo.update(db, task, {"status": "running", "started_at": datetime.utcnow()})
-            src = Path(files_dir) / task.file_name
-            text_buf = ""
-            try:
-                doc = fitz.open(str(src))
-                pages = min(doc.page_count, 8)
-                parts = []
-                for i in range(pages):
-                    p = doc.load_page(i)
-                    parts.append(p.get_text("text"))
-                text_buf = "\n".join(parts)
-            except Exception:
-                text_buf = ""
-            summary = ask_summary(text_buf, 200)
+            t0 = time.monotonic()
+            metrics = LlmMetrics()
+            summary = None
+            state = {"unit": "steps", "total": 2}
+            if get_settings().summary_mode == "hierarchical":
+                def on_part(done: int, total: int, reused: int):
+                    state.update(unit="parts", total=total, reused=reused)
+                    self._report(db, task, done, total, "parts", t0, reused=reused)
+                summary = self.summary_service.summarize_book(db, task.book_id, 200, on_part=on_part, metrics=metrics)
+            if summary is None:
+                state = {"unit": "steps", "total": 2}
+                # nothing extracted (split failed or head mode): summarise the first pages of the PDF
+                task = self._report(db, task, 0, 2, "steps", t0)
+                text_buf = self._head_text(Path(files_dir) / task.file_name)
+                task = self._report(db, task, 1, 2, "steps", t0)
+                summary = ask_summary(text_buf, 200, metrics=metrics)
             book = db.get(Book, task.book_id)
             if book:
                 book.summary = summary
                 db.add(book)
                 db.commit()
                 db.refresh(book)
+                BookSearchRepository().upsert(db, book)
+            unit, total = state.pop("unit"), state.pop("total")
+            task = self._report(db, task, total, total, unit, t0, llm=metrics.snapshot(), **state)
             self.repo.update(db, task, {"status": "done", "finished_at": datetime.utcnow()})
         except Exception as e:
             self.repo.update(db, task, {"status": "failed", "finished_at": datetime.utcnow(), "message": str(e)})
+
+    def _head_text(self, src: Path, pages: int = 8) -> str:
+        try:
+            doc = fitz.open(str(src))
+            try:
+                return "\n".join(doc.load_page(i).get_text("text") for i in range(min(doc.page_count, pages)))
+            finally:
+                doc.close()
+        except Exception:
+            return ""
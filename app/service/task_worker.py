@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.config import get_settings
+from app.db import SessionLocal
+from app.repository.task_log_repository import TaskLogRepository
+from app.service.task_service import TaskService
+
+def execute_task(task_id: int) -> None:
+    settings = get_settings()
+    service = TaskService()
+    db = SessionLocal()
+    try:
+        task = service.repo.get(db, task_id)
+        if not task:
+            return
+        if task.task_type == "split_pdf":
+            service.run_split_pdf(db, task_id, settings.files_dir)
+        elif task.task_type == "summarize":
+            service.run_summarize_book(db, task_id, settings.files_dir)
+        elif task.task_type == "render_cover":
+            service.run_render_cover(db, task_id)
+        elif task.task_type == "reuse_book":
+            service.run_reuse_book(db, task_id, settings.files_dir)
+        elif task.task_type == "analyze_ai":
+            service.run_analyze_ai(db, task_id)
+        else:
+            service.repo.update(db, task, {"status": "failed", "message": f"Unknown task type: {task.task_type}", "finished_at": datetime.utcnow()})
+    finally:
+        db.close()
+
+class TaskWorker:
+    def __init__(self, repo: Optional[TaskLogRepository] = None, workers: Optional[int] = None):
+        self.settings = get_settings()
+        self.repo = repo or TaskLogRepository()
+        self.workers = max(1, workers or self.settings.task_workers)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.inflight: Dict[int, Future] = {}
+        self.stopping = False
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    def run_forever(self):
+        self.pool = self._new_pool()
+        last_beat = 0.0
+        try:
+            while not self.stopping:
+                db = SessionLocal()
+                try:
+                    if self._collect(db):
+                        self._replace_pool(db)
+                    if time.monotonic() - last_beat >= self.settings.task_heartbeat_seconds:
+                        self.repo.heartbeat(db, list(self.inflight), self.owner, self.settings.task_lease_seconds)
+                        self.repo.requeue(db, self._expired(db), self.settings.task_max_attempts, "lease expired")
+                        last_beat = time.monotonic()
+                    while len(self.inflight) < self.workers:
+                        task_id = self.repo.claim_next(db, self.owner, self.settings.task_lease_seconds, self.settings.batch_max_running)
+                        if task_id is None:
+                            break
+                        try:
+                            self.inflight[task_id] = self.pool.submit(execute_task, task_id)
+                        except BrokenProcessPool as e:
+                            self.repo.requeue(db, [task_id], self.settings.task_max_attempts, str(e)[:1024])
+                            self._replace_pool(db)
+                            break
+                finally:
+                    db.close()
+                time.sleep(self.settings.task_poll_seconds)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            if self.inflight:
+                db = SessionLocal()
+                try:
+                    self.repo.requeue(db, list(self.inflight), self.settings.task_max_attempts, "worker stopped")
+                finally:
+                    db.close()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _replace_pool(self, db):
+        # a child died (e.g. OOM-killed), which fails every future of the pool and refuses new submits
+        self.repo.requeue(db, list(self.inflight), self.settings.task_max_attempts, "worker process died")
+        self.inflight.clear()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = self._new_pool()
+
+    def stop(self):
+        self.stopping = True
+
+    def _collect(self, db) -> bool:
+        broken = False
+        for task_id in [tid for tid, f in self.inflight.items() if f.done()]:
+            f = self.inflight.pop(task_id)
+            exc = f.exception()
+            if exc is not None:
+                self.repo.requeue(db, [task_id], self.settings.task_max_attempts, str(exc)[:1024])
+                broken = broken or isinstance(exc, BrokenProcessPool)
+            self.repo.release(db, task_id, self.owner)
+        return broken
+
+    def _expired(self, db):
+        return [tid for tid in self.repo.expired_ids(db) if tid not in self.inflight]
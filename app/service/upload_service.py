@@ -1,74 +1,298 @@
 import hashlib
+import threading
+import uuid
+import zipfile
+import zlib
+from collections import OrderedDict
+from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Dict, List, Optional, Tuple
 from fastapi import UploadFile
 from sqlalchemy.orm import Session
-import fitz  # PyMuPDF
 
+from app.config import get_settings
 from app.service.book_service import BookService
 from app.repository.book_meta_repository import BookMetaRepository
+from app.repository.upload_session_repository import UploadSessionRepository
 from app.model.book_meta import BookMeta
+from app.model.upload_session import UploadSession
+
+CHUNK_SIZE = 1024 * 1024
+PDF_MAGIC = b"%PDF"
+ZIP_MAGIC = b"PK\x03\x04"
+# how long a chunk request may hold an upload session before another request can take it over
+WRITER_LEASE_SECONDS = 600
+
+class ChunkWriter:
+    def __init__(self, upload_id: str, token: str, path: Path, offset: int, hasher):
+        self.upload_id = upload_id
+        self.token = token
+        self.offset = offset
+        self.hasher = hasher
+        self.out = path.open("ab")
+
+    def write(self, data: bytes) -> None:
+        self.out.write(data)
+        self.hasher.update(data)
+        self.offset += len(data)
+
+    def close(self) -> None:
+        self.out.close()
 
 class UploadService:
+    # hash state of in-progress chunked uploads, keyed by upload id: (offset, hasher); least recently used first.
+    # abandoned sessions expire in the database without telling this process, so the size is capped and
+    # an evicted session rehashes its part file on the next chunk
+    _hashers: "OrderedDict[str, Tuple[int, object]]" = OrderedDict()
+    _lock = threading.Lock()
+
     def __init__(self, book_service: Optional[BookService] = None, meta_repo: Optional[BookMetaRepository] = None):
         self.book_service = book_service or BookService()
         self.meta_repo = meta_repo or BookMetaRepository()
+        self.session_repo = UploadSessionRepository()
 
     def upload_book(self, db: Session, file: UploadFile, data: dict, files_dir: Path) -> tuple:
-        if not file.filename:
+        self._validate(file.filename, file.content_type)
+        target_path = self._target_path(files_dir, file.filename)
+        hasher = hashlib.sha256()
+        size = self._copy(file.file, target_path, hasher)
+        return self._store(db, file.filename, file.content_type, data, target_path, size, hasher.hexdigest())
+
+    def upload_batch(self, db: Session, files: List[UploadFile], files_dir: Path, max_files: int, max_entry_mb: int = 0) -> Tuple[List[tuple], List[dict]]:
+        staged: List[Tuple[str, Path, int, str]] = []
+        skipped: List[dict] = []
+        try:
+            for f in files:
+                head = f.file.read(4)
+                f.file.seek(0)
+                if head == ZIP_MAGIC:
+                    self._stage_zip(f.file, f.filename or "", files_dir, staged, skipped, max_files, max_entry_mb)
+                elif head == PDF_MAGIC:
+                    self._check_batch_size(staged, max_files)
+                    staged.append(self._stage(f.file, f.filename or "upload.pdf", files_dir))
+                else:
+                    skipped.append({"file_name": f.filename, "reason": "Only PDF or ZIP is supported"})
+            return self._store_many(db, staged), skipped
+        except Exception:
+            for _, path, _, _ in staged:
+                path.unlink(missing_ok=True)
+            raise
+
+    def create_session(self, db: Session, file_name: str, content_type: str, total_size: Optional[int], files_dir: Path) -> UploadSession:
+        self._validate(file_name, content_type)
+        upload = UploadSession(id=uuid.uuid4().hex, file_name=file_name, content_type=content_type, total_size=total_size, received=0)
+        self._part_path(files_dir, upload.id).touch()
+        self._remember(upload.id, 0, hashlib.sha256())
+        return self.session_repo.create(db, upload)
+
+    def get_session(self, db: Session, upload_id: str) -> Optional[UploadSession]:
+        return self.session_repo.get(db, upload_id)
+
+    def open_chunk(self, db: Session, upload_id: str, offset: int, files_dir: Path) -> ChunkWriter:
+        upload = self.session_repo.get(db, upload_id)
+        if not upload:
+            raise LookupError("Upload not found")
+        if offset != upload.received:
+            raise ValueError(f"Offset mismatch, expected {upload.received}")
+        token = uuid.uuid4().hex
+        if not self.session_repo.claim_writer(db, upload_id, offset, token, WRITER_LEASE_SECONDS):
+            raise ValueError("Another chunk is being written")
+        path = self._part_path(files_dir, upload_id)
+        # drop bytes past the committed offset left behind by an interrupted chunk
+        with path.open("r+b") as f:
+            f.truncate(offset)
+        return ChunkWriter(upload_id, token, path, offset, self._hasher_at(upload_id, path, offset))
+
+    def close_chunk(self, db: Session, writer: ChunkWriter) -> UploadSession:
+        writer.close()
+        self._remember(writer.upload_id, writer.offset, writer.hasher)
+        return self.session_repo.release_writer(db, writer.upload_id, writer.token, writer.offset)
+
+    def complete_session(self, db: Session, upload_id: str, data: dict, files_dir: Path) -> tuple:
+        upload = self.session_repo.get(db, upload_id)
+        if not upload:
+            raise LookupError("Upload not found")
+        if upload.writer and upload.writer_expires_at and upload.writer_expires_at > datetime.utcnow():
+            raise ValueError("A chunk is still being written")
+        if upload.total_size is not None and upload.received != upload.total_size:
+            raise ValueError(f"Upload incomplete: {upload.received}/{upload.total_size} bytes")
+        if upload.received == 0:
+            raise ValueError("Upload is empty")
+        part = self._part_path(files_dir, upload_id)
+        sha = self._hasher_at(upload_id, part, upload.received).hexdigest()
+        target_path = self._target_path(files_dir, upload.file_name)
+        part.replace(target_path)
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+        file_name, content_type, size = upload.file_name, upload.content_type, upload.received
+        self.session_repo.delete(db, upload)
+        return self._store(db, file_name, content_type, data, target_path, size, sha)
+
+    def abort_session(self, db: Session, upload_id: str, files_dir: Path) -> bool:
+        upload = self.session_repo.get(db, upload_id)
+        if not upload:
+            return False
+        self._part_path(files_dir, upload_id).unlink(missing_ok=True)
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+        self.session_repo.delete(db, upload)
+        return True
+
+    def find_source(self, db: Session, sha: str) -> Optional[BookMeta]:
+        for m in self.meta_repo.list_by_sha256(db, sha):
+            if Path(m.file_path).exists():
+                return m
+        return None
+
+    def _validate(self, file_name: Optional[str], content_type: Optional[str]) -> None:
+        if not file_name:
             raise ValueError("File name missing")
-        if not file.content_type or not file.content_type.startswith("application/pdf"):
+        if not content_type or not content_type.startswith("application/pdf"):
             raise ValueError("Only PDF is supported")
 
+    def _target_path(self, files_dir: Path, file_name: str) -> Path:
         files_dir.mkdir(parents=True, exist_ok=True)
         suffix = ".pdf"
-        safe_name = Path(file.filename).stem
-        target_name = safe_name + suffix
-        target_path = files_dir / target_name
+        safe_name = Path(file_name).stem
+        target_path = files_dir / (safe_name + suffix)
         i = 1
         while target_path.exists():
             target_path = files_dir / f"{safe_name}_{i}{suffix}"
             i += 1
+        return target_path
 
-        hasher = hashlib.sha256()
+    def _part_path(self, files_dir: Path, upload_id: str) -> Path:
+        d = files_dir / ".uploads"
+        d.mkdir(parents=True, exist_ok=True)
+        return d / f"{upload_id}.part"
+
+    def _copy(self, src: BinaryIO, target_path: Path, hasher) -> int:
         size = 0
         with target_path.open("wb") as out:
             while True:
-                chunk = file.file.read(1024 * 1024)
+                chunk = src.read(CHUNK_SIZE)
                 if not chunk:
                     break
                 hasher.update(chunk)
                 size += len(chunk)
                 out.write(chunk)
+        return size
+
+    def _stage(self, src: BinaryIO, file_name: str, files_dir: Path) -> Tuple[str, Path, int, str]:
+        target_path = self._target_path(files_dir, file_name)
+        hasher = hashlib.sha256()
+        try:
+            size = self._copy(src, target_path, hasher)
+        except Exception:
+            target_path.unlink(missing_ok=True)
+            raise
+        return file_name, target_path, size, hasher.hexdigest()
+
+    def _stage_zip(self, src: BinaryIO, archive: str, files_dir: Path, staged: list, skipped: list, max_files: int, max_entry_mb: int = 0) -> None:
+        try:
+            zf = zipfile.ZipFile(src)
+        except zipfile.BadZipFile:
+            skipped.append({"file_name": archive, "reason": "Broken ZIP archive"})
+            return
+        with zf:
+            for info in zf.infolist():
+                name = Path(info.filename).name
+                if info.is_dir() or name.startswith(".") or "__MACOSX" in info.filename:
+                    continue
+                if not name.lower().endswith(".pdf"):
+                    skipped.append({"file_name": f"{archive}/{info.filename}", "reason": "Only PDF is supported"})
+                    continue
+                # zipfile stops reading at the declared size (and fails the CRC past it), so checking it bounds what is written
+                if max_entry_mb > 0 and info.file_size > max_entry_mb * 1024 * 1024:
+                    skipped.append({"file_name": f"{archive}/{info.filename}", "reason": f"Larger than {max_entry_mb} MB uncompressed"})
+                    continue
+                # entries are streamed to disk one chunk at a time, never extracted in memory
+                try:
+                    with zf.open(info) as entry:
+                        if entry.read(4) != PDF_MAGIC:
+                            skipped.append({"file_name": f"{archive}/{info.filename}", "reason": "Not a PDF file"})
+                            continue
+                    self._check_batch_size(staged, max_files)
+                    with zf.open(info) as entry:
+                        staged.append(self._stage(entry, name, files_dir))
+                except (zipfile.BadZipFile, RuntimeError, NotImplementedError, EOFError, zlib.error) as e:
+                    # encrypted, corrupt or unsupported entries only cost their own file
+                    skipped.append({"file_name": f"{archive}/{info.filename}", "reason": f"Unreadable ZIP entry: {e}"})
 
-        sha = hasher.hexdigest()
+    def _check_batch_size(self, staged: list, max_files: int) -> None:
+        if len(staged) >= max_files:
+            raise ValueError(f"Too many files in batch (max {max_files})")
 
-        covers_dir = files_dir.parent / "covers"
-        covers_dir.mkdir(parents=True, exist_ok=True)
-        cover_file = None
-        cover_mime = None
-        cover_w = None
-        cover_h = None
+    def _store_many(self, db: Session, staged: List[Tuple[str, Path, int, str]]) -> List[tuple]:
+        # (file_name, path, size, sha, source) with duplicates pointing at the copy already on disk
+        plan = []
+        stored: Dict[str, Path] = {}
+        for file_name, path, size, sha in staged:
+            source = self.find_source(db, sha)
+            if source is not None:
+                path.unlink()
+                plan.append((file_name, Path(source.file_path), size, sha, source))
+            elif sha in stored:
+                path.unlink()
+                plan.append((file_name, stored[sha], size, sha, None))
+            else:
+                stored[sha] = path
+                plan.append((file_name, path, size, sha, None))
         try:
-            doc = fitz.open(str(target_path))
-            page = doc.load_page(0)
-            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-            img_bytes = pix.tobytes("jpeg")
-            cover_file = f"{sha[:16]}.jpg"
-            cover_path = covers_dir / cover_file
-            front = files_dir.parent.parent / "front" / "public" / "covers"
-            print(front)
-            cover_path_fe =  front / cover_file
-            with cover_path.open("wb") as fimg:
-                fimg.write(img_bytes)
-            with cover_path_fe.open("wb") as fimg:
-                fimg.write(img_bytes)
-            cover_mime = "image/jpeg"
-            cover_w = pix.width
-            cover_h = pix.height
+            books = self.book_service.create_books(db, [{"title": Path(p[0]).stem, "author": "Unknown"} for p in plan])
+            metas = []
+            for book, (file_name, path, size, sha, source) in zip(books, plan):
+                metas.append(BookMeta(
+                    book_id=book.id,
+                    file_name=file_name,
+                    file_path=str(path),
+                    mime_type="application/pdf",
+                    file_size=size,
+                    sha256=sha,
+                    cover_file=source.cover_file if source else None,
+                    cover_mime=source.cover_mime if source else None,
+                    cover_width=source.cover_width if source else None,
+                    cover_height=source.cover_height if source else None,
+                ))
+            self.meta_repo.create_many(db, metas)
         except Exception:
-            pass
+            db.rollback()
+            raise
+        return [(book, meta, p[4]) for book, meta, p in zip(books, metas, plan)]
+
+    def _remember(self, upload_id: str, offset: int, hasher) -> None:
+        with self._lock:
+            self._hashers[upload_id] = (offset, hasher)
+            self._hashers.move_to_end(upload_id)
+            while len(self._hashers) > max(1, get_settings().upload_hasher_cache):
+                self._hashers.popitem(last=False)
+
+    def _hasher_at(self, upload_id: str, path: Path, offset: int):
+        with self._lock:
+            cached = self._hashers.pop(upload_id, None)
+        if cached and cached[0] == offset:
+            return cached[1]
+        # another process received the earlier chunks (or this one restarted): rebuild from disk
+        hasher = hashlib.sha256()
+        remaining = offset
+        with path.open("rb") as f:
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                remaining -= len(chunk)
+        return hasher
+
+    def _store(self, db: Session, file_name: str, content_type: str, data: dict, target_path: Path, size: int, sha: str) -> tuple:
+        safe_name = Path(file_name).stem
+        source = self.find_source(db, sha)
+        if source is not None:
+            target_path.unlink()
+            return self._create(db, file_name, content_type, data, safe_name, Path(source.file_path), size, sha, source.cover_file, source.cover_mime, source.cover_width, source.cover_height) + (source,)
+        return self._create(db, file_name, content_type, data, safe_name, target_path, size, sha, None, None, None, None) + (None,)
 
+    def _create(self, db: Session, file_name: str, content_type: str, data: dict, safe_name: str, path: Path, size: int, sha: str, cover_file, cover_mime, cover_w, cover_h) -> tuple:
         if not data.get("title"):
             data["title"] = safe_name
         if not data.get("author"):
@@ -76,9 +300,9 @@ class UploadService:
         book = self.book_service.create_book(db, data)
         meta = BookMeta(
             book_id=book.id,
-            file_name=file.filename,
-            file_path=str(target_path),
-            mime_type=file.content_type,
+            file_name=file_name,
+            file_path=str(path),
+            mime_type=content_type,
             file_size=size,
             sha256=sha,
             cover_file=cover_file,
@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+def make_pdf(path: Path, pages: int, seed: int) -> None:
+    import fitz
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page()
+        y = 72
+        for para in range(6):
+            text = f"Book {seed} page {p + 1} paragraph {para + 1}. " + " ".join(f"term{(seed * 31 + p * 7 + para * 3 + k) % 997}" for k in range(40))
+            rect = fitz.Rect(72, y, page.rect.width - 72, y + 100)
+            page.insert_textbox(rect, text, fontsize=10)
+            y += 110
+    doc.save(str(path))
+    doc.close()
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+def wait_for(db, TaskLog, ids, timeout):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        db.expire_all()
+        pending = db.query(TaskLog).filter(TaskLog.id.in_(ids), TaskLog.status.in_(("queued", "running"))).count()
+        if not pending:
+            return True
+        time.sleep(0.2)
+    return False
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark: upload -> split -> summarize -> analyze")
+    parser.add_argument("--books", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--task-workers", type=int, default=2)
+    parser.add_argument("--data-dir", help="scratch directory for the database and files (default: a temp dir, removed afterwards)")
+    parser.add_argument("--llm-url", help="use an already running DashScope-compatible endpoint instead of the bundled fake")
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rps", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    scratch = Path(args.data_dir or tempfile.mkdtemp(prefix="bitebook-bench-"))
+    scratch.mkdir(parents=True, exist_ok=True)
+    fake = None
+    if not args.llm_url:
+        from fake_llm import FakeDashScope
+        fake = FakeDashScope(latency_ms=args.latency_ms, error_rate=args.error_rate, throttle_rps=args.throttle_rps, seed=0)
+        fake.start(port=args.port)
+    # must be set before app modules read settings; worker processes inherit them
+    os.environ["BITEBOOK_DATABASE_URL"] = f"sqlite:///{scratch / 'bench.db'}"
+    os.environ["BITEBOOK_DATA_DIR"] = str(scratch)
+    os.environ["BITEBOOK_TASK_POLL_SECONDS"] = os.environ.get("BITEBOOK_TASK_POLL_SECONDS", "0.2")
+    os.environ["BITEBOOK_LLM_CACHE"] = "0"
+    os.environ["DASHSCOPE_HTTP_BASE_URL"] = args.llm_url or f"http://127.0.0.1:{args.port}/api/v1"
+    os.environ.setdefault("DASHSCOPE_API_KEY", "bench")
+
+    from starlette.datastructures import Headers, UploadFile
+    from app.main import seed_data
+    from app.db import SessionLocal
+    from app.config import get_settings
+    from app.model.task_log import TaskLog
+    from app.model.doc_text import DocText
+    from app.model.question import Question
+    from app.api.upload import service as upload_service, _dispatch
+    from app.service.task_service import TaskService
+    from app.service.task_worker import TaskWorker
+
+    seed_data()
+    settings = get_settings()
+    src_dir = scratch / "src"
+    src_dir.mkdir(exist_ok=True)
+    t_gen = time.monotonic()
+    sources = []
+    for i in range(args.books):
+        path = src_dir / f"bench_{i}.pdf"
+        make_pdf(path, args.pages, i)
+        sources.append(path)
+    gen_seconds = time.monotonic() - t_gen
+
+    worker = TaskWorker(workers=args.task_workers)
+    thread = threading.Thread(target=worker.run_forever, daemon=True)
+    thread.start()
+    db = SessionLocal()
+    task_service = TaskService()
+    try:
+        t0 = time.monotonic()
+        book_ids = []
+        upload_lat = []
+        for path in sources:
+            t = time.monotonic()
+            with path.open("rb") as f:
+                upload = UploadFile(f, filename=path.name, headers=Headers({"content-type": "application/pdf"}))
+                book, meta, source = upload_service.upload_book(db, upload, {}, settings.files_dir)
+                _dispatch(db, book, meta, source, settings.files_dir)
+            upload_lat.append(time.monotonic() - t)
+            book_ids.append(book.id)
+        ingest_ids = [t.id for t in db.query(TaskLog).filter(TaskLog.book_id.in_(book_ids))]
+        ok = wait_for(db, TaskLog, ingest_ids, args.timeout)
+        t_ingest = time.monotonic()
+        analyze_ids = [task_service.queue_analyze_ai(db, b).id for b in book_ids]
+        ok = wait_for(db, TaskLog, analyze_ids, args.timeout) and ok
+        t_end = time.monotonic()
+    finally:
+        worker.stop()
+        thread.join(timeout=30)
+
+    db.expire_all()
+    tasks = db.query(TaskLog).filter(TaskLog.book_id.in_(book_ids)).all()
+    stages = {}
+    for t in tasks:
+        s = stages.setdefault(t.task_type, {"n": 0, "failed": 0, "latency": []})
+        s["n"] += 1
+        if t.status != "done":
+            s["failed"] += 1
+        if t.started_at and t.finished_at:
+            s["latency"].append((t.finished_at - t.started_at).total_seconds())
+    texts = db.query(DocText).filter(DocText.book_id.in_(book_ids)).count()
+    questions = db.query(Question).filter(Question.book_id.in_(book_ids)).count()
+    llm = {}
+    for t in tasks:
+        try:
+            m = (json.loads(t.progress or "{}") or {}).get("llm") or {}
+        except ValueError:
+            m = {}
+        for k in ("calls", "attempts", "retries", "throttled", "fallbacks"):
+            llm[k] = llm.get(k, 0) + (m.get(k) or 0)
+    db.close()
+
+    ingest_s = t_ingest - t0
+    analyze_s = t_end - t_ingest
+    report = {
+        "books": args.books,
+        "pages_per_book": args.pages,
+        "completed": ok,
+        "pdf_generation_seconds": round(gen_seconds, 2),
+        "wall_seconds": round(t_end - t0, 2),
+        "throughput": {
+            "books_per_second": round(args.books / (t_end - t0), 3),
+            "pages_per_second_ingest": round(args.books * args.pages / ingest_s, 1) if ingest_s else None,
+        },
+        "upload_ms": {"p50": round(statistics.median(upload_lat) * 1000, 1), "p99": round(percentile(upload_lat, 0.99) * 1000, 1)},
+        "stages": {
+            k: {
+                "n": v["n"],
+                "failed": v["failed"],
+                "p50_s": round(percentile(v["latency"], 0.5), 3) if v["latency"] else None,
+                "p99_s": round(percentile(v["latency"], 0.99), 3) if v["latency"] else None,
+            }
+            for k, v in sorted(stages.items())
+        },
+        "db_writes": {
+            "doc_text_rows": texts,
+            "doc_text_rows_per_second": round(texts / ingest_s, 1) if ingest_s else None,
+            "question_rows": questions,
+            "question_rows_per_second": round(questions / analyze_s, 1) if analyze_s else None,
+        },
+        "llm_client": llm,
+    }
+    if fake:
+        report["fake_llm"] = dict(fake.stats)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"books={args.books} pages/book={args.pages} completed={ok} wall={report['wall_seconds']}s")
+        print(f"throughput: {report['throughput']['books_per_second']} books/s, {report['throughput']['pages_per_second_ingest']} pages/s (ingest)")
+        print(f"upload: p50 {report['upload_ms']['p50']} ms, p99 {report['upload_ms']['p99']} ms")
+        print(f"{'stage':<14}{'n':>4}{'failed':>8}{'p50 s':>10}{'p99 s':>10}")
+        for k, v in report["stages"].items():
+            print(f"{k:<14}{v['n']:>4}{v['failed']:>8}{str(v['p50_s']):>10}{str(v['p99_s']):>10}")
+        w = report["db_writes"]
+        print(f"db writes: doc_text {w['doc_text_rows']} rows ({w['doc_text_rows_per_second']}/s), question {w['question_rows']} rows ({w['question_rows_per_second']}/s)")
+        print(f"llm client: {llm}")
+        if fake:
+            print(f"fake llm: {report['fake_llm']}")
+    if not args.data_dir:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
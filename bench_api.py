@@ -0,0 +1,214 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+ENCODINGS = ("identity", "gzip", "br")
+
+def seed(db, books: int, texts: int, questions: int) -> int:
+    from sqlalchemy import insert
+    from app.model.book import Book
+    from app.model.doc_text import DocText
+    from app.model.question import Question
+    from app.model.explanation import Explanation
+    rnd = random.Random(books * 31 + texts)
+    # a mixed latin/CJK vocabulary drawn at random, so compression ratios are not flattered by repetition
+    vocab = ["".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(3, 9))) for _ in range(800)]
+    vocab += ["".join(chr(rnd.randint(0x4E00, 0x62FF)) for _ in range(2)) for _ in range(400)]
+
+    def words(n):
+        return " ".join(rnd.choice(vocab) for _ in range(n))
+
+    db.execute(insert(Book), [
+        {"title": f"Bench book {i}", "author": f"Author {i % 17}", "description": words(30), "published_year": 1900 + i % 120}
+        for i in range(books)
+    ])
+    book_id = db.query(Book.id).order_by(Book.id.asc()).first()[0]
+    db.execute(insert(DocText), [
+        {
+            "book_id": book_id,
+            "page_number": i // 6 + 1,
+            "source": "pdf",
+            "file_path": f"files/bench/page_{i // 6 + 1}.pdf",
+            "text": words(60),
+            "bbox_x": 72.0,
+            "bbox_y": 72.0 + (i % 6) * 110.0,
+            "bbox_w": 451.0,
+            "bbox_h": 100.0,
+        }
+        for i in range(texts)
+    ])
+    db.execute(insert(Question), [
+        {"book_id": book_id, "page_number": i // 3 + 1, "text": f"问题 {i}：" + words(20)}
+        for i in range(questions)
+    ])
+    qids = [r[0] for r in db.query(Question.id).filter(Question.book_id == book_id).all()]
+    db.execute(insert(Explanation), [
+        {"question_id": q, "text": "解析：" + words(40), "provider": "bench"}
+        for q in qids
+    ])
+    db.commit()
+    return book_id
+
+def legacy_payloads(db, book_id: int, limit: int, page_size: int):
+    # the previous shape of each endpoint: ORM objects -> dicts, then FastAPI's jsonable_encoder + JSONResponse
+    from app.api import books as api
+    from app.model.book import Book
+    from app.model.doc_text import DocText
+    from app.model.question import Question
+    from app.model.explanation import Explanation
+    from app.schema.book import BookRead
+    from sqlalchemy import select
+
+    def texts():
+        rows = db.query(DocText).filter(DocText.book_id == book_id).order_by(DocText.page_number.asc(), DocText.id.asc()).limit(limit).all()
+        return {"items": [{k: getattr(t, k) for k in api.TEXT_FIELDS} for t in rows], "total": len(rows), "start": 0, "limit": limit, "next_cursor": None}
+
+    def questions():
+        first = select(Explanation.text).where(Explanation.question_id == Question.id).order_by(Explanation.id.asc()).limit(1).scalar_subquery()
+        rows = db.execute(select(Question, first.label("explanation")).where(Question.book_id == book_id).order_by(Question.id.asc()).limit(limit)).all()
+        items = [{"id": q.id, "book_id": q.book_id, "doc_text_id": q.doc_text_id, "page_number": q.page_number, "text": q.text, "explanation": e} for q, e in rows]
+        return {"items": items, "total": len(items), "start": 0, "limit": limit}
+
+    def books():
+        rows = db.query(Book).order_by(Book.created_at.desc(), Book.id.desc()).limit(page_size).all()
+        return {"items": [BookRead.model_validate(b).model_dump() for b in rows], "total": len(rows), "page": 1, "page_size": page_size}
+
+    return {"texts": texts, "questions": questions, "books": books}
+
+def current_payloads(db, book_id: int, limit: int, page_size: int):
+    from app.api import books as api
+    from app.model.book import Book
+
+    def texts():
+        rows = api.doc_text_repo.list_after_by_book(db, book_id, None, limit, columns=api.TEXT_COLUMNS)
+        return {"items": api.shape(api.TEXT_FIELDS, rows), "total": len(rows), "start": 0, "limit": limit, "next_cursor": None}
+
+    def questions():
+        rows = api.question_repo.list_with_first_explanation(db, book_id, 0, limit)
+        return {"items": api.shape(api.QUESTION_FIELDS, rows), "total": len(rows), "start": 0, "limit": limit}
+
+    def books():
+        rows = db.query(Book).order_by(Book.created_at.desc(), Book.id.desc()).limit(page_size).all()
+        items = []
+        for b in rows:
+            d = {k: getattr(b, k) for k in api.BOOK_FIELDS}
+            d.update(cover_url=None, cover_thumb_url=None, task_status=None, task_pages_count=None)
+            items.append(d)
+        return {"items": items, "total": len(rows), "page": 1, "page_size": page_size}
+
+    return {"texts": texts, "questions": questions, "books": books}
+
+def best_of(fn, rounds):
+    times = []
+    out = None
+    for _ in range(rounds):
+        t = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t)
+    return min(times) * 1000, out
+
+def serialisation(db, book_id: int, limit: int, page_size: int, rounds: int):
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from app.api.responses import dumps
+    legacy = legacy_payloads(db, book_id, limit, page_size)
+    current = current_payloads(db, book_id, limit, page_size)
+    report = {}
+    for name in legacy:
+        db.expire_all()
+        build_old, obj_old = best_of(legacy[name], rounds)
+        build_new, obj_new = best_of(current[name], rounds)
+        enc_old, body_old = best_of(lambda: JSONResponse(jsonable_encoder(obj_old)).body, rounds)
+        enc_new, body_new = best_of(lambda: dumps(obj_new), rounds)
+        report[name] = {
+            "items": len(obj_new["items"]),
+            "legacy_ms": {"build": round(build_old, 2), "encode": round(enc_old, 2), "total": round(build_old + enc_old, 2)},
+            "current_ms": {"build": round(build_new, 2), "encode": round(enc_new, 2), "total": round(build_new + enc_new, 2)},
+            "speedup": round((build_old + enc_old) / (build_new + enc_new), 2),
+            "same_json": json.loads(body_old) == json.loads(body_new),
+        }
+    return report
+
+def wire(client, paths, rounds: int):
+    report = {}
+    for name, path in paths.items():
+        row = {}
+        for enc in ENCODINGS:
+            times = []
+            size = 0
+            used = None
+            for _ in range(rounds):
+                t = time.perf_counter()
+                with client.stream("GET", path, headers={"Accept-Encoding": enc}) as r:
+                    size = sum(len(c) for c in r.iter_raw())
+                    used = r.headers.get("content-encoding", "identity")
+                times.append((time.perf_counter() - t) * 1000)
+            row[enc] = {"bytes": size, "p50_ms": round(statistics.median(times), 2), "content_encoding": used}
+        report[name] = row
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark list endpoint serialisation time and bytes on the wire per Accept-Encoding")
+    parser.add_argument("--books", type=int, default=200)
+    parser.add_argument("--texts", type=int, default=5000)
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=500, help="page size for texts/questions")
+    parser.add_argument("--page-size", type=int, default=100, help="page size for the book list")
+    parser.add_argument("--rounds", type=int, default=15)
+    parser.add_argument("--data-dir", help="scratch directory for the database (default: a temp dir, removed afterwards)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    scratch = Path(args.data_dir or tempfile.mkdtemp(prefix="bitebook-bench-api-"))
+    scratch.mkdir(parents=True, exist_ok=True)
+    os.environ["BITEBOOK_DATABASE_URL"] = f"sqlite:///{scratch / 'bench.db'}"
+    os.environ["BITEBOOK_DATA_DIR"] = str(scratch)
+    try:
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.db import SessionLocal
+        from app.api import compression, responses
+        with TestClient(app) as client:
+            db = SessionLocal()
+            try:
+                book_id = seed(db, args.books, args.texts, args.questions)
+                ser = serialisation(db, book_id, args.limit, args.page_size, args.rounds)
+            finally:
+                db.close()
+            paths = {
+                "texts": f"/api/books/{book_id}/texts?limit={args.limit}",
+                "questions": f"/api/books/{book_id}/questions?limit={args.limit}",
+                "books": f"/api/books/?page_size={args.page_size}",
+            }
+            on_wire = wire(client, paths, args.rounds)
+        report = {
+            "orjson": responses.orjson is not None,
+            "brotli": compression.brotli is not None,
+            "serialisation": ser,
+            "wire": on_wire,
+        }
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"orjson={report['orjson']} brotli={report['brotli']}")
+    print(f"{'endpoint':<11}{'items':>6}{'legacy ms':>11}{'current ms':>12}{'speedup':>9}{'same':>6}")
+    for name, r in ser.items():
+        print(f"{name:<11}{r['items']:>6}{r['legacy_ms']['total']:>11}{r['current_ms']['total']:>12}{r['speedup']:>9}{str(r['same_json']):>6}")
+    print(f"{'endpoint':<11}{'encoding':>9}{'sent as':>10}{'bytes':>10}{'ratio':>7}{'p50 ms':>9}")
+    for name, row in on_wire.items():
+        base = row["identity"]["bytes"] or 1
+        for enc, r in row.items():
+            print(f"{name:<11}{enc:>9}{r['content_encoding']:>10}{r['bytes']:>10}{r['bytes'] / base:>7.2f}{r['p50_ms']:>9}")
+
+if __name__ == "__main__":
+    main()
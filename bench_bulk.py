@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+def entries(book_id: int, n: int):
+    from app.model.doc_text import DocText
+    return [
+        DocText(book_id=book_id, page_number=i // 6 + 1, source="pdf", file_path=f"files/bench/page_{i // 6 + 1}.pdf", text=f"paragraph {i} " + "lorem ipsum dolor sit amet " * 8, bbox_x=72.0, bbox_y=72.0 + (i % 6) * 110.0, bbox_w=451.0, bbox_h=100.0)
+        for i in range(n)
+    ]
+
+def legacy(db, items):
+    # the bulk_create body before the Core insert layer
+    db.add_all(items)
+    db.commit()
+    for e in items:
+        db.refresh(e)
+
+def run(db, book_id: int, n: int, mode: str) -> dict:
+    from app.model.doc_text import DocText
+    from app.repository.doc_text_repository import DocTextRepository
+    items = entries(book_id, n)
+    t = time.perf_counter()
+    if mode == "add_all+refresh":
+        legacy(db, items)
+    else:
+        DocTextRepository().bulk_create(db, items, returning=mode == "returning")
+    elapsed = time.perf_counter() - t
+    db.query(DocText).filter(DocText.book_id == book_id).delete()
+    db.commit()
+    db.expunge_all()
+    return {"mode": mode, "rows": n, "seconds": round(elapsed, 3), "rows_per_second": round(n / elapsed)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DocText bulk_create rows/s: ORM add_all+refresh vs Core insert with and without RETURNING")
+    parser.add_argument("--rows", type=int, default=30000)
+    parser.add_argument("--rounds", type=int, default=3, help="best of N per mode")
+    parser.add_argument("--data-dir", help="scratch directory for the database (default: a temp dir, removed afterwards)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    scratch = Path(args.data_dir or tempfile.mkdtemp(prefix="bitebook-bench-bulk-"))
+    scratch.mkdir(parents=True, exist_ok=True)
+    os.environ["BITEBOOK_DATABASE_URL"] = f"sqlite:///{scratch / 'bench.db'}"
+    os.environ["BITEBOOK_DATA_DIR"] = str(scratch)
+    try:
+        from app.main import seed_data
+        from app.db import SessionLocal
+        from app.model.book import Book
+        seed_data()
+        db = SessionLocal()
+        try:
+            book = Book(title="bulk bench", author="bench")
+            db.add(book)
+            db.commit()
+            rows = []
+            for mode in ("add_all+refresh", "returning", "no-return"):
+                runs = [run(db, book.id, args.rows, mode) for _ in range(args.rounds)]
+                rows.append(max(runs, key=lambda r: r["rows_per_second"]))
+        finally:
+            db.close()
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    base = rows[0]["rows_per_second"]
+    for r in rows:
+        r["speedup"] = round(r["rows_per_second"] / base, 1)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'mode':<17}{'rows':>8}{'seconds':>9}{'rows/s':>9}{'speedup':>9}")
+    for r in rows:
+        print(f"{r['mode']:<17}{r['rows']:>8}{r['seconds']:>9}{r['rows_per_second']:>9}{r['speedup']:>9}")
+
+if __name__ == "__main__":
+    main()
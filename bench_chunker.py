@@ -0,0 +1,157 @@
+import argparse
+import json
+import re
+import time
+
+def legacy_chunks(blocks):
+    # the inline chunking previously used by run_split_pdf, kept as the baseline
+    segs = []
+    for b in blocks:
+        if b.get("type", 0) != 0:
+            continue
+        parts = []
+        x0 = None
+        y0 = None
+        x1 = None
+        y1 = None
+        for line in b.get("lines", []):
+            bb = line.get("bbox")
+            if bb:
+                x0 = bb[0] if x0 is None else min(x0, bb[0])
+                y0 = bb[1] if y0 is None else min(y0, bb[1])
+                x1 = bb[2] if x1 is None else max(x1, bb[2])
+                y1 = bb[3] if y1 is None else max(y1, bb[3])
+            tline = "".join([s.get("text", "") for s in line.get("spans", [])])
+            parts.append(tline)
+        txt = "\n".join(parts)
+        txt = re.sub(r"\s+", " ", txt).strip()
+        if txt:
+            segs.append({"text": txt, "bbox": (x0 or 0.0, y0 or 0.0, x1 or 0.0, y1 or 0.0)})
+    def union(a, b):
+        ax0, ay0, ax1, ay1 = a
+        bx0, by0, bx1, by1 = b
+        return (min(ax0, bx0), min(ay0, by0), max(ax1, bx1), max(ay1, by1))
+    def split_sentences(s):
+        parts = re.split(r"(?<=[\.\!\?。！？])\s+", s)
+        parts = [p.strip() for p in parts if p.strip()]
+        return parts if parts else [s]
+    def chunk_by_limit(sents, limit=400):
+        chunks = []
+        buf = ""
+        for sent in sents:
+            if not buf:
+                buf = sent
+            elif len(buf) + 1 + len(sent) <= limit:
+                buf = buf + " " + sent
+            else:
+                chunks.append(buf)
+                buf = sent
+        if buf:
+            chunks.append(buf)
+        return chunks
+    out = []
+    idx = 0
+    while idx < len(segs):
+        acc_txt = segs[idx]["text"]
+        acc_bbox = segs[idx]["bbox"]
+        j = idx + 1
+        while len(acc_txt) < 200 and j < len(segs):
+            acc_txt = acc_txt + " " + segs[j]["text"]
+            acc_bbox = union(acc_bbox, segs[j]["bbox"])
+            j += 1
+        sents = split_sentences(acc_txt)
+        chunks = chunk_by_limit(sents, 400)
+        x0, y0, x1, y1 = acc_bbox
+        bbox = (float(x0), float(y0), float(max(0.0, x1 - x0)), float(max(0.0, y1 - y0)))
+        for ch in chunks:
+            out.append((ch, bbox))
+        idx = j
+    return out
+
+def synthetic_corpus(pages: int, long_every: int):
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "theta", "kappa", "lambda", "sigma"]
+    corpus = []
+    for p in range(pages):
+        blocks = []
+        y = 72.0
+        for b in range(8):
+            n = 4000 if long_every and (p * 8 + b) % long_every == 0 else 40 + (p * 7 + b * 13) % 120
+            text = " ".join(words[(p + b + k) % len(words)] + ("." if k % 17 == 16 else "") for k in range(n))
+            lines = []
+            for i in range(0, len(text), 90):
+                lines.append({"bbox": (72.0, y, 520.0, y + 11.0), "spans": [{"text": text[i:i + 90]}]})
+                y += 12.0
+            blocks.append({"type": 0, "lines": lines})
+        corpus.append(blocks)
+    return corpus
+
+def pdf_corpus(paths):
+    import fitz
+    corpus = []
+    for path in paths:
+        doc = fitz.open(path)
+        try:
+            for page in doc:
+                corpus.append(page.get_text("dict").get("blocks", []))
+        finally:
+            doc.close()
+    return corpus
+
+def measure(fn, corpus, rounds):
+    best = None
+    chunks = 0
+    chars = 0
+    for _ in range(rounds):
+        t = time.perf_counter()
+        out = [fn(blocks) for blocks in corpus]
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+        chunks = sum(len(o) for o in out)
+        chars = sum(len(c) for o in out for c, _ in o)
+    return {
+        "seconds": round(best, 4),
+        "chunks": chunks,
+        "chunks_per_second": round(chunks / best, 1),
+        "pages_per_second": round(len(corpus) / best, 1),
+        "mb_per_second": round(chars / best / 1e6, 2),
+        "max_chunk_chars": max((len(c) for o in out for c, _ in o), default=0),
+    }, out
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the text chunker against the previous inline implementation")
+    parser.add_argument("pdf", nargs="*", help="PDFs to extract the corpus from (default: a synthetic corpus)")
+    parser.add_argument("--pages", type=int, default=2000, help="synthetic corpus size")
+    parser.add_argument("--long-every", type=int, default=50, help="every n-th synthetic block is a 4000-word run-on paragraph; 0 disables")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--target", type=int, default=400)
+    parser.add_argument("--max", type=int, default=800)
+    parser.add_argument("--overlap", type=int, default=0)
+    parser.add_argument("--unit", choices=("chars", "tokens"), default="chars")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    from app.service.chunker import Chunker
+    corpus = pdf_corpus(args.pdf) if args.pdf else synthetic_corpus(args.pages, args.long_every)
+    chunker = Chunker(args.target, args.max, args.overlap, args.unit)
+    legacy, old = measure(legacy_chunks, corpus, args.rounds)
+    current, new = measure(chunker.chunk_blocks, corpus, args.rounds)
+    same = sum(1 for a, b in zip(old, new) if a == b)
+    report = {
+        "pages": len(corpus),
+        "chunker": {"target": args.target, "max": args.max, "overlap": args.overlap, "unit": args.unit},
+        "legacy": legacy,
+        "chunker_module": current,
+        "speedup": round(legacy["seconds"] / current["seconds"], 2) if current["seconds"] else None,
+        "pages_with_identical_chunks": same,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"pages={len(corpus)} target={args.target} max={args.max} overlap={args.overlap} unit={args.unit}")
+    print(f"{'':<10}{'seconds':>10}{'chunks':>10}{'chunks/s':>12}{'pages/s':>10}{'MB/s':>8}{'max len':>9}")
+    for name, r in (("legacy", legacy), ("chunker", current)):
+        print(f"{name:<10}{r['seconds']:>10}{r['chunks']:>10}{r['chunks_per_second']:>12}{r['pages_per_second']:>10}{r['mb_per_second']:>8}{r['max_chunk_chars']:>9}")
+    print(f"speedup x{report['speedup']}, pages with identical chunks: {same}/{len(corpus)}")
+
+if __name__ == "__main__":
+    main()
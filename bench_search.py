@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+COMMON = ("story", "world")
+
+def seed(db, books: int) -> dict:
+    from sqlalchemy import insert, text
+    from app.model.book import Book
+    rnd = random.Random(books)
+    vocab = ["".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(4, 9))) for _ in range(20000)]
+    surnames = ["".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(7)).title() for _ in range(5000)]
+
+    def words(n):
+        return " ".join(rnd.choice(vocab) for _ in range(n))
+
+    rows = []
+    for i in range(books):
+        title = words(3)
+        if rnd.random() < 0.7:
+            title += f" {COMMON[0]}"
+        if rnd.random() < 0.6:
+            title += f" {COMMON[1]}"
+        rows.append({"title": title, "author": f"{rnd.choice(surnames)} {rnd.choice(surnames)}", "description": words(40), "published_year": 1900 + i % 120, "isbn": f"978{i:010d}"})
+    for i in range(0, len(rows), 10000):
+        db.execute(insert(Book), rows[i:i + 10000])
+    db.execute(text("DELETE FROM books_fts"))
+    db.execute(text("INSERT INTO books_fts (rowid, title, author, isbn, description, summary) SELECT id, title, author, coalesce(isbn, ''), coalesce(description, ''), coalesce(summary, '') FROM books"))
+    db.commit()
+    rare = rows[books // 2]["title"].split()[0]
+    author = rows[books // 3]["author"].split()[0]
+    return {
+        "selective author": author,
+        "rare title word": rare,
+        "common word": COMMON[0],
+        "two common words": " ".join(COMMON),
+        "common + rare": f"{COMMON[0]} {rare}",
+        "short term": rare[:2],
+    }
+
+def legacy_list(db, q: str, limit: int):
+    # the LIKE search over title / author / isbn that the FTS index replaced
+    from sqlalchemy import select, func, or_
+    from app.model.book import Book
+    stmt = select(Book)
+    count_stmt = select(func.count()).select_from(Book)
+    for t in q.split():
+        cond = or_(Book.title.like(f"%{t}%"), Book.author.like(f"%{t}%"), Book.isbn.like(f"%{t}%"))
+        stmt = stmt.where(cond)
+        count_stmt = count_stmt.where(cond)
+    total = db.execute(count_stmt).scalar_one()
+    items = db.execute(stmt.order_by(Book.created_at.desc(), Book.id.desc()).limit(limit)).scalars().all()
+    return items, total
+
+def timed(fn, rounds: int) -> dict:
+    times = []
+    total = 0
+    for _ in range(rounds):
+        t = time.perf_counter()
+        _, total = fn()
+        times.append((time.perf_counter() - t) * 1000)
+    times.sort()
+    return {"total": total, "p50_ms": round(statistics.median(times), 2), "p99_ms": round(times[min(len(times) - 1, int(len(times) * 0.99))], 2)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark catalogue search (GET /api/books?q=) p50/p99 on a synthetic catalogue: legacy LIKE, FTS ranking every hit, and the current FTS path")
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--data-dir", help="scratch directory for the database (default: a temp dir, removed afterwards)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    scratch = Path(args.data_dir or tempfile.mkdtemp(prefix="bitebook-bench-search-"))
+    scratch.mkdir(parents=True, exist_ok=True)
+    os.environ["BITEBOOK_DATABASE_URL"] = f"sqlite:///{scratch / 'bench.db'}"
+    os.environ["BITEBOOK_DATA_DIR"] = str(scratch)
+    try:
+        from app.main import seed_data
+        from app.config import get_settings
+        from app.db import SessionLocal
+        from app.repository.book_repository import BookRepository
+        seed_data()
+        db = SessionLocal()
+        try:
+            queries = seed(db, args.books)
+            repo = BookRepository()
+            settings = get_settings()
+            cap = settings.book_rank_max_hits
+            rows = []
+            for name, q in queries.items():
+                old = timed(lambda: legacy_list(db, q, args.page_size), args.rounds)
+                # rank every hit by bm25, as before BITEBOOK_BOOK_RANK_MAX_HITS existed
+                settings.book_rank_max_hits = args.books + 1
+                ranked = timed(lambda: repo.list(db, q, 0, args.page_size), args.rounds)
+                settings.book_rank_max_hits = cap
+                new = timed(lambda: repo.list(db, q, 0, args.page_size), args.rounds)
+                rows.append({"query": name, "q": q, "like": old, "fts_rank_all": ranked, "fts": new})
+        finally:
+            db.close()
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps({"books": args.books, "queries": rows}, indent=2))
+        return
+    print(f"books={args.books} page_size={args.page_size} rounds={args.rounds} (times in ms)")
+    print(f"{'query':<18}{'like hits':>10}{'p50':>8}{'p99':>8}{'fts hits':>10}{'rank-all p50':>14}{'p99':>8}{'fts p50':>9}{'p99':>8}")
+    for r in rows:
+        like, ranked, fts = r["like"], r["fts_rank_all"], r["fts"]
+        print(f"{r['query']:<18}{like['total']:>10}{like['p50_ms']:>8}{like['p99_ms']:>8}{fts['total']:>10}{ranked['p50_ms']:>14}{ranked['p99_ms']:>8}{fts['p50_ms']:>9}{fts['p99_ms']:>8}")
+
+if __name__ == "__main__":
+    main()
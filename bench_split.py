@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+def parse_ints(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+def run_once(src: Path, scratch: Path, workers: int, shard: int) -> dict:
+    from app.config import get_settings
+    from app.db import SessionLocal
+    from app.model.book import Book
+    from app.model.task_log import TaskLog
+    from app.service.task_service import TaskService
+    settings = get_settings()
+    settings.split_workers = workers
+    settings.split_shard_pages = shard
+    service = TaskService()
+    db = SessionLocal()
+    try:
+        book = Book(title=f"split w{workers} s{shard}", author="bench")
+        db.add(book)
+        db.commit()
+        out_dir = scratch / "split" / f"w{workers}_s{shard}"
+        task = service.repo.create(db, TaskLog(book_id=book.id, task_type="split_pdf", status="queued", file_name=src.name, output_dir=str(out_dir)))
+        t = time.perf_counter()
+        service.run_split_pdf(db, task.id, src.parent)
+        elapsed = time.perf_counter() - t
+        task = service.repo.get(db, task.id)
+        db.refresh(task)
+        chunks = json.loads(task.progress or "{}").get("chunks", 0)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        return {"workers": workers, "shard_pages": shard, "status": task.status, "seconds": round(elapsed, 2), "pages_per_second": round((task.pages_count or 0) / elapsed, 1), "chunks": chunks}
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep BITEBOOK_SPLIT_WORKERS and BITEBOOK_SPLIT_SHARD_PAGES for run_split_pdf")
+    parser.add_argument("pdf", nargs="?", help="PDF to split (default: a synthetic PDF)")
+    parser.add_argument("--pages", type=int, default=400, help="synthetic PDF size")
+    parser.add_argument("--workers", default="1,2,4", help="comma separated split_workers values")
+    parser.add_argument("--shards", default="8,32,128", help="comma separated split_shard_pages values")
+    parser.add_argument("--data-dir", help="scratch directory for the database and files (default: a temp dir, removed afterwards)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    scratch = Path(args.data_dir or tempfile.mkdtemp(prefix="bitebook-bench-split-"))
+    scratch.mkdir(parents=True, exist_ok=True)
+    os.environ["BITEBOOK_DATABASE_URL"] = f"sqlite:///{scratch / 'bench.db'}"
+    os.environ["BITEBOOK_DATA_DIR"] = str(scratch)
+    try:
+        from app.main import seed_data
+        seed_data()
+        if args.pdf:
+            src = Path(args.pdf).resolve()
+        else:
+            from bench import make_pdf
+            src = scratch / "files" / "bench_split.pdf"
+            src.parent.mkdir(parents=True, exist_ok=True)
+            make_pdf(src, args.pages, 1)
+        rows = [run_once(src, scratch, w, s) for w in parse_ints(args.workers) for s in parse_ints(args.shards)]
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    base = {r["shard_pages"]: r["pages_per_second"] for r in rows if r["workers"] == min(parse_ints(args.workers))}
+    for r in rows:
+        r["speedup"] = round(r["pages_per_second"] / base[r["shard_pages"]], 2) if base.get(r["shard_pages"]) else None
+    report = {"cpus": os.cpu_count(), "pdf": str(args.pdf or f"synthetic {args.pages} pages"), "runs": rows}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"cpus={report['cpus']} pdf={report['pdf']}")
+    print(f"{'workers':>8}{'shard':>7}{'seconds':>9}{'pages/s':>9}{'speedup':>9}{'chunks':>8}{'status':>8}")
+    for r in rows:
+        print(f"{r['workers']:>8}{r['shard_pages']:>7}{r['seconds']:>9}{r['pages_per_second']:>9}{str(r['speedup']):>9}{r['chunks']:>8}{r['status']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+GENERATION_PATH = "/api/v1/services/aigc/text-generation/generation"
+WINDOW_RE = re.compile(r"\[doc_text_id=(\d+), page_number=(\d+)\]\n([^\[]*)")
+
+# default tool-calling script: page through read_book_texts three times, then answer
+DEFAULT_SCRIPT = [
+    {"tool": "read_book_texts", "arguments": {"start": 0, "limit": 10}},
+    {"tool": "read_book_texts", "arguments": {"start": 10, "limit": 10}},
+    {"tool": "read_book_texts", "arguments": {"start": 20, "limit": 10}},
+    {"final": True},
+]
+
+class FakeDashScope:
+    def __init__(self, latency_ms: float = 200, jitter_ms: float = 50, error_rate: float = 0.0, throttle_rps: float = 0.0, script: Optional[List[Dict[str, Any]]] = None, questions: int = 2, seed: Optional[int] = None):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.throttle_rps = throttle_rps
+        self.script = script or DEFAULT_SCRIPT
+        self.questions = questions
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window: List[float] = []
+        self.stats = {"requests": 0, "ok": 0, "tool_calls": 0, "throttled": 0, "errors": 0, "unauthorized": 0}
+
+    def handle(self, headers, body: Dict[str, Any]):
+        with self.lock:
+            self.stats["requests"] += 1
+        if not (headers.get("Authorization") or "").startswith("Bearer "):
+            return self._error(401, "InvalidApiKey", "Invalid API-key provided.", "unauthorized")
+        if self.throttle_rps > 0:
+            now = time.monotonic()
+            with self.lock:
+                self.window = [t for t in self.window if now - t < 1.0]
+                limited = len(self.window) >= self.throttle_rps
+                if not limited:
+                    self.window.append(now)
+            if limited:
+                return self._error(429, "Throttling.RateQuota", "Requests rate limit exceeded, please try again later.", "throttled")
+        time.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+        if self.error_rate and self.random.random() < self.error_rate:
+            return self._error(500, "InternalError", "An internal error has occured, please try again later.", "errors")
+        messages = (body.get("input") or {}).get("messages") or []
+        tools = (body.get("parameters") or {}).get("tools") or []
+        if tools:
+            step = sum(1 for m in messages if m.get("role") == "assistant")
+            action = self.script[min(step, len(self.script) - 1)]
+            if not action.get("final") and any(t.get("function", {}).get("name") == action["tool"] for t in tools):
+                with self.lock:
+                    self.stats["tool_calls"] += 1
+                call = {"index": 0, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "function", "function": {"name": action["tool"], "arguments": json.dumps(action.get("arguments") or {})}}
+                return self._ok({"role": "assistant", "content": "", "tool_calls": [call]}, "tool_calls", messages)
+        return self._ok({"role": "assistant", "content": self._answer(messages)}, "stop", messages)
+
+    def _answer(self, messages: List[Dict[str, Any]]) -> str:
+        sources = []
+        for m in messages:
+            content = m.get("content") or ""
+            if m.get("role") == "tool":
+                try:
+                    sources += [(it["id"], it["page_number"], it.get("text") or "") for it in json.loads(content).get("items", [])]
+                except (ValueError, KeyError, AttributeError):
+                    pass
+            elif m.get("role") == "user":
+                sources += [(int(i), int(p), t.strip()) for i, p, t in WINDOW_RE.findall(content)]
+        sources = [s for s in sources if s[2]]
+        if not sources:
+            last = (messages[-1].get("content") or "") if messages else ""
+            if "总结" in last:
+                body = last.split("\n\n", 1)[-1]
+                return body[:120]
+            return "[]"
+        picks = sources[:: max(1, len(sources) // self.questions)][: self.questions]
+        return json.dumps([
+            {"doc_text_id": i, "page_number": p, "question": f"这段文本的要点是什么？（{t[:20]}）", "answer": f"要点：{t[:80]}"}
+            for i, p, t in picks
+        ], ensure_ascii=False)
+
+    def _ok(self, message: Dict[str, Any], finish_reason: str, messages: List[Dict[str, Any]]):
+        with self.lock:
+            self.stats["ok"] += 1
+        input_tokens = sum(len(m.get("content") or "") for m in messages)
+        output_tokens = len(message.get("content") or "")
+        return 200, {
+            "request_id": uuid.uuid4().hex,
+            "output": {"text": None, "finish_reason": None, "choices": [{"finish_reason": finish_reason, "message": message}]},
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens},
+        }
+
+    def _error(self, status: int, code: str, message: str, counter: str):
+        with self.lock:
+            self.stats[counter] += 1
+        return status, {"request_id": uuid.uuid4().hex, "code": code, "message": message}
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8799) -> ThreadingHTTPServer:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                if self.path.rstrip("/") != GENERATION_PATH:
+                    return self._send(404, {"code": "NotFound", "message": self.path})
+                raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                try:
+                    body = json.loads(raw or b"{}")
+                except ValueError:
+                    return self._send(400, {"code": "InvalidParameter", "message": "malformed JSON"})
+                self._send(*fake.handle(self.headers, body))
+
+            def do_GET(self):
+                if self.path == "/stats":
+                    with fake.lock:
+                        return self._send(200, dict(fake.stats))
+                self._send(404, {"code": "NotFound", "message": self.path})
+
+            def _send(self, status: int, payload: Dict[str, Any]):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", "1")
+                self.end_headers()
+                self.wfile.write(data)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        return server
+
+    def start(self, host: str = "127.0.0.1", port: int = 8799) -> ThreadingHTTPServer:
+        server = self.serve(host, port)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the DashScope text generation API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--throttle-rps", type=float, default=0.0, help="answer HTTP 429 above this many requests per second")
+    parser.add_argument("--script", help="JSON file with tool-call steps, e.g. [{\"tool\": \"read_book_texts\", \"arguments\": {...}}, {\"final\": true}]")
+    parser.add_argument("--questions", type=int, default=2, help="questions per answer")
+    args = parser.parse_args()
+    script = None
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            script = json.load(f)
+    fake = FakeDashScope(args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rps, script, args.questions)
+    server = fake.serve(args.host, args.port)
+    print(f"fake DashScope listening on http://{args.host}:{args.port}/api/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ export interface Book {
   published_year?: number | null
   isbn?: string | null
   cover_url?: string | null
+  cover_thumb_url?: string | null
   preview_images?: string[] | null
   task_status?: string | null
   task_pages_count?: number | null
@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# settings are read once at import time, so the scratch database must be configured before app is imported
+_scratch = Path(tempfile.mkdtemp(prefix="bitebook-tests-"))
+os.environ["BITEBOOK_DATABASE_URL"] = f"sqlite:///{_scratch / 'test.db'}"
+os.environ["BITEBOOK_DATA_DIR"] = str(_scratch)
+os.environ["BITEBOOK_SPLIT_WORKERS"] = "1"
+os.environ.pop("DASHSCOPE_API_KEY", None)
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    from app.main import seed_data
+    seed_data()
+    yield
+    shutil.rmtree(_scratch, ignore_errors=True)
+
+@pytest.fixture
+def db():
+    from app.db import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def files_dir():
+    from app.config import get_settings
+    d = get_settings().files_dir
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+@pytest.fixture
+def make_pdf(files_dir):
+    import fitz
+
+    def make(name: str, pages: int) -> Path:
+        path = files_dir / name
+        doc = fitz.open()
+        for p in range(pages):
+            page = doc.new_page()
+            y = 72
+            for para in range(3):
+                text = f"Page {p + 1} paragraph {para + 1}. " + " ".join(f"w{(p * 7 + para * 3 + k) % 997}" for k in range(30))
+                page.insert_textbox(fitz.Rect(72, y, page.rect.width - 72, y + 100), text, fontsize=10)
+                y += 110
+        doc.save(str(path))
+        doc.close()
+        return path
+
+    return make
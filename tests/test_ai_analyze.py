@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from app.config import get_settings
+from app.model.book import Book
+from app.model.doc_text import DocText
+from app.model.explanation import Explanation
+from app.model.question import Question
+from app.model.task_log import TaskLog
+from app.service import ai_client
+from app.service.task_service import TaskService
+
+def make_book(db, name, chunks=4):
+    book = Book(title=name, author="test")
+    db.add(book)
+    db.flush()
+    db.add_all(DocText(book_id=book.id, page_number=i + 1, source="pdf", file_path=f"{name}_{i}.pdf", text=f"{name} chunk {i} about tides and harbours") for i in range(chunks))
+    db.commit()
+    return book.id
+
+def analyze(db, book_id, mode, service=None):
+    service = service or TaskService()
+    task = service.queue_analyze_ai(db, book_id, mode)
+    service.run_analyze_ai(db, task.id)
+    db.expire_all()
+    return db.get(TaskLog, task.id)
+
+def questions(db, book_id):
+    return db.query(Question).filter(Question.book_id == book_id).all()
+
+MIXED = [
+    {"doc_text_id": 0, "question": "What do tides do?", "answer": "They rise and fall."},
+    {"doc_text_id": 0, "question": "Missing answer?", "answer": None},
+    {"doc_text_id": 0, "question": "Blank answer?", "answer": "  "},
+    {"doc_text_id": 0, "question": "", "answer": "orphan answer"},
+    {"doc_text_id": 0, "question": "Numeric answer?", "answer": 42},
+]
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    calls = {"analyze_chat": 0}
+
+    def generate(kind, messages, api_key, tools=None, deadline=None, metrics=None):
+        if kind == "analyze_chat":
+            calls["analyze_chat"] += 1
+            if calls["analyze_chat"] <= 2:
+                return {"role": "assistant", "content": "", "tool_calls": [{"id": str(calls["analyze_chat"]), "function": {"name": "read_book_texts", "arguments": "{}"}}]}
+        return {"role": "assistant", "content": json.dumps(MIXED)}
+
+    monkeypatch.setenv("DASHSCOPE_API_KEY", "test")
+    monkeypatch.setattr(ai_client, "generate", generate)
+    return calls
+
+def test_items_without_an_answer_are_dropped(db, fake_model):
+    book_id = make_book(db, "answers")
+    task = analyze(db, book_id, "incremental")
+    assert task.status == "done", task.message
+    saved = questions(db, book_id)
+    assert [q.text for q in saved] == ["What do tides do?"]
+    assert db.query(Explanation).filter(Explanation.question_id == saved[0].id).one().text == "They rise and fall."
+
+def test_chat_mode_reports_the_rounds_it_used(db, fake_model, monkeypatch):
+    monkeypatch.setattr(get_settings(), "ai_analyze_mode", "chat")
+    book_id = make_book(db, "rounds")
+    task = analyze(db, book_id, "full")
+    assert task.status == "done", task.message
+    progress = json.loads(task.progress)
+    assert (progress["unit"], progress["done"], progress["total"]) == ("rounds", 2, 2)
+    assert fake_model["analyze_chat"] == 3
+
+def test_chat_full_run_covers_the_book_for_later_incremental_runs(db, fake_model, monkeypatch):
+    monkeypatch.setattr(get_settings(), "ai_analyze_mode", "chat")
+    book_id = make_book(db, "chat coverage")
+    assert analyze(db, book_id, "full").status == "done"
+    after_full = len(questions(db, book_id))
+    assert after_full == 1
+    task = analyze(db, book_id, "incremental")
+    assert task.status == "done"
+    assert json.loads(task.progress)["total"] == 0
+    assert len(questions(db, book_id)) == after_full
+    assert analyze(db, book_id, "full").status == "done"
+    assert len(questions(db, book_id)) == after_full
+
+def test_window_questions_and_coverage_commit_together(db, fake_model, monkeypatch):
+    book_id = make_book(db, "atomic window")
+    service = TaskService()
+
+    def broken_mark(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(service.coverage_repo, "mark", broken_mark)
+    task = analyze(db, book_id, "incremental", service)
+    assert task.status == "failed"
+    assert questions(db, book_id) == []
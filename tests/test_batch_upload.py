@@ -0,0 +1,103 @@
+import io
+import json
+import zipfile
+from pathlib import Path
+
+from fastapi import UploadFile
+
+from app.model.doc_text import DocText
+from app.model.task_log import TaskLog
+from app.service.task_service import TaskService
+from app.service.task_worker import execute_task
+from app.service.upload_service import UploadService
+
+def corrupt_zip(entries):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in entries:
+            zf.writestr(name, data)
+    raw = bytearray(buf.getvalue())
+    # flip bytes inside the compressed body of the entry called broken.pdf
+    at = raw.index(b"broken.pdf") + len("broken.pdf") + 40
+    for i in range(at, at + 16):
+        raw[i] ^= 0xFF
+    return bytes(raw)
+
+def test_zip_entries_fail_alone_and_duplicates_reuse_the_first_split(db, files_dir, make_pdf):
+    pdf = make_pdf("batch_source.pdf", 3).read_bytes()
+    noise = bytes((i * 7919) % 251 for i in range(200_000))
+    archive = corrupt_zip([
+        ("broken.pdf", b"%PDF-1.4\n" + noise),
+        ("huge.pdf", b"%PDF-1.4\n" + b"0" * (2 * 1024 * 1024)),
+        ("first.pdf", pdf),
+        ("again.pdf", pdf),
+    ])
+    upload = UploadFile(io.BytesIO(archive), filename="books.zip")
+    entries, skipped = UploadService().upload_batch(db, [upload], files_dir, 10, max_entry_mb=1)
+    reasons = {s["file_name"]: s["reason"] for s in skipped}
+    assert reasons["books.zip/broken.pdf"].startswith("Unreadable ZIP entry")
+    assert reasons["books.zip/huge.pdf"].startswith("Larger than 1 MB")
+    assert [meta.file_name for _, meta, _ in entries] == ["first.pdf", "again.pdf"]
+
+    service = TaskService()
+    reused = service.queue_batch(db, "dupbatch", entries, files_dir)
+    assert reused == [False, True]
+    (first, first_meta, _), (again, _, _) = entries
+    tasks = service.repo.list_by_batch(db, "dupbatch")
+    split = next(t for t in tasks if t.task_type == "split_pdf")
+    assert split.book_id == first.id
+    assert split.output_dir == str(files_dir / Path(first_meta.file_path).stem)
+    reuse = next(t for t in tasks if t.task_type == "reuse_book")
+    assert reuse.book_id == again.id and json.loads(reuse.options) == {"source_book_id": first.id}
+
+    order = []
+    while True:
+        task_id = service.repo.claim_next(db, "test", 60)
+        if task_id is None:
+            break
+        task = db.get(TaskLog, task_id)
+        assert task.batch_id == "dupbatch"
+        order.append((task.book_id, task.task_type))
+        execute_task(task_id)
+    assert order.index((again.id, "reuse_book")) > order.index((first.id, "summarize"))
+    assert (again.id, "split_pdf") not in order
+
+    db.expire_all()
+    assert all(t.status == "done" for t in service.repo.list_by_batch(db, "dupbatch"))
+    pages = lambda b: sorted(r[0] for r in db.query(DocText.page_number).filter(DocText.book_id == b))
+    assert pages(again.id) == pages(first.id) and pages(first.id)
+    assert db.get(type(again), again.id).summary == db.get(type(first), first.id).summary
+
+def test_stored_duplicates_are_queued_not_copied_in_the_request(db, files_dir, make_pdf, monkeypatch):
+    pdf = make_pdf("stored_dup.pdf", 2).read_bytes()
+    service = TaskService()
+    upload = lambda: UploadFile(io.BytesIO(pdf), filename="stored_dup.pdf")
+    (first, _, _), = UploadService().upload_batch(db, [upload()], files_dir, 10)[0]
+    (book, meta, source), = UploadService().upload_batch(db, [upload()], files_dir, 10)[0]
+    assert source is not None and source.book_id == first.id
+
+    def inline_copy(*args, **kwargs):
+        raise AssertionError("duplicates must be copied by the worker")
+
+    monkeypatch.setattr(service, "reuse_book", inline_copy)
+    assert service.queue_batch(db, "storeddup", [(book, meta, source)], files_dir) == [True]
+    tasks = [t for t in service.repo.list_by_batch(db, "storeddup") if t.task_type != "render_cover"]
+    assert [(t.task_type, json.loads(t.options)) for t in tasks] == [("reuse_book", {"source_book_id": first.id})]
+    db.query(TaskLog).filter(TaskLog.batch_id == "storeddup").delete(synchronize_session=False)
+    db.commit()
+
+def test_single_duplicate_upload_only_queues_a_reuse(db, files_dir, make_pdf, monkeypatch):
+    from app.api import upload as api
+    data = make_pdf("single_dup.pdf", 2).read_bytes()
+    service = UploadService()
+    upload = lambda: UploadFile(io.BytesIO(data), filename="single_dup.pdf", headers={"content-type": "application/pdf"})
+    book_data = {"title": "dup", "author": "test"}
+    first, _, _ = service.upload_book(db, upload(), book_data, files_dir)
+    book, meta, source = service.upload_book(db, upload(), book_data, files_dir)
+    assert source is not None and source.book_id == first.id
+    monkeypatch.setattr(api.task_service, "reuse_book", None)
+    assert api._dispatch(db, book, meta, source, files_dir)["deduplicated"] is True
+    tasks = db.query(TaskLog).filter(TaskLog.book_id == book.id, TaskLog.task_type != "render_cover").all()
+    assert [(t.task_type, t.status, json.loads(t.options or "{}")) for t in tasks] == [("reuse_book", "queued", {"source_book_id": first.id})]
+    db.query(TaskLog).filter(TaskLog.book_id.in_((first.id, book.id))).delete(synchronize_session=False)
+    db.commit()
@@ -0,0 +1,17 @@
+from app.api.books import book_dicts
+from app.model.book import Book
+from app.model.book_meta import BookMeta
+
+def test_cover_urls_only_once_the_cover_is_rendered(db):
+    books = []
+    for n, cover in enumerate((None, "rendered.jpg")):
+        book = Book(title=f"cover {n}", author="test")
+        db.add(book)
+        db.flush()
+        db.add(BookMeta(book_id=book.id, file_name=f"cover{n}.pdf", file_path=f"files/cover{n}.pdf", mime_type="application/pdf", file_size=1, sha256=f"{n:064x}", cover_file=cover))
+        books.append(book)
+    db.commit()
+    pending, rendered = book_dicts(db, books)
+    assert pending["cover_url"] is None and pending["cover_thumb_url"] is None
+    assert rendered["cover_url"].endswith("/lg.jpg")
+    assert rendered["cover_thumb_url"]
@@ -0,0 +1,56 @@
+from contextlib import contextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.db import engine
+from app.main import app
+from app.model.book import Book
+from app.model.book_meta import BookMeta
+from app.model.task_log import TaskLog
+from app.repository.book_search_repository import BookSearchRepository
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+@pytest.fixture(scope="module")
+def client():
+    from app.db import SessionLocal
+    db = SessionLocal()
+    try:
+        for i in range(60):
+            book = Book(title=f"Query count {i}", author="test")
+            db.add(book)
+            db.flush()
+            BookSearchRepository().upsert(db, book, commit=False)
+            for n in range(2):
+                db.add(BookMeta(book_id=book.id, file_name=f"q{i}_{n}.pdf", file_path=f"files/q{i}_{n}.pdf", mime_type="application/pdf", file_size=1, sha256=f"{i:032x}{n:032x}", cover_file=f"{i}.jpg"))
+                db.add(TaskLog(book_id=book.id, task_type="split_pdf", status="done", file_name=f"q{i}_{n}.pdf", output_dir="", pages_count=n + 1))
+        db.commit()
+    finally:
+        db.close()
+    return TestClient(app)
+
+def statements_for(client, path):
+    with count_statements() as statements:
+        r = client.get(path)
+    assert r.status_code == 200
+    return len(r.json()["items"]), len(statements)
+
+@pytest.mark.parametrize("query", ["", "&q=Query", "&cursor="])
+def test_book_list_query_count_does_not_grow_with_page_size(client, query):
+    small_items, small = statements_for(client, f"/api/books/?page_size=1{query}")
+    large_items, large = statements_for(client, f"/api/books/?page_size=50{query}")
+    assert (small_items, large_items) == (1, 50)
+    assert small == large
@@ -0,0 +1,45 @@
+import pytest
+
+from app.config import get_settings
+from app.model.book import Book
+from app.repository.book_repository import BookRepository
+from app.repository.book_search_repository import BookSearchRepository
+
+@pytest.fixture(scope="module")
+def catalogue():
+    from app.db import SessionLocal
+    db = SessionLocal()
+    try:
+        ids = []
+        for i in range(30):
+            title = f"Catalogue {'lighthouse' if i % 3 else 'harbour'} {i}"
+            book = Book(title=title, author="Keeper" if i % 2 else "Sailor", description="tide pools and gulls" if i % 5 == 0 else None)
+            db.add(book)
+            db.flush()
+            BookSearchRepository().upsert(db, book, commit=False)
+            ids.append(book.id)
+        db.commit()
+        return ids
+    finally:
+        db.close()
+
+@pytest.mark.parametrize("q", ["lighthouse", "lighthouse Keeper", "harbour", "gulls", "lighthouse 1"])
+def test_common_terms_skip_ranking_but_find_the_same_books(db, catalogue, monkeypatch, q):
+    repo = BookRepository()
+    ranked, ranked_total = repo.list(db, q, 0, 100)
+    monkeypatch.setattr(get_settings(), "book_rank_max_hits", 0)
+    walked, walked_total = repo.list(db, q, 0, 100)
+    assert ranked_total == walked_total == len(ranked) > 0
+    assert {b.id for b in ranked} == {b.id for b in walked}
+    assert [b.id for b in walked] == sorted((b.id for b in walked), reverse=True)
+    first, _ = repo.list(db, q, 0, 2)
+    second, _ = repo.list(db, q, 2, 2)
+    assert [b.id for b in first + second] == [b.id for b in walked][:4]
+    after, _ = repo.list_after(db, q, None, 100)
+    assert {b.id for b in after} == {b.id for b in ranked}
+
+def test_estimate_hits_is_an_upper_bound(db, catalogue):
+    search = BookSearchRepository()
+    for q in (["lighthouse"], ["harbour"], ["lighthouse", "Keeper"], ["nowhere"]):
+        assert search.estimate_hits(db, q) >= search.count(db, q)
+    assert search.estimate_hits(db, ["nowhere"]) == 0
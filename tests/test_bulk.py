@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from app.model.book import Book
+from app.model.doc_text import DocText
+from app.repository.bulk import as_rows
+from app.repository.doc_text_repository import DocTextRepository
+
+def make_book(db):
+    book = Book(title="bulk", author="test")
+    db.add(book)
+    db.commit()
+    return book.id
+
+def entry(book_id, page, **kw):
+    return DocText(book_id=book_id, page_number=page, source="pdf", file_path=f"page_{page}.pdf", text=f"page {page}", **kw)
+
+def test_as_rows_omits_unset_columns_with_defaults(db):
+    stamp = datetime(2020, 1, 2, 3, 4, 5)
+    rows = as_rows([entry(1, 1), entry(1, 2, created_at=stamp)])
+    assert "created_at" not in rows[0]
+    assert rows[1]["created_at"] == stamp
+    assert "bbox_x" not in rows[0]
+
+def test_bulk_create_keeps_server_defaults_and_order(db):
+    book_id = make_book(db)
+    stamp = datetime(2020, 1, 2, 3, 4, 5)
+    entries = [entry(book_id, 1), entry(book_id, 2, created_at=stamp), entry(book_id, 3), entry(book_id, 4, bbox_x=1.0)]
+    DocTextRepository().bulk_create(db, entries)
+    assert [e.id for e in entries] == sorted(e.id for e in entries)
+    db.expire_all()
+    stored = {t.page_number: t for t in db.query(DocText).filter(DocText.book_id == book_id)}
+    assert stored[1].created_at is not None and stored[1].created_at != stamp
+    assert stored[2].created_at == stamp
+    assert stored[3].created_at is not None
+    assert stored[4].bbox_x == 1.0 and stored[1].bbox_x is None
+    assert [stored[p].id for p in (1, 2, 3, 4)] == [e.id for e in entries]
@@ -0,0 +1,24 @@
+from app.service.chunker import Chunker
+
+def block(*lines):
+    return {"type": 0, "lines": [{"bbox": (0, i * 12, 100, i * 12 + 10), "spans": [{"text": t}]} for i, t in enumerate(lines)]}
+
+def test_cjk_sentences_are_joined_without_spaces():
+    chunker = Chunker(target=400)
+    assert chunker.chunk_text("中文句子。第二句！") == ["中文句子。第二句！"]
+    assert chunker.chunk_text("他说：「好。」然后走了。") == ["他说：「好。」然后走了。"]
+
+def test_latin_sentences_keep_their_spaces():
+    chunker = Chunker(target=400)
+    assert chunker.chunk_text("First one.  Second one! Third?") == ["First one. Second one! Third?"]
+    assert chunker.chunk_text("He said “hi.” Then left.") == ["He said “hi.” Then left."]
+
+def test_wrapped_cjk_lines_and_blocks_are_glued():
+    chunker = Chunker(target=400, min_block=50)
+    chunks = chunker.chunk_blocks([block("这是第一段文字，", "换行后继续。"), block("English heading"), block("下一段。")])
+    assert [c for c, _ in chunks] == ["这是第一段文字，换行后继续。English heading 下一段。"]
+
+def test_cjk_chunks_fill_up_to_the_target():
+    chunker = Chunker(target=10)
+    chunks = chunker.chunk_text("一二三四。五六七八。九十一二。")
+    assert chunks == ["一二三四。五六七八。", "九十一二。"]
@@ -0,0 +1,53 @@
+import io
+import json
+
+import pytest
+
+from app.model.book import Book
+from app.model.doc_text import DocText
+from app.model.question import Question
+from app.service.export_service import export_service
+
+HEADER = {"type": "header", "format": "bitebook-export", "version": 1, "book_id": 7}
+BOOK = {"type": "book", "title": "Imported", "author": "Someone"}
+TEXT = {"type": "doc_text", "id": 1, "page_number": 1, "source": "pdf", "file_path": "p1.pdf", "text": "hello"}
+END = {"type": "end", "counts": {}}
+
+def stream(*lines):
+    return io.BytesIO(b"".join((l if isinstance(l, bytes) else json.dumps(l).encode()) + b"\n" for l in lines))
+
+def book_count(db):
+    db.expire_all()
+    return db.query(Book).count()
+
+def test_import_round_trip(db):
+    question = {"type": "question", "id": 3, "doc_text_id": 1, "page_number": 1, "text": "why?"}
+    explanation = {"type": "explanation", "question_id": 3, "text": "because"}
+    result = export_service.import_stream(db, stream(HEADER, BOOK, TEXT, question, explanation, END))
+    assert result["counts"] == {"doc_text": 1, "question": 1, "explanation": 1, "coverage": 0}
+    book_id = result["book_id"]
+    text_id = db.query(DocText.id).filter(DocText.book_id == book_id).scalar()
+    assert db.query(Question.doc_text_id).filter(Question.book_id == book_id).scalar() == text_id
+    again = b"".join(export_service.stream(book_id))
+    assert json.loads(again.splitlines()[1])["title"] == "Imported"
+
+@pytest.mark.parametrize("bad", [
+    b"[1, 2]",
+    {"type": "doc_text", "page_number": "abc"},
+    {**TEXT, "page_number": "abc"},
+    {**TEXT, "source": None},
+    {**TEXT, "page_number": True},
+    {"type": "question", "id": 1, "text": 5},
+    {"type": "explanation", "question_id": "x", "text": "t"},
+])
+def test_malformed_records_are_rejected_without_an_orphan_book(db, bad):
+    before = book_count(db)
+    with pytest.raises(ValueError):
+        export_service.import_stream(db, stream(HEADER, BOOK, TEXT, bad, END))
+    assert book_count(db) == before
+
+def test_truncated_export_leaves_no_book(db):
+    before = book_count(db)
+    with pytest.raises(ValueError, match="truncated"):
+        export_service.import_stream(db, stream(HEADER, BOOK, TEXT))
+    assert book_count(db) == before
@@ -0,0 +1,35 @@
+import asyncio
+
+from app.model.book import Book
+from app.model.task_log import TaskLog
+from app.service.progress import ProgressHub
+
+async def collect(hub, task_id, limit=10):
+    out = []
+    async for snap in hub.subscribe(task_id, keepalive=0.2):
+        out.append(snap)
+        if len(out) >= limit:
+            break
+    return out
+
+def test_subscribers_get_a_gone_event_when_the_task_is_deleted(db, monkeypatch):
+    book = Book(title="progress gone", author="test")
+    db.add(book)
+    db.commit()
+    task = TaskLog(book_id=book.id, task_type="split_pdf", status="running", file_name="", output_dir="")
+    db.add(task)
+    db.commit()
+    hub = ProgressHub()
+    monkeypatch.setattr(hub.settings, "progress_poll_seconds", 0.05)
+
+    async def scenario():
+        subscribers = [asyncio.create_task(collect(hub, task.id)) for _ in range(2)]
+        await asyncio.sleep(0.3)
+        db.delete(task)
+        db.commit()
+        return await asyncio.wait_for(asyncio.gather(*subscribers), timeout=5)
+
+    for events in asyncio.run(scenario()):
+        assert events[0]["status"] == "running"
+        assert events[-1] == {"task_id": task.id, "status": "gone"}
+    assert not hub._subs and not hub._pollers
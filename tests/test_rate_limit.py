@@ -0,0 +1,35 @@
+import multiprocessing
+import time
+
+from app.service.llm_client import SharedRateLimiter
+
+RATE = 20.0
+PER_PROCESS = 10
+
+def drain(name, start, out):
+    limiter = SharedRateLimiter(name, RATE, 1)
+    while time.time() < start:
+        time.sleep(0.005)
+    for _ in range(PER_PROCESS):
+        assert limiter.acquire()
+        out.put(time.time())
+
+def test_processes_share_one_bucket():
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    start = time.time() + 5
+    procs = [ctx.Process(target=drain, args=("shared-test", start, out)) for _ in range(3)]
+    for p in procs:
+        p.start()
+    stamps = sorted(out.get(timeout=60) for _ in range(3 * PER_PROCESS))
+    for p in procs:
+        p.join()
+    # 30 tokens at 20/s with a burst of 1 need at least 29 refills; three private buckets would finish in ~0.45 s
+    assert stamps[-1] - stamps[0] >= (3 * PER_PROCESS - 1) / RATE * 0.9
+
+def test_deadline_gives_up_instead_of_waiting():
+    limiter = SharedRateLimiter("deadline-test", 0.5, 1)
+    assert limiter.acquire()
+    t = time.monotonic()
+    assert not limiter.acquire(deadline=time.monotonic() + 0.2)
+    assert time.monotonic() - t < 0.2
@@ -0,0 +1,122 @@
+import multiprocessing
+import time
+import tracemalloc
+from collections import Counter
+
+from sqlalchemy import text
+
+from app.model.analysis_coverage import AnalysisCoverage
+from app.model.book import Book
+from app.model.doc_text import DocText
+from app.model.task_log import TaskLog
+from app.service import task_service as task_module
+from app.service.task_service import TaskService
+from app.service.retrieval import retrieval_service
+from app.service.task_worker import execute_task
+
+def queue_split(db, files_dir, pdf, name):
+    book = Book(title=name, author="test")
+    db.add(book)
+    db.commit()
+    task = TaskService().repo.create(db, TaskLog(book_id=book.id, task_type="split_pdf", status="queued", file_name=pdf.name, output_dir=str(files_dir / name)))
+    return book.id, task.id
+
+def page_texts(db, book_id):
+    return Counter(db.query(DocText.page_number, DocText.text).filter(DocText.book_id == book_id).all())
+
+def fts_count(db, book_id):
+    return db.execute(text("SELECT count(*) FROM doc_text_fts WHERE book_id = :b"), {"b": book_id}).scalar_one()
+
+def test_split_resumes_from_checkpoint_after_kill(db, files_dir, make_pdf, monkeypatch):
+    pages = 600
+    pdf = make_pdf("resume.pdf", pages)
+    monkeypatch.setenv("BITEBOOK_SPLIT_SHARD_PAGES", "16")
+    book_id, task_id = queue_split(db, files_dir, pdf, "resume")
+
+    proc = multiprocessing.get_context("spawn").Process(target=execute_task, args=(task_id,))
+    proc.start()
+    deadline = time.monotonic() + 120
+    checkpoint = 0
+    while time.monotonic() < deadline:
+        db.expire_all()
+        checkpoint = db.get(TaskLog, task_id).checkpoint or 0
+        if checkpoint >= 64:
+            break
+        time.sleep(0.05)
+    proc.kill()
+    proc.join()
+
+    db.expire_all()
+    task = db.get(TaskLog, task_id)
+    assert task.status == "running"
+    assert 0 < task.checkpoint < pages
+
+    TaskService().run_split_pdf(db, task_id, files_dir)
+    db.expire_all()
+    assert db.get(TaskLog, task_id).status == "done"
+
+    ref_book, ref_task = queue_split(db, files_dir, pdf, "reference")
+    TaskService().run_split_pdf(db, ref_task, files_dir)
+
+    resumed = page_texts(db, book_id)
+    reference = page_texts(db, ref_book)
+    assert set(p for p, _ in resumed) == set(range(1, pages + 1))
+    assert max(resumed.values()) == 1
+    assert resumed == reference
+    assert fts_count(db, book_id) == sum(resumed.values())
+
+def peak_split_memory(db, files_dir, pdf, name):
+    _, task_id = queue_split(db, files_dir, pdf, name)
+    tracemalloc.start()
+    try:
+        TaskService().run_split_pdf(db, task_id, files_dir)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    db.expire_all()
+    assert db.get(TaskLog, task_id).status == "done"
+    return peak
+
+def test_split_memory_is_flat_in_page_count(db, files_dir, make_pdf, monkeypatch):
+    monkeypatch.setattr(task_module.get_settings(), "split_shard_pages", 32)
+    small = peak_split_memory(db, files_dir, make_pdf("small.pdf", 200), "small")
+    large = peak_split_memory(db, files_dir, make_pdf("large.pdf", 3000), "large")
+    assert large < small * 2
+
+def test_split_marks_the_task_failed_after_a_database_error(db, files_dir, make_pdf, monkeypatch):
+    _, task_id = queue_split(db, files_dir, make_pdf("db_error.pdf", 3), "db_error")
+    service = TaskService()
+
+    def broken_index(db, book_id, *pages):
+        # a failed flush leaves the session unusable until it is rolled back
+        db.add(DocText(book_id=book_id, page_number=None, source="pdf", file_path=""))
+        db.flush()
+
+    monkeypatch.setattr(service.search_repo, "index_pages", broken_index)
+    service.run_split_pdf(db, task_id, files_dir)
+    db.expire_all()
+    task = db.get(TaskLog, task_id)
+    assert task.status == "failed"
+    assert "NOT NULL" in task.message
+
+def test_dropping_pages_on_resume_drops_their_coverage(db, files_dir, make_pdf):
+    book_id, task_id = queue_split(db, files_dir, make_pdf("coverage_resume.pdf", 6), "coverage_resume")
+    service = TaskService()
+    service.run_split_pdf(db, task_id, files_dir)
+    service.coverage_repo.mark_book(db, book_id, False)
+    service.search_repo.delete_by_book(db, book_id, 2)
+    service.text_repo.delete_after_page(db, book_id, 2)
+    kept = db.query(DocText.id).filter(DocText.book_id == book_id).count()
+    assert kept > 0
+    assert db.query(AnalysisCoverage).filter(AnalysisCoverage.book_id == book_id).count() == kept
+
+def test_bm25_index_is_built_on_first_lookup_and_dropped_by_a_new_split(db, files_dir, make_pdf):
+    pdf = make_pdf("lazy_index.pdf", 4)
+    book_id, task_id = queue_split(db, files_dir, pdf, "lazy_index")
+    TaskService().run_split_pdf(db, task_id, files_dir)
+    assert retrieval_service.repo.stamp(db, book_id) is None
+    hits = retrieval_service.search(db, book_id, "paragraph", 3)
+    assert hits and retrieval_service.repo.stamp(db, book_id) is not None
+    again = TaskService().repo.create(db, TaskLog(book_id=book_id, task_type="split_pdf", status="queued", file_name=pdf.name, output_dir=str(files_dir / "lazy_index")))
+    TaskService().run_split_pdf(db, again.id, files_dir)
+    assert retrieval_service.repo.stamp(db, book_id) is None
@@ -0,0 +1,64 @@
+import os
+import signal
+import threading
+import time
+
+from app.model.book import Book
+from app.model.task_log import TaskLog
+from app.service.task_worker import TaskWorker, execute_task
+
+def wait_for(predicate, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+def test_unknown_task_type_fails_with_finished_at(db):
+    book = Book(title="unknown task", author="test")
+    db.add(book)
+    db.commit()
+    task = TaskLog(book_id=book.id, task_type="no_such_type", status="running", file_name="", output_dir="")
+    db.add(task)
+    db.commit()
+    execute_task(task.id)
+    db.expire_all()
+    task = db.get(TaskLog, task.id)
+    assert task.status == "failed"
+    assert task.finished_at is not None
+
+def test_worker_replaces_the_pool_after_a_child_dies(db, files_dir, make_pdf, monkeypatch):
+    monkeypatch.setenv("BITEBOOK_SPLIT_SHARD_PAGES", "8")
+    pdf = make_pdf("worker_kill.pdf", 300)
+    book = Book(title="worker kill", author="test")
+    db.add(book)
+    db.commit()
+    task = TaskLog(book_id=book.id, task_type="split_pdf", status="queued", file_name=pdf.name, output_dir=str(files_dir / "worker_kill"))
+    db.add(task)
+    db.commit()
+
+    worker = TaskWorker(workers=1)
+    monkeypatch.setattr(worker.settings, "task_poll_seconds", 0.05)
+    thread = threading.Thread(target=worker.run_forever, daemon=True)
+    thread.start()
+    try:
+        assert wait_for(lambda: worker.inflight and worker.pool._processes)
+        first_pool = worker.pool
+        for pid in list(first_pool._processes):
+            os.kill(pid, signal.SIGKILL)
+
+        def finished():
+            db.expire_all()
+            return db.get(TaskLog, task.id).status in ("done", "failed")
+
+        assert wait_for(finished)
+        assert worker.pool is not first_pool
+        assert thread.is_alive()
+        db.expire_all()
+        done = db.get(TaskLog, task.id)
+        assert done.status == "done"
+        assert done.attempts == 2
+    finally:
+        worker.stop()
+        thread.join(timeout=30)
@@ -0,0 +1,116 @@
+import hashlib
+import socket
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+import uvicorn
+
+from app.config import get_settings
+from app.model.upload_session import UploadSession
+from app.service.upload_service import UploadService
+
+def test_only_one_writer_per_session_across_service_instances(db, files_dir):
+    upload = UploadService().create_session(db, "claim.pdf", "application/pdf", None, files_dir)
+    first = UploadService().open_chunk(db, upload.id, 0, files_dir)
+    with pytest.raises(ValueError):
+        UploadService().open_chunk(db, upload.id, 0, files_dir)
+    first.write(b"%PDF-1.4 first")
+    assert UploadService().close_chunk(db, first).received == 14
+    with pytest.raises(ValueError):
+        UploadService().open_chunk(db, upload.id, 0, files_dir)
+    UploadService().close_chunk(db, UploadService().open_chunk(db, upload.id, 14, files_dir))
+
+def test_an_expired_writer_can_be_taken_over(db, files_dir):
+    service = UploadService()
+    upload = service.create_session(db, "stale.pdf", "application/pdf", None, files_dir)
+    stale = service.open_chunk(db, upload.id, 0, files_dir)
+    stale.write(b"partial")
+    db.query(UploadSession).filter(UploadSession.id == upload.id).update({"writer_expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+    fresh = service.open_chunk(db, upload.id, 0, files_dir)
+    fresh.write(b"%PDF-1.4 fresh")
+    assert service.close_chunk(db, fresh).received == 14
+    # the writer that lost its lease must not move the offset
+    assert service.close_chunk(db, stale).received == 14
+
+def test_hash_state_is_bounded_and_rebuilt_after_eviction(db, files_dir, monkeypatch):
+    monkeypatch.setattr(get_settings(), "upload_hasher_cache", 2)
+    service = UploadService()
+    uploads = [service.create_session(db, f"lru{i}.pdf", "application/pdf", None, files_dir) for i in range(4)]
+    data = b"%PDF-1.4 evicted"
+    writer = service.open_chunk(db, uploads[0].id, 0, files_dir)
+    writer.write(data)
+    service.close_chunk(db, writer)
+    for u in uploads[1:]:
+        service.close_chunk(db, service.open_chunk(db, u.id, 0, files_dir))
+    assert len(UploadService._hashers) <= 2 and uploads[0].id not in UploadService._hashers
+    _, meta, _ = service.complete_session(db, uploads[0].id, {"title": "lru", "author": "test"}, files_dir)
+    assert meta.sha256 == hashlib.sha256(data).hexdigest()
+    for u in uploads[1:]:
+        service.abort_session(db, u.id, files_dir)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@pytest.fixture
+def server():
+    from app.main import app
+    port = free_port()
+    srv = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=srv.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not srv.started and time.monotonic() < deadline:
+        time.sleep(0.02)
+    yield f"http://127.0.0.1:{port}"
+    srv.should_exit = True
+    thread.join(timeout=10)
+
+def latencies(base, stop, out):
+    with httpx.Client(base_url=base) as client:
+        while not stop.is_set():
+            t = time.perf_counter()
+            assert client.get("/api/books/?page_size=5").status_code == 200
+            out.append(time.perf_counter() - t)
+            time.sleep(0.01)
+
+def test_large_chunk_upload_does_not_block_other_endpoints(server):
+    with httpx.Client(base_url=server) as client:
+        baseline = []
+        stop = threading.Event()
+        t = threading.Thread(target=latencies, args=(server, stop, baseline))
+        t.start()
+        time.sleep(1.0)
+        stop.set()
+        t.join()
+
+        mb = 64
+        block = b"%PDF" + bytes(1024 * 1024 - 4)
+        upload_id = client.post("/api/upload/sessions", json={"file_name": "large.pdf", "size": mb * len(block)}).json()["upload_id"]
+
+        def body():
+            for _ in range(mb):
+                yield block
+                time.sleep(0.02)
+
+        during = []
+        stop = threading.Event()
+        t = threading.Thread(target=latencies, args=(server, stop, during))
+        t.start()
+        started = time.perf_counter()
+        r = client.put(f"/api/upload/sessions/{upload_id}", params={"offset": 0}, content=body(), timeout=120)
+        upload_seconds = time.perf_counter() - started
+        stop.set()
+        t.join()
+        assert r.status_code == 200 and r.json()["received"] == mb * len(block)
+        client.delete(f"/api/upload/sessions/{upload_id}")
+
+    assert upload_seconds > 1.0 and len(during) > 10
+    assert max(during) < 1.0
+    assert statistics.median(during) < statistics.median(baseline) * 5 + 0.05
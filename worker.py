@@ -0,0 +1,6 @@
+from app.main import seed_data
+from app.service.task_worker import TaskWorker
+
+if __name__ == "__main__":
+    seed_data()
+    TaskWorker().run_forever()